@@ -0,0 +1,9 @@
+from .server import ROUTES, ApiServer, api_server, start_api
+
+# Re-export
+__all__ = [
+    "ApiServer",
+    "api_server",
+    "start_api",
+    "ROUTES",
+]
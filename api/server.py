@@ -0,0 +1,321 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+import h11
+
+from bot.prefetch import prefetcher
+from charts.chartlar import CHART_SOURCES, chart_service
+from charts.encode import chart_encoder, image_mime
+from services.market import (
+    best_performers,
+    get_stock_performance,
+    universe_expires_at,
+    worst_performers,
+)
+from services.returns import get_window
+from services.store import get_store
+from services.universe import DEFAULT_UNIVERSE, UNIVERSES
+
+# API_PORT=0 disables the API; it only listens on localhost unless API_HOST says otherwise
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+
+MAX_LIMIT = 50
+GZIP_MIN_BYTES = 1024  # smaller bodies are not worth compressing
+CHUNK_SIZE = 64 * 1024  # images are written in chunks, draining between them
+READ_TIMEOUT = 30
+SERVER_NAME = "StockFather"
+# Store versions restart at 0 with the process; tags from an earlier run must not match
+ETAG_NONCE = os.urandom(8).hex()
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _NotModified(Exception):
+    def __init__(self, etag: str):
+        super().__init__(etag)
+        self.etag = etag
+
+
+class Reply(NamedTuple):
+    body: Union[bytes, dict, list]  # JSON-serializable payload, or bytes for images
+    version: object  # data version the body was built from, drives the ETag
+    content_type: str = "application/json"
+
+
+Handler = Callable[[Dict[str, str], Dict[str, str]], Reply]
+# Current data version of a route's resource if its data is fresh, else None. Cheap
+# enough for the event loop, so conditional GETs answer 304 without running the handler
+Version = Callable[[Dict[str, str], Dict[str, str]], object]
+
+
+class Route(NamedTuple):
+    pattern: re.Pattern
+    handler: Handler
+    version: Version
+
+
+# --- Endpoints (blocking; run in worker threads) ---
+
+
+def _ranking_params(query: Dict[str, str]) -> Tuple[str, int, str]:
+    period = query.get("period", "24h")
+    if get_window(period) is None:
+        raise ApiError(400, f"unknown period {period}")
+    try:
+        limit = int(query.get("limit", "10"))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(400, f"limit must be between 1 and {MAX_LIMIT}")
+    universe = query.get("universe", DEFAULT_UNIVERSE)
+    if universe not in UNIVERSES:
+        raise ApiError(400, f"unknown universe {universe}")
+    return period, limit, universe
+
+
+def _ranking(func) -> Handler:
+    def handler(params, query):
+        period, limit, universe = _ranking_params(query)
+        results = func(period, limit, universe)
+        body = {"period": period, "universe": universe, "limit": limit, "results": results}
+        return Reply(body, get_store("1d").version)
+
+    return handler
+
+
+def ranking_version(params, query):
+    _ranking_params(query)
+    if universe_expires_at() <= time.time():
+        return None
+    return get_store("1d").version
+
+
+def stock(params, query) -> Reply:
+    symbol = params["symbol"].upper()
+    extra = [p for p in query.get("periods", "").split(",") if p]
+    unknown = [p for p in extra if get_window(p) is None]
+    if unknown:
+        raise ApiError(400, f"unknown period {unknown[0]}")
+
+    result = get_stock_performance(symbol, extra)
+    if result is None:
+        raise ApiError(404, f"no data for {symbol}")
+    return Reply(result, get_store("1d").symbol_version(symbol))
+
+
+def stock_version(params, query):
+    symbol = params["symbol"].upper()
+    daily = get_store("1d")
+    return daily.symbol_version(symbol) if daily.is_fresh(symbol) else None
+
+
+def _chart_params(params, query) -> Tuple[str, str, str]:
+    chart_type, symbol = params["type"], params["symbol"].upper()
+    period = query.get("period", "30d")
+    if chart_type not in ("price", "indicators"):
+        raise ApiError(404, f"unknown chart type {chart_type}")
+    if period not in CHART_SOURCES:
+        raise ApiError(400, f"unknown chart period {period}")
+    return chart_type, symbol, period
+
+
+def chart(params, query) -> Reply:
+    chart_type, symbol, period = _chart_params(params, query)
+    image = chart_service.serve_chart(chart_type, symbol, period)
+    if image is None:
+        raise ApiError(404, f"no data for {symbol}")
+    return Reply(image, chart_service.data_version(symbol, period), image_mime(image))
+
+
+def chart_version(params, query):
+    _chart_type, symbol, period = _chart_params(params, query)
+    if not chart_service.data_fresh(symbol, period):
+        return None
+    return chart_service.data_version(symbol, period)
+
+
+def health(params, query) -> Reply:
+    daily = get_store("1d")
+    body = {
+        "status": "ok",
+        "symbols": len(daily.symbols),
+        "data_version": daily.version,
+        "prefetch": prefetcher.report(),
+        "encoder": chart_encoder.report(),
+    }
+    return Reply(body, None)
+
+
+ROUTES: List[Route] = [
+    Route(re.compile(r"^/v1/best$"), _ranking(best_performers), ranking_version),
+    Route(re.compile(r"^/v1/worst$"), _ranking(worst_performers), ranking_version),
+    Route(re.compile(r"^/v1/stocks/(?P<symbol>[A-Za-z0-9.\-^=]{1,15})$"), stock, stock_version),
+    Route(
+        re.compile(r"^/v1/charts/(?P<type>\w+)/(?P<symbol>[A-Za-z0-9.\-^=]{1,15})$"),
+        chart,
+        chart_version,
+    ),
+    Route(re.compile(r"^/v1/health$"), health, lambda params, query: None),
+]
+
+
+def _etag(target: str, version) -> Optional[str]:
+    """
+    Weak tag: JSON goes out gzipped or not depending on the client, and both
+    encodings of the same data share it
+    """
+    if version is None:
+        return None
+    digest = hashlib.blake2b(
+        f"{ETAG_NONCE}|{target}|{version}".encode(), digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+class ApiServer:
+    """
+    Minimal HTTP/1.1 JSON API on asyncio streams (h11 does the parsing).
+    Handlers call the same service functions as the bot, so they share its caches.
+    Responses carry an ETag derived from the data version, and a matching
+    If-None-Match on fresh data is answered 304 before the handler runs; JSON
+    is gzipped on request and images are streamed in chunks.
+    """
+
+    def __init__(self, host: str = API_HOST, port: int = API_PORT):
+        self.host = host
+        self.port = port
+        self.stats = {"requests": 0, "not_modified": 0, "errors": 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        print(f"API listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _next_event(self, conn: h11.Connection, reader: asyncio.StreamReader):
+        while True:
+            event = conn.next_event()
+            if event is not h11.NEED_DATA:
+                return event
+            conn.receive_data(await asyncio.wait_for(reader.read(CHUNK_SIZE), READ_TIMEOUT))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        conn = h11.Connection(h11.SERVER)
+        try:
+            while True:
+                request = await self._next_event(conn, reader)
+                if not isinstance(request, h11.Request):
+                    break
+                # GET only: skip any request body
+                while not isinstance(await self._next_event(conn, reader), h11.EndOfMessage):
+                    pass
+
+                await self._respond(conn, writer, request)
+                if conn.our_state is not h11.DONE or conn.their_state is not h11.DONE:
+                    break
+                conn.start_next_cycle()
+        except (asyncio.TimeoutError, ConnectionError, h11.ProtocolError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, conn: h11.Connection, writer, request: h11.Request):
+        self.stats["requests"] += 1
+        headers = {name.decode().lower(): value.decode() for name, value in request.headers}
+        target = request.target.decode()
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+
+        status, reply_headers, body = 200, [], b""
+        try:
+            if request.method not in (b"GET", b"HEAD"):
+                raise ApiError(405, "only GET is supported")
+            route, params = self._route(url.path)
+            if_none_match = headers.get("if-none-match", "")
+            etag = _etag(target, route.version(params, query)) if if_none_match else None
+            if etag and _matches(if_none_match, etag):
+                self.stats["not_modified"] += 1
+                raise _NotModified(etag)
+
+            reply = await asyncio.to_thread(route.handler, params, query)
+            etag = _etag(target, reply.version)
+            if etag:
+                reply_headers += [("ETag", etag), ("Cache-Control", "no-cache")]
+            if etag and _matches(if_none_match, etag):
+                self.stats["not_modified"] += 1
+                status = 304
+            elif isinstance(reply.body, bytes):
+                body = reply.body
+            else:
+                body = json.dumps(reply.body, separators=(",", ":")).encode()
+                reply_headers.append(("Vary", "Accept-Encoding"))
+                if len(body) >= GZIP_MIN_BYTES and "gzip" in headers.get("accept-encoding", ""):
+                    body = gzip.compress(body, compresslevel=5)
+                    reply_headers.append(("Content-Encoding", "gzip"))
+            reply_headers.append(("Content-Type", reply.content_type))
+        except _NotModified as e:
+            status = 304
+            reply_headers = [("ETag", e.etag), ("Cache-Control", "no-cache")]
+        except ApiError as e:
+            status, body = e.status, json.dumps({"error": str(e)}).encode()
+            reply_headers = [("Content-Type", "application/json")]
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"API {target} failed: {e}")
+            status, body = 500, json.dumps({"error": "internal error"}).encode()
+            reply_headers = [("Content-Type", "application/json")]
+
+        if status != 304:
+            reply_headers.append(("Content-Length", str(len(body))))
+        reply_headers.append(("Server", SERVER_NAME))
+        writer.write(conn.send(h11.Response(status_code=status, headers=reply_headers)))
+
+        if request.method != b"HEAD" and status != 304:
+            for i in range(0, len(body), CHUNK_SIZE):
+                writer.write(conn.send(h11.Data(data=body[i : i + CHUNK_SIZE])))
+                await writer.drain()
+        writer.write(conn.send(h11.EndOfMessage()))
+        await writer.drain()
+
+    @staticmethod
+    def _route(path: str) -> Tuple[Route, Dict[str, str]]:
+        for route in ROUTES:
+            match = route.pattern.match(path)
+            if match:
+                return route, match.groupdict()
+        raise ApiError(404, f"no route for {path}")
+
+
+async def start_api(application=None):
+    """post_init hook: serve the API on the bot's event loop"""
+    # Read again here: .env is loaded after the imports
+    api_server.host = os.getenv("API_HOST", api_server.host)
+    api_server.port = int(os.getenv("API_PORT", api_server.port))
+    if api_server.port:
+        await api_server.start()
+
+
+# Create a global instance
+api_server = ApiServer()
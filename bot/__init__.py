@@ -1,15 +1,40 @@
 # bot/__init__.py
-from .handlers import handle_message, on_button, start
+from .alerts import check_alerts, start_alert_loop
+from .digest import DigestBroadcaster, digest_broadcaster, start_digest_loop
+from .handlers import (
+    alert_command,
+    backtest_command,
+    compare_command,
+    correlated_command,
+    digest_command,
+    handle_message,
+    inline_query,
+    on_button,
+    profile_command,
+    ranking_command,
+    screen_command,
+    start,
+    stock_command,
+    unalert_command,
+    unwatch_command,
+    watch_command,
+)
 from .keyboards import (
     chart_period_menu,
     limit_menu,
     main_menu,
     results_menu,
+    screener_menu,
     search_prompt_menu,
     search_stock_menu,
+    sectors_menu,
     stock_result_menu,
+    suggestion_menu,
     timeframe_menu,
+    watchlist_menu,
 )
+from .outbox import Outbox, outbox
+from .prefetch import NavigationModel, Prefetcher, prefetcher
 
 __all__ = [
     "main_menu",
@@ -20,7 +45,34 @@ __all__ = [
     "search_prompt_menu",
     "stock_result_menu",
     "chart_period_menu",
+    "suggestion_menu",
+    "sectors_menu",
+    "screener_menu",
+    "watchlist_menu",
     "on_button",
     "handle_message",
+    "inline_query",
+    "stock_command",
+    "ranking_command",
     "start",
+    "screen_command",
+    "backtest_command",
+    "compare_command",
+    "correlated_command",
+    "digest_command",
+    "watch_command",
+    "unwatch_command",
+    "alert_command",
+    "unalert_command",
+    "profile_command",
+    "check_alerts",
+    "start_alert_loop",
+    "DigestBroadcaster",
+    "digest_broadcaster",
+    "start_digest_loop",
+    "Outbox",
+    "outbox",
+    "NavigationModel",
+    "Prefetcher",
+    "prefetcher",
 ]
@@ -0,0 +1,63 @@
+import asyncio
+from collections import defaultdict
+
+from bot.handlers import run_in_thread
+from bot.outbox import PRIORITY_BULK, outbox
+from services.alerts import alert_book
+from services.market import latest_quotes
+
+ALERT_INTERVAL = 60  # seconds between evaluation cycles
+
+
+def format_notification(fired) -> str:
+    lines = []
+    for alert, value in fired:
+        verb = "rose above" if alert.direction == "above" else "fell below"
+        if alert.metric == "change":
+            lines.append(
+                f"• {alert.symbol} today's change {verb} {alert.threshold:+.2f}% (now {value:+.2f}%)"
+            )
+        else:
+            lines.append(f"• {alert.symbol} {verb} ${alert.threshold:.2f} (now ${value:.2f})")
+    return "🔔 Price alert\n\n" + "\n".join(lines)
+
+
+async def check_alerts(bot) -> int:
+    """
+    One evaluation cycle: refresh every watched symbol once, pop the crossed
+    alerts and send one message per chat. Returns how many alerts fired.
+    """
+    symbols = alert_book.symbols()
+    if not symbols:
+        return 0
+
+    quotes = await run_in_thread(latest_quotes, symbols)
+    fired = alert_book.evaluate(quotes.to_dict("index"))
+
+    by_chat = defaultdict(list)
+    for alert, value in fired:
+        by_chat[alert.chat_id].append((alert, value))
+
+    sends = [
+        outbox.send_message(bot, chat_id, format_notification(items), priority=PRIORITY_BULK)
+        for chat_id, items in by_chat.items()
+    ]
+    for chat_id, result in zip(by_chat, await asyncio.gather(*sends, return_exceptions=True)):
+        if isinstance(result, Exception):
+            print(f"Alert notification to {chat_id} failed: {result}")
+
+    return len(fired)
+
+
+async def alert_loop(bot, interval: float = ALERT_INTERVAL):
+    while True:
+        try:
+            await check_alerts(bot)
+        except Exception as e:
+            print(f"Alert check failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def start_alert_loop(application):
+    """post_init hook: run the evaluator next to the bot's polling loop"""
+    application.create_task(alert_loop(application.bot))
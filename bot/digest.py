@@ -0,0 +1,191 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from telegram import InputMediaPhoto
+from telegram.error import Forbidden
+
+from bot.handlers import run_in_thread
+from bot.outbox import PRIORITY_BULK, outbox
+from charts.chartlar import chart_service
+from services.digest import SCHEDULES, Delivery, edition_key, next_run, subscriptions
+from services.market import best_performers, worst_performers
+from services.market_hours import EXCHANGE_TZ
+from services.sectors import SECTOR_SHORT, sector_performance
+
+DIGEST_LIMIT = 5
+DIGEST_SECTORS = 3  # strongest and weakest sectors listed
+CAPTION_LIMIT = 1024  # Telegram's caption length; longer digests go as a separate message
+SEND_WINDOW = 32  # sends handed to the outbox at a time, it paces them to the API limits
+SAVE_EVERY = 100  # chats served between progress saves
+
+Chart = Tuple[str, bytes]  # (name, PNG)
+
+
+def format_digest(schedule: str, best, worst, sectors) -> str:
+    title = "🌅 Pre-market digest" if schedule == "premarket" else "🌆 Market close digest"
+    lines = [f"{title} - {datetime.now(EXCHANGE_TZ).strftime('%d/%m/%Y')}", "", "📈 Top movers"]
+    lines += [f"{i}. {s['symbol']}: {s['change']:+}%" for i, s in enumerate(best, 1)]
+    lines += ["", "📉 Bottom movers"]
+    lines += [f"{i}. {s['symbol']}: {s['change']:+}%" for i, s in enumerate(worst, 1)]
+
+    if sectors is not None and "24h" in sectors:
+        ranked = sectors["24h"].dropna().sort_values(ascending=False)
+        picks = list(ranked.head(DIGEST_SECTORS).items()) + list(
+            ranked.tail(DIGEST_SECTORS).items()
+        )
+        lines += ["", "🏭 Sectors"]
+        lines += [f"{SECTOR_SHORT.get(sector, sector)}: {change:+.2f}%" for sector, change in picks]
+
+    lines += ["", "⚠️ Not financial advice. /digest off to unsubscribe."]
+    return "\n".join(lines)
+
+
+def build_digest(schedule: str) -> Tuple[str, List[Chart]]:
+    """Digest text and charts from the cached rankings; blocking, run in a thread"""
+    best = best_performers("24h", DIGEST_LIMIT)
+    worst = worst_performers("24h", DIGEST_LIMIT)
+    try:
+        sectors = sector_performance()
+    except Exception as e:
+        print(f"Digest sector summary failed: {e}")
+        sectors = None
+
+    charts = [("heatmap", chart_service.generate_universe_heatmap("24h"))]
+    if best:
+        charts.append(("top", chart_service.generate_chart("price", best[0]["symbol"], "30d")))
+    charts = [(name, image) for name, image in charts if image]
+    return format_digest(schedule, best, worst, sectors), charts
+
+
+def _media(photos, text: str) -> List[InputMediaPhoto]:
+    caption = text if len(text) <= CAPTION_LIMIT else None
+    return [
+        InputMediaPhoto(photo, caption=caption if i == 0 else None)
+        for i, photo in enumerate(photos)
+    ]
+
+
+async def _send(bot, chat_id: int, photos, text: str, priority: int = PRIORITY_BULK):
+    """One digest to one chat; photos are PNG bytes (first upload) or file IDs. Returns messages"""
+    messages = []
+    if len(photos) > 1:
+        messages = await outbox.call(
+            chat_id,
+            bot.send_media_group,
+            priority=priority,
+            chat_id=chat_id,
+            media=_media(photos, text),
+        )
+    elif photos:
+        caption = text if len(text) <= CAPTION_LIMIT else None
+        messages = [
+            await outbox.send_photo(bot, chat_id, photos[0], priority=priority, caption=caption)
+        ]
+    if not photos or len(text) > CAPTION_LIMIT:
+        await outbox.send_message(bot, chat_id, text, priority=priority)
+    return messages
+
+
+class DigestBroadcaster:
+    """
+    Builds each digest edition once, uploads its charts once, then fans it out
+    to every subscriber by file ID. Sends are paced by the outbox, so delivery
+    time is bounded by Telegram's limits rather than by rendering. Progress is
+    saved as it goes and an interrupted edition resumes after a restart.
+    """
+
+    def __init__(self):
+        self.delivery: Optional[Delivery] = None
+        self.stats = {"editions": 0, "sent": 0, "failed": 0, "unsubscribed": 0}
+
+    async def run(self, bot, schedule: str, edition: str):
+        chats = subscriptions.chats(schedule)
+        delivery = self.delivery
+        if delivery is None or delivery.edition != edition:
+            if not chats:
+                return
+            started = time.time()
+            text, charts = await run_in_thread(build_digest, schedule)
+            delivery = self.delivery = Delivery(edition, text)
+            print(f"Digest {edition} built in {time.time() - started:.1f}s")
+            await self._upload(bot, delivery, charts, chats)
+
+        await self._fan_out(bot, delivery, chats)
+
+    async def _upload(self, bot, delivery: Delivery, charts: List[Chart], chats: List[int]):
+        """Send the rendered PNGs to the first reachable subscriber and keep their file IDs"""
+        images = [image for _name, image in charts]
+        for chat_id in chats:
+            if not images:
+                break
+            messages = await self._deliver(bot, delivery, chat_id, images)
+            if messages is not None:
+                delivery.file_ids = [m.photo[-1].file_id for m in messages]
+                break
+        delivery.save()
+
+    async def _deliver(self, bot, delivery: Delivery, chat_id: int, photos):
+        try:
+            messages = await _send(bot, chat_id, photos, delivery.text)
+        except Forbidden:
+            # Blocked the bot or left the chat
+            subscriptions.unsubscribe(chat_id)
+            delivery.failed[chat_id] = "forbidden"
+            self.stats["unsubscribed"] += 1
+            return None
+        except Exception as e:
+            delivery.failed[chat_id] = str(e)[:200]
+            self.stats["failed"] += 1
+            return None
+        delivery.sent.add(chat_id)
+        self.stats["sent"] += 1
+        return messages
+
+    async def _fan_out(self, bot, delivery: Delivery, chats: List[int]):
+        pending = [chat_id for chat_id in chats if not delivery.done(chat_id)]
+        started = time.time()
+        window = asyncio.Semaphore(SEND_WINDOW)
+
+        async def deliver(chat_id: int):
+            async with window:
+                await self._deliver(bot, delivery, chat_id, delivery.file_ids)
+                if len(delivery.sent) % SAVE_EVERY == 0:
+                    delivery.save()
+
+        await asyncio.gather(*(deliver(chat_id) for chat_id in pending))
+        delivery.finished = time.time()
+        delivery.save()
+        self.stats["editions"] += 1
+        print(
+            f"Digest {delivery.edition}: {len(delivery.sent)} sent, {len(delivery.failed)} failed, "
+            f"fan-out {delivery.finished - started:.0f}s"
+        )
+
+    async def loop(self, bot):
+        # Finish an edition a restart interrupted before waiting for the next tick
+        saved = Delivery.load()
+        if saved is not None and saved.resumable:
+            self.delivery = saved
+            await self._guarded(bot, saved.schedule, saved.edition)
+
+        while True:
+            schedule, run_at = min(((s, next_run(s)) for s in SCHEDULES), key=lambda item: item[1])
+            await asyncio.sleep(max(0.0, run_at - time.time()))
+            await self._guarded(bot, schedule, edition_key(schedule, run_at))
+
+    async def _guarded(self, bot, schedule: str, edition: str):
+        try:
+            await self.run(bot, schedule, edition)
+        except Exception as e:
+            print(f"Digest {edition} failed: {e}")
+
+
+async def start_digest_loop(application):
+    """post_init hook: send scheduled digests next to the bot's polling loop"""
+    application.create_task(digest_broadcaster.loop(application.bot))
+
+
+# Create a global instance
+digest_broadcaster = DigestBroadcaster()
@@ -1,10 +1,11 @@
 import asyncio
 import concurrent.futures
-import json
+import functools
+import os
 import time
-from pathlib import Path
+from datetime import datetime
 
-from telegram import Update
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
 from telegram.ext import ContextTypes
 
 from bot.keyboards import (
@@ -12,25 +13,81 @@ from bot.keyboards import (
     limit_menu,
     main_menu,
     results_menu,
+    screener_menu,
     search_prompt_menu,
     search_stock_menu,
+    sectors_menu,
     stock_result_menu,
+    suggestion_menu,
     timeframe_menu,
+    universe_label,
+    watchlist_menu,
 )
+from bot.outbox import outbox
+from bot.prefetch import prefetcher
 from charts.chartlar import chart_service
-from services.market import best_performers, get_stock_performance, worst_performers
-
-# Load S&P 500 symbols for validation
-SP500_FILE = Path("cache") / "sp500.json"
-if SP500_FILE.exists():
-    with open(SP500_FILE, "r") as f:
-        VALID_SYMBOLS = set(json.load(f))
-else:
-    VALID_SYMBOLS = set()
+from charts.prerender import prerender_scheduler
+from services.alerts import MAX_WATCHLIST, METRICS, alert_book, watchlists
+from services.backtest import STRATEGIES, backtester, summarize
+from services.correlation import BENCHMARK, correlation_table
+from services.digest import SCHEDULES, next_run, subscriptions
+from services.market import (
+    best_performers,
+    get_stock_performance,
+    latest_quotes,
+    stream_performers,
+    universe_members,
+    worst_performers,
+)
+from services.market_hours import EXCHANGE_TZ
+from services.profiler import format_report, parse_budget, profiled, profiler
+from services.returns import MENU_WINDOWS, WINDOWS, get_window, range_key, window_label
+from services.screener import CONDITIONS, screener
+from services.sectors import SECTOR_SHORT, sector_performance
+from services.symbols import symbol_index
+from services.universe import DEFAULT_UNIVERSE, UNIVERSES, WATCHLIST_UNIVERSE
+
+INLINE_RESULTS = 10
+SCREEN_RESULTS = 20
+MAX_COMMAND_LIMIT = 50
+MAX_COMPARE = 8
+RANKING_REFRESH = 1.5  # seconds between provisional ranking edits while a cold fetch streams in
+
+
+# /alert direction words: (direction, whether the threshold is a percent change)
+ALERT_WORDS = {
+    "above": ("above", False),
+    "below": ("below", False),
+    ">": ("above", False),
+    "<": ("below", False),
+    "up": ("above", True),
+    "down": ("below", True),
+}
+
+
+def selected_universe(context) -> str:
+    return str(context.user_data.get("universe", DEFAULT_UNIVERSE))
+
+
+def universe_scope(universe: str, chat_id) -> dict:
+    """Ranking arguments for a universe; the watchlist universe is the chat's own list"""
+    if universe == WATCHLIST_UNIVERSE:
+        return {"symbols": watchlists.get(chat_id)}
+    return {"universe": universe}
+
+
+def ranking_label(period: str, universe: str) -> str:
+    period_text = window_label(period)
+    return (
+        period_text
+        if universe == DEFAULT_UNIVERSE
+        else f"{period_text}, {universe_label(universe)}"
+    )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    await outbox.reply(
+        update.message,
         "📊 Stock Advisor Bot\n\nWelcome! Use the buttons to explore the market.\n⚠️ Not financial advice.",
         reply_markup=main_menu(),
     )
@@ -39,12 +96,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def run_in_thread(func, *args, **kwargs):
     loop = asyncio.get_event_loop()
     with concurrent.futures.ThreadPoolExecutor() as pool:
-        return await loop.run_in_executor(pool, func, *args, **kwargs)
+        return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
 
 
 async def show_adaptive_progress(q, task_description, task_func, *args, **kwargs):
     start_time = time.time()
-    message = await q.edit_message_text(f"⚡ {task_description}")
+    message = await outbox.edit_query(q, f"⚡ {task_description}")
 
     time_task = asyncio.create_task(update_time_display(message, task_description, start_time))
 
@@ -53,7 +110,7 @@ async def show_adaptive_progress(q, task_description, task_func, *args, **kwargs
 
     time_task.cancel()
 
-    await message.edit_text(f"✅ {task_description} ({elapsed:.1f}s)")
+    await outbox.edit(message, f"✅ {task_description} ({elapsed:.1f}s)")
     await asyncio.sleep(0.3)
 
     return result, message
@@ -82,9 +139,41 @@ async def update_time_display(message, task_description, start_time):
             remaining_seconds = seconds % 60
             time_display = f"{minutes}m {remaining_seconds}s"
 
-        await message.edit_text(f"{icon} {task_description} ({time_display})")
+        outbox.progress(message, f"{icon} {task_description} ({time_display})")
+
+
+async def show_streaming_ranking(q, task_description, updates, render):
+    """
+    Drain a stream_performers generator in a thread, showing the latest
+    provisional ranking every RANKING_REFRESH seconds. Returns the final update.
+    """
+    message = await outbox.edit_query(q, f"⚡ {task_description}")
+    latest = {}
+
+    def consume():
+        for update in updates:
+            latest["update"] = update
+        return latest.get("update")
+
+    task = asyncio.ensure_future(run_in_thread(consume))
+    shown = None
+    while not task.done():
+        await asyncio.wait([task], timeout=RANKING_REFRESH)
+        update = latest.get("update")
+        if update is not None and update is not shown and update.results and not task.done():
+            outbox.progress(message, render(update))
+            shown = update
+
+    return task.result(), message
+
+
+def _button_section(update: Update, context=None) -> str:
+    """Profiler section per on_button branch: the callback data up to its first argument"""
+    data = update.callback_query.data or ""
+    return "on_button:" + data.split(":")[0].split("_")[0]
 
 
+@profiled(_button_section, handler=True)
 async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
@@ -97,61 +186,75 @@ async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if data == "menu":
         if is_photo_message(q.message):  # FIXED
-            await context.bot.send_message(
-                chat_id=q.message.chat_id,
-                text="📊 Stock Advisor Bot\n\nSelect an option:",
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                "📊 Stock Advisor Bot\n\nSelect an option:",
                 reply_markup=main_menu(),
             )
         else:
-            await q.edit_message_text(
-                "📊 Stock Advisor Bot\n\nSelect an option:", reply_markup=main_menu()
+            await outbox.edit_query(
+                q, "📊 Stock Advisor Bot\n\nSelect an option:", reply_markup=main_menu()
             )
 
     elif data == "search":
         if is_photo_message(q.message):  # FIXED
-            await context.bot.send_message(
-                chat_id=q.message.chat_id,
-                text="🔍 Stock Search\n\nEnter a stock symbol:",
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                "🔍 Stock Search\n\nEnter a stock symbol:",
                 reply_markup=search_prompt_menu(),
             )
         else:
-            await q.edit_message_text(
-                "🔍 Stock Search\n\nEnter a stock symbol:", reply_markup=search_prompt_menu()
+            await outbox.edit_query(
+                q, "🔍 Stock Search\n\nEnter a stock symbol:", reply_markup=search_prompt_menu()
             )
         context.user_data["awaiting_stock"] = True
 
-    elif data in ["best", "worst"]:
+    elif data in ["best", "worst"] or data.startswith("uni:"):
+        # uni:best:ndx switches the chat's universe and redraws the same menu
+        if data.startswith("uni:"):
+            _, data, universe = data.split(":")
+            if universe == selected_universe(context):
+                return
+            if universe in UNIVERSES or universe == WATCHLIST_UNIVERSE:
+                context.user_data["universe"] = universe
+
+        universe = selected_universe(context)
+        prefetcher.on_timeframe_menu(q.message.chat_id, universe, data)
         action = "Best" if data == "best" else "Worst"
+        text = f"📈 {action} Performers - {universe_label(universe)}\n\nSelect timeframe:"
+        if universe in UNIVERSES and not await run_in_thread(universe_members, universe):
+            text = (
+                f"📈 {action} Performers - {universe_label(universe)}\n\n"
+                "⚠️ Universe unavailable right now, try again in a few minutes or pick another."
+            )
         if is_photo_message(q.message):  # FIXED
-            await context.bot.send_message(
-                chat_id=q.message.chat_id,
-                text=f"📈 {action} Performers\n\nSelect timeframe:",
-                reply_markup=timeframe_menu(data),
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                text,
+                reply_markup=timeframe_menu(data, universe),
             )
         else:
-            await q.edit_message_text(
-                f"📈 {action} Performers\n\nSelect timeframe:", reply_markup=timeframe_menu(data)
-            )
+            await outbox.edit_query(q, text, reply_markup=timeframe_menu(data, universe))
 
-    elif data.count("_") == 1 and data.endswith(("_24h", "_7d", "_30d", "_3mo", "_1y")):
+    elif data.count("_") == 1 and get_window(data.split("_")[1]):
         prefix, period = data.split("_")
+        prefetcher.on_limit_menu(q.message.chat_id, selected_universe(context), prefix, period)
         action = "Best" if prefix == "best" else "Worst"
-        period_text = {
-            "24h": "Today",
-            "7d": "7 Days",
-            "30d": "30 Days",
-            "3mo": "3 Months",
-            "1y": "1 Year",
-        }[period]
+        period_text = window_label(period)
 
         if is_photo_message(q.message):  # FIXED
-            await context.bot.send_message(
-                chat_id=q.message.chat_id,
-                text=f"📈 {action} Performers - {period_text}\n\nHow many stocks to show?",
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                f"📈 {action} Performers - {period_text}\n\nHow many stocks to show?",
                 reply_markup=limit_menu(prefix, period),
             )
         else:
-            await q.edit_message_text(
+            await outbox.edit_query(
+                q,
                 f"📈 {action} Performers - {period_text}\n\nHow many stocks to show?",
                 reply_markup=limit_menu(prefix, period),
             )
@@ -160,41 +263,43 @@ async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         prefix, period, limit_str = data.split("_")
         limit = int(limit_str)
 
-        period_text = {
-            "24h": "Today",
-            "7d": "7 Days",
-            "30d": "30 Days",
-            "3mo": "3 Months",
-            "1y": "1 Year",
-        }[period]
-
-        async def fetch_performers():
-            if prefix == "best":
-                results = await run_in_thread(best_performers, period, limit)
-                return results, "📈 Top"
-            else:
-                results = await run_in_thread(worst_performers, period, limit)
-                return results, "📉 Bottom"
-
-        (results, title), progress_msg = await show_adaptive_progress(
-            q, f"Fetching {period_text} performers", fetch_performers
+        universe = selected_universe(context)
+        scope = universe_scope(universe, q.message.chat_id)
+        if scope.get("symbols") == []:
+            await outbox.edit_query(
+                q,
+                "⭐ Your watchlist is empty. Add symbols with /watch AAPL MSFT.",
+                reply_markup=timeframe_menu(prefix, universe),
+            )
+            return
+        period_text = ranking_label(period, universe)
+        prefetcher.on_ranking(q.message.chat_id, universe, prefix, period, limit)
+
+        title = "📈 Top" if prefix == "best" else "📉 Bottom"
+
+        def render(update):
+            text = format_ranking(update.results, title, limit, period_text)
+            return f"{text}\n\n⏳ {update.done} of {update.total} symbols"
+
+        final, progress_msg = await show_streaming_ranking(
+            q,
+            f"Fetching {period_text} performers",
+            stream_performers(period, limit, prefix == "best", **scope),
+            render,
         )
+        results = final.results if final is not None else []
 
         if not results:
-            await progress_msg.edit_text(
+            await outbox.edit(
+                progress_msg,
                 f"❌ No data available for {period_text} period.",
-                reply_markup=timeframe_menu(prefix),
+                reply_markup=timeframe_menu(prefix, universe),
             )
             return
 
-        lines = []
-        for i, item in enumerate(results, 1):
-            change_icon = "🟢" if item["change"] >= 0 else "🔴"
-            lines.append(f"{i}. {change_icon} {item['symbol']}: {item['change']:+}%")
+        text = format_ranking(results, title, limit, period_text)
 
-        text = f"{title} {limit} Performers ({period_text})\n\n" + "\n".join(lines)
-
-        await progress_msg.edit_text(text, reply_markup=results_menu(prefix, period, limit))
+        await outbox.edit(progress_msg, text, reply_markup=results_menu(prefix, period, limit))
 
     # Chart type selection
     # Chart type selection
@@ -204,16 +309,19 @@ async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chart_type = parts[1]
         symbol = parts[2]
 
+        prefetcher.on_chart_menu(q.message.chat_id, symbol, chart_type)
         chart_type_text = "Price & Volume" if chart_type == "price" else "RSI, MACD, ATR"
 
         if is_photo_message(q.message):
-            await context.bot.send_message(
-                chat_id=q.message.chat_id,
-                text=f"📊 {symbol} - {chart_type_text}\n\nSelect timeframe:",
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                f"📊 {symbol} - {chart_type_text}\n\nSelect timeframe:",
                 reply_markup=chart_period_menu(symbol, chart_type),
             )
         else:
-            await q.edit_message_text(
+            await outbox.edit_query(
+                q,
                 f"📊 {symbol} - {chart_type_text}\n\nSelect timeframe:",
                 reply_markup=chart_period_menu(symbol, chart_type),
             )
@@ -227,143 +335,723 @@ async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         period = parts[3]
 
         # Show loading
-        loading_msg = await context.bot.send_message(
-            chat_id=q.message.chat_id,
-            text=f"📈 Generating {chart_type} chart for {symbol} ({period.upper()})...",
+        loading_msg = await outbox.send_message(
+            context.bot,
+            q.message.chat_id,
+            f"📈 Generating {chart_type} chart for {symbol} ({period.upper()})...",
         )
 
         # Generate chart
+        prerender_scheduler.record(symbol, chart_type, period)
+        prefetcher.on_chart(q.message.chat_id, symbol, chart_type, period)
+        image_bytes = await run_in_thread(chart_service.serve_chart, chart_type, symbol, period)
         if chart_type == "price":
-            image_bytes = chart_service.generate_price_volume_chart(symbol, period)
             chart_title = f"{symbol} - Price & Volume ({period.upper()})"
         else:  # indicators
-            image_bytes = chart_service.generate_indicators_chart(symbol, period)
             chart_title = f"{symbol} - RSI, MACD, ATR ({period.upper()})"
 
         if image_bytes:
-            await loading_msg.delete()
-            await context.bot.send_photo(
-                chat_id=q.message.chat_id,
+            await outbox.delete(loading_msg)
+            await outbox.send_photo(
+                context.bot,
+                q.message.chat_id,
                 photo=image_bytes,
                 caption=chart_title,
                 reply_markup=chart_period_menu(symbol, chart_type),
             )
             if not is_photo_message(q.message):
-                await q.message.delete()
+                await outbox.delete(q.message)
         else:
-            await loading_msg.edit_text(
-                text="❌ Could not generate chart. Please try again.",
+            await outbox.edit(
+                loading_msg,
+                "❌ Could not generate chart. Please try again.",
                 reply_markup=stock_result_menu(symbol, has_chart=False),
             )
 
+    elif data == "sectors":
+        summary, progress_msg = await show_adaptive_progress(
+            q, "Aggregating sector performance", run_in_thread, sector_performance
+        )
+
+        if summary.empty:
+            await outbox.edit(progress_msg, "❌ No sector data available.", reply_markup=main_menu())
+            return
+
+        await outbox.edit(
+            progress_msg,
+            format_sector_table(summary),
+            parse_mode="HTML",
+            reply_markup=sectors_menu(),
+        )
+
+    elif data.startswith("heatmap:"):
+        period = data.split(":")[1]
+
+        loading_msg = await outbox.send_message(
+            context.bot,
+            q.message.chat_id,
+            f"🗺 Rendering S&P 500 heatmap ({period.upper()})...",
+        )
+
+        image_bytes = await run_in_thread(chart_service.generate_universe_heatmap, period)
+
+        if image_bytes:
+            await outbox.delete(loading_msg)
+            await outbox.send_photo(
+                context.bot,
+                q.message.chat_id,
+                photo=image_bytes,
+                caption=f"S&P 500 Heatmap ({period.upper()})",
+                reply_markup=sectors_menu(),
+            )
+        else:
+            await outbox.edit(
+                loading_msg,
+                "❌ Could not generate heatmap. Please try again.",
+                reply_markup=sectors_menu(),
+            )
+
+    elif data == "screener":
+        if is_photo_message(q.message):
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                "🧪 Screener\n\nPick a condition:",
+                reply_markup=screener_menu(),
+            )
+        else:
+            await outbox.edit_query(
+                q, "🧪 Screener\n\nPick a condition:", reply_markup=screener_menu()
+            )
+
+    elif data.startswith("screen:") and data.split(":")[1] in CONDITIONS:
+        key = data.split(":")[1]
+        results, progress_msg = await show_adaptive_progress(
+            q, f"Screening for {CONDITIONS[key].label}", run_in_thread, screener.screen, key
+        )
+        await outbox.edit(progress_msg, format_screen(key, results), reply_markup=screener_menu())
+
+    elif data == "watchlist":
+        symbols = watchlists.get(q.message.chat_id)
+        quotes = await run_in_thread(latest_quotes, symbols) if symbols else None
+        text = format_watchlist(symbols, quotes)
+
+        if is_photo_message(q.message):
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                text,
+                parse_mode="HTML",
+                reply_markup=watchlist_menu(symbols),
+            )
+        else:
+            await outbox.edit_query(
+                q, text, parse_mode="HTML", reply_markup=watchlist_menu(symbols)
+            )
+
+    elif data.startswith("watch:"):
+        symbol = data.split(":")[1]
+        added = watchlists.add(q.message.chat_id, [symbol])
+        if added:
+            text = f"⭐ {symbol} added to your watchlist."
+        elif symbol in watchlists.get(q.message.chat_id):
+            text = f"⭐ {symbol} is already on your watchlist."
+        else:
+            text = f"❌ Watchlist is full ({MAX_WATCHLIST} symbols)."
+        await outbox.send_message(
+            context.bot, q.message.chat_id, text, reply_markup=watchlist_menu([symbol])
+        )
+
     elif data.startswith("stock_back:"):
         symbol = data.split(":")[1]
 
-        stock_data = get_stock_performance(symbol)
+        stock_data = await run_in_thread(get_stock_performance, symbol)
 
         if not stock_data:
-            await context.bot.send_message(
-                chat_id=q.message.chat_id,
-                text=f"❌ Could not find data for {symbol}",
+            await outbox.send_message(
+                context.bot,
+                q.message.chat_id,
+                f"❌ Could not find data for {symbol}",
                 reply_markup=main_menu(),
             )
             return
 
-        lines = []
-        lines.append(f"<b>{stock_data['symbol']}</b>")
-
-        if stock_data["current_price"]:
-            lines.append(f"Current Price: ${stock_data['current_price']:.2f}")
-
-        lines.append("")
-
-        performances = stock_data["performances"]
-        for p, change in performances.items():
-            if change is not None:
-                p_text = {
-                    "24h": "24 Hours",
-                    "7d": "7 Days",
-                    "30d": "30 Days",
-                    "3mo": "3 Months",
-                    "1y": "1 Year",
-                }[p]
-                change_icon = "🟢" if change >= 0 else "🔴"
-                lines.append(f"{change_icon} {p_text}: {change:+}%")
-            else:
-                p_text = {
-                    "24h": "24 Hours",
-                    "7d": "7 Days",
-                    "30d": "30 Days",
-                    "3mo": "3 Months",
-                    "1y": "1 Year",
-                }[p]
-                lines.append(f"⭕ {p_text}: No data")
-
-        text = "\n".join(lines)
-
-        await context.bot.send_message(
-            chat_id=q.message.chat_id,
-            text=text,
+        text = format_stock_performance(stock_data)
+
+        await outbox.send_message(
+            context.bot,
+            q.message.chat_id,
+            text,
             parse_mode="HTML",
             reply_markup=search_stock_menu(symbol),
         )
+        prefetcher.on_stock(q.message.chat_id, symbol)
 
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle regular messages for stock search"""
-    if context.user_data.get("awaiting_stock"):
-        symbol = update.message.text.upper().strip()
+def format_stock_performance(stock_data) -> str:
+    lines = []
+    lines.append(f"<b>{stock_data['symbol']}</b>")
 
-        # Quick validation using S&P 500 list
-        if VALID_SYMBOLS and symbol not in VALID_SYMBOLS:
-            await update.message.reply_text(
-                f"❌ {symbol} not found in S&P 500. Try symbols like AAPL, MSFT, TSLA.",
-                reply_markup=main_menu(),
+    name = symbol_index.name(stock_data["symbol"])
+    if name:
+        lines.append(name)
+
+    if stock_data["current_price"]:
+        lines.append(f"Current Price: ${stock_data['current_price']:.2f}")
+
+    lines.append("")
+
+    performances = stock_data["performances"]
+    for period, change in performances.items():
+        period_text = window_label(period)
+        if change is not None:
+            change_icon = "🟢" if change >= 0 else "🔴"
+            lines.append(f"{change_icon} {period_text}: {change:+}%")
+        else:
+            lines.append(f"⭕ {period_text}: No data")
+
+    return "\n".join(lines)
+
+
+def format_ranking(results, title, limit, period_text) -> str:
+    lines = []
+    for i, item in enumerate(results, 1):
+        change_icon = "🟢" if item["change"] >= 0 else "🔴"
+        lines.append(f"{i}. {change_icon} {item['symbol']}: {item['change']:+}%")
+
+    return f"{title} {limit} Performers ({period_text})\n\n" + "\n".join(lines)
+
+
+def parse_period_args(args):
+    """
+    Split command arguments into (period key, remaining args).
+    Accepts a window key (ytd, 6mo, ...) or a START END date range.
+    """
+    if len(args) >= 2:
+        try:
+            start, end = (datetime.strptime(a, "%Y-%m-%d").date() for a in args[-2:])
+            key = range_key(start, end)
+            if get_window(key):
+                return key, args[:-2]
+        except ValueError:
+            pass
+
+    for i, arg in enumerate(args):
+        if arg.lower() in WINDOWS:
+            return arg.lower(), args[:i] + args[i + 1 :]
+
+    return None, args
+
+
+async def ranking_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/best [universe] [period | START END] [limit] and /worst ..."""
+    prefix = "best" if update.message.text.lstrip("/").lower().startswith("best") else "worst"
+    args = context.args or []
+    universes = [
+        a.lower() for a in args if a.lower() in UNIVERSES or a.lower() == WATCHLIST_UNIVERSE
+    ]
+    universe = universes[0] if universes else selected_universe(context)
+    period, rest = parse_period_args([a for a in args if a.lower() not in universes])
+    period = period or "24h"
+    limit = min(int(rest[0]), MAX_COMMAND_LIMIT) if rest and rest[0].isdigit() else 5
+
+    scope = universe_scope(universe, update.message.chat_id)
+    if scope.get("symbols") == []:
+        await outbox.reply(
+            update.message, "⭐ Your watchlist is empty. Add symbols with /watch AAPL MSFT."
+        )
+        return
+
+    if prefix == "best":
+        results, title = await run_in_thread(best_performers, period, limit, **scope), "📈 Top"
+    else:
+        results, title = await run_in_thread(worst_performers, period, limit, **scope), "📉 Bottom"
+
+    if not results:
+        await outbox.reply(
+            update.message,
+            f"❌ No data available for {ranking_label(period, universe)} period.",
+            reply_markup=timeframe_menu(prefix, universe),
+        )
+        return
+
+    await outbox.reply(
+        update.message,
+        format_ranking(results, title, limit, ranking_label(period, universe)),
+        reply_markup=results_menu(prefix, period, limit),
+    )
+
+
+def format_screen(key, results) -> str:
+    condition = CONDITIONS[key]
+    if not results:
+        return f"🧪 {condition.label}\n\nNo matches."
+
+    lines = [
+        f"{i}. {r['symbol']}: {r['value']:+.2f}{condition.unit}"
+        for i, r in enumerate(results[:SCREEN_RESULTS], 1)
+    ]
+    more = (
+        f"\n... and {len(results) - SCREEN_RESULTS} more" if len(results) > SCREEN_RESULTS else ""
+    )
+    return f"🧪 {condition.label} ({len(results)} matches)\n\n" + "\n".join(lines) + more
+
+
+async def screen_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/screen [condition]"""
+    key = (context.args or [""])[0].lower()
+    if key not in CONDITIONS:
+        await outbox.reply(
+            update.message, "🧪 Screener\n\nPick a condition:", reply_markup=screener_menu()
+        )
+        return
+
+    results = await run_in_thread(screener.screen, key)
+    await outbox.reply(update.message, format_screen(key, results), reply_markup=screener_menu())
+
+
+def format_backtest(strategy, result, period_text) -> str:
+    hit = f", hit rate {result['hit_rate']:.0f}%" if result["hit_rate"] is not None else ""
+    return (
+        f"🧪 Backtest: {strategy.label}\n{result['symbol']}, {period_text}\n\n"
+        f"Strategy return: {result['total_return']:+.2f}%\n"
+        f"Buy and hold: {result['buy_hold']:+.2f}%\n"
+        f"Max drawdown: {result['max_drawdown']:.2f}%\n"
+        f"Trades: {result['trades']}{hit}\n"
+        f"Time in market: {result['exposure']:.0f}%"
+    )
+
+
+def format_backtest_universe(strategy, results, period_text) -> str:
+    summary = summarize(results)
+    ranked = sorted(results, key=lambda r: r["total_return"], reverse=True)
+    top = "\n".join(f"🟢 {r['symbol']}: {r['total_return']:+.2f}%" for r in ranked[:5])
+    bottom = "\n".join(f"🔴 {r['symbol']}: {r['total_return']:+.2f}%" for r in ranked[-5:])
+    return (
+        f"🧪 Backtest: {strategy.label}\n{summary['symbols']} symbols, {period_text}\n\n"
+        f"Median return: {summary['median_return']:+.2f}%\n"
+        f"Median buy and hold: {summary['median_buy_hold']:+.2f}%\n"
+        f"Beat buy and hold: {summary['beat_buy_hold']:.0f}% of symbols\n"
+        f"Median max drawdown: {summary['median_drawdown']:.2f}%\n"
+        f"Average hit rate: {summary['hit_rate']:.0f}% over {summary['trades']} trades\n\n"
+        f"Best\n{top}\n\nWorst\n{bottom}"
+    )
+
+
+async def backtest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/backtest STRATEGY [SYMBOL | all] [period | START END]"""
+    args = context.args or []
+    if not args or args[0].lower() not in STRATEGIES:
+        strategies = "\n".join(f"{key} - {s.label}" for key, s in STRATEGIES.items())
+        await outbox.reply(
+            update.message,
+            "🧪 Usage: /backtest sma AAPL 1y or /backtest rsi all 5y\n\n" + strategies,
+        )
+        return
+
+    strategy = STRATEGIES[args[0].lower()]
+    period, rest = parse_period_args(args[1:])
+    period = period or "1y"
+    target = rest[0].upper() if rest else "ALL"
+
+    if target != "ALL" and len(symbol_index) and target not in symbol_index:
+        await outbox.reply(update.message, f"❓ {target} is not an S&P 500 symbol.")
+        return
+
+    progress_msg = await outbox.reply(update.message, f"⚡ Backtesting {strategy.label}...")
+
+    if target == "ALL":
+        results = await run_in_thread(backtester.run_universe, strategy.key, period)
+        text = (
+            format_backtest_universe(strategy, results, window_label(period)) if results else None
+        )
+    else:
+        result = await run_in_thread(backtester.run_symbol, strategy.key, target, period)
+        text = format_backtest(strategy, result, window_label(period)) if result else None
+
+    await outbox.edit(
+        progress_msg, text or f"❌ Not enough history for a {window_label(period)} backtest."
+    )
+
+
+async def compare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/compare AAPL MSFT NVDA [period | START END]"""
+    period, rest = parse_period_args(context.args or [])
+    period = period or "1y"
+    known, unknown = _known_symbols(rest)
+    symbols = list(dict.fromkeys(known))[:MAX_COMPARE]
+
+    if len(symbols) < 2:
+        hint = f"❓ Not S&P 500 symbols: {', '.join(unknown)}\n\n" if unknown else ""
+        await outbox.reply(
+            update.message,
+            hint + f"📊 Usage: /compare AAPL MSFT NVDA [period] (2 to {MAX_COMPARE} symbols)",
+        )
+        return
+
+    chat_id = update.message.chat_id
+    progress_msg = await outbox.reply(update.message, f"⚡ Comparing {', '.join(symbols)}...")
+
+    overlay = await run_in_thread(chart_service.generate_comparison_chart, symbols, period)
+    matrix_image, result = await run_in_thread(
+        chart_service.generate_correlation_chart, symbols, period
+    )
+
+    if overlay is None or result is None:
+        await outbox.edit(progress_msg, f"❌ Not enough common history for {window_label(period)}.")
+        return
+
+    await outbox.delete(progress_msg)
+    await outbox.send_photo(
+        context.bot,
+        chat_id,
+        photo=overlay,
+        caption=f"📊 {', '.join(symbols)} - {window_label(period)}",
+    )
+    beta_lines = "\n".join(
+        f"{symbol}: β {beta:.2f}" for symbol, beta in result["beta"].items() if beta == beta
+    )
+    await outbox.send_photo(
+        context.bot,
+        chat_id,
+        photo=matrix_image,
+        caption=f"Correlation of daily returns\nBeta vs {BENCHMARK}:\n{beta_lines}",
+    )
+
+
+async def correlated_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/correlated AAPL [period]: universe members moving most and least like a symbol"""
+    period, rest = parse_period_args(context.args or [])
+    period = period or "1y"
+    known, _unknown = _known_symbols(rest[:1])
+    if not known:
+        await outbox.reply(update.message, "🔗 Usage: /correlated AAPL [period]")
+        return
+
+    symbol = known[0]
+    most = await run_in_thread(correlation_table.neighbours, symbol, period, 10, True)
+    if not most:
+        await outbox.reply(update.message, f"❌ Not enough history for {symbol}.")
+        return
+    least = await run_in_thread(correlation_table.neighbours, symbol, period, 5, False)
+    beta = await run_in_thread(correlation_table.beta, symbol, period)
+
+    def rows(items):
+        return "\n".join(
+            f"{r['symbol']:<6}{r['correlation']:>+7.2f}"
+            + (f"  β {r['beta']:.2f}" if r["beta"] is not None else "")
+            for r in items
+        )
+
+    beta_text = f"\nBeta vs {BENCHMARK}: {beta:.2f}" if beta is not None else ""
+    await outbox.reply(
+        update.message,
+        f"🔗 {symbol} correlations ({window_label(period)}){beta_text}\n\n"
+        f"Most correlated\n<pre>{rows(most)}</pre>\n"
+        f"Least correlated\n<pre>{rows(least)}</pre>",
+        parse_mode="HTML",
+    )
+
+
+def format_watchlist(symbols, quotes) -> str:
+    if not symbols:
+        return (
+            "⭐ Your watchlist is empty.\n\nAdd symbols with /watch AAPL MSFT or from a stock view."
+        )
+
+    rows = []
+    for symbol in symbols:
+        if quotes is not None and symbol in quotes.index and quotes.at[symbol, "price"] > 0:
+            price, change = quotes.at[symbol, "price"], quotes.at[symbol, "change"]
+            icon = "⭕" if change != change else ("🟢" if change >= 0 else "🔴")
+            change_text = "" if change != change else f"{change:>+7.2f}%"
+            rows.append(f"{icon} {symbol:<6}{price:>10.2f}{change_text}")
+        else:
+            rows.append(f"⭕ {symbol:<6}{'no data':>10}")
+
+    return "⭐ Watchlist (today)\n\n<pre>" + "\n".join(rows) + "</pre>"
+
+
+def format_alert(alert) -> str:
+    unit = "%" if alert.metric == "change" else ""
+    prefix = "" if unit else "$"
+    value = f"{alert.threshold:+.2f}" if unit else f"{alert.threshold:.2f}"
+    return f"#{alert.id} {alert.symbol} {METRICS[alert.metric]} {alert.direction} {prefix}{value}{unit}"
+
+
+def _known_symbols(args):
+    """Upper-cased symbols from command arguments, split into (known, unknown)"""
+    symbols = [a.upper().strip(",") for a in args if a.strip(",")]
+    if not len(symbol_index):
+        return symbols, []
+    return [s for s in symbols if s in symbol_index], [s for s in symbols if s not in symbol_index]
+
+
+async def watch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/watch shows the watchlist, /watch AAPL MSFT adds to it"""
+    chat_id = update.message.chat_id
+    known, unknown = _known_symbols(context.args or [])
+
+    lines = []
+    if known:
+        added = watchlists.add(chat_id, known)
+        if added:
+            lines.append("⭐ Added: " + ", ".join(added))
+        if len(added) < len(known):
+            lines.append(f"Already watched or list full (max {MAX_WATCHLIST}).")
+    if unknown:
+        lines.append("❓ Not S&P 500 symbols: " + ", ".join(unknown))
+
+    symbols = watchlists.get(chat_id)
+    quotes = await run_in_thread(latest_quotes, symbols) if symbols else None
+    lines.append(format_watchlist(symbols, quotes))
+
+    await outbox.reply(
+        update.message,
+        "\n\n".join(lines),
+        parse_mode="HTML",
+        reply_markup=watchlist_menu(symbols),
+    )
+
+
+async def unwatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/unwatch AAPL MSFT"""
+    known, unknown = _known_symbols(context.args or [])
+    removed = watchlists.remove(update.message.chat_id, known + unknown)
+    text = "🗑 Removed: " + ", ".join(removed) if removed else "Usage: /unwatch AAPL MSFT"
+    await outbox.reply(update.message, text)
+
+
+def parse_alert_args(args):
+    """
+    (symbol, metric, direction, threshold) from /alert arguments, or None.
+    AAPL above 200, AAPL below 150, AAPL up 5%, AAPL down 3%, AAPL above 2%
+    """
+    if len(args) != 3 or args[1].lower() not in ALERT_WORDS:
+        return None
+
+    direction, percent = ALERT_WORDS[args[1].lower()]
+    raw = args[2].strip("$")
+    percent = percent or raw.endswith("%")
+    try:
+        threshold = float(raw.rstrip("%"))
+    except ValueError:
+        return None
+
+    if percent:
+        # "down 3%" means a change of -3% or worse
+        if args[1].lower() == "down":
+            threshold = -abs(threshold)
+        return args[0].upper(), "change", direction, threshold
+    if threshold <= 0:
+        return None
+    return args[0].upper(), "price", direction, threshold
+
+
+async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/alert lists alerts, /alert AAPL above 200 or /alert AAPL up 5% adds one"""
+    chat_id = update.message.chat_id
+    args = context.args or []
+
+    if not args:
+        alerts = alert_book.for_chat(chat_id)
+        if not alerts:
+            text = (
+                "🔔 No alerts set.\n\n"
+                "Examples:\n/alert AAPL above 200\n/alert TSLA below 150\n"
+                "/alert NVDA up 5%\n/alert MSFT down 3%"
             )
-            context.user_data["awaiting_stock"] = False
-            return
+        else:
+            text = "🔔 Your alerts\n\n" + "\n".join(format_alert(a) for a in alerts)
+            text += "\n\nRemove one with /unalert ID"
+        await outbox.reply(update.message, text)
+        return
+
+    parsed = parse_alert_args(args)
+    if parsed is None:
+        await outbox.reply(update.message, "❌ Usage: /alert AAPL above 200, /alert AAPL up 5%")
+        return
+
+    symbol, metric, direction, threshold = parsed
+    if len(symbol_index) and symbol not in symbol_index:
+        await outbox.reply(update.message, f"❓ {symbol} is not an S&P 500 symbol.")
+        return
+
+    try:
+        alert = alert_book.add(chat_id, symbol, metric, direction, threshold)
+    except ValueError as e:
+        await outbox.reply(update.message, f"❌ {e}")
+        return
+
+    await outbox.reply(update.message, f"🔔 Alert set: {format_alert(alert)}")
+
+
+async def unalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/unalert ID"""
+    args = context.args or []
+    alert_id = args[0].lstrip("#") if args else ""
+    if alert_id.isdigit() and alert_book.remove(update.message.chat_id, int(alert_id)):
+        await outbox.reply(update.message, f"🗑 Alert #{alert_id} removed.")
+    else:
+        await outbox.reply(update.message, "❌ Usage: /unalert ID (see /alert for your alerts)")
+
+
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/digest [daily | premarket | off]"""
+    chat_id = update.message.chat_id
+    choice = (context.args or [""])[0].lower()
+
+    if choice == "off":
+        removed = subscriptions.unsubscribe(chat_id)
+        await outbox.reply(
+            update.message, "🔕 Digest unsubscribed." if removed else "You are not subscribed."
+        )
+        return
 
-        stock_data = get_stock_performance(symbol)
+    if choice in SCHEDULES:
+        subscriptions.subscribe(chat_id, choice)
 
-        if not stock_data:
-            await update.message.reply_text(
-                f"❌ Could not find data for {symbol}.", reply_markup=main_menu()
+    current = subscriptions.get(chat_id)
+    if current is None:
+        options = ", ".join(f"/digest {key} ({when})" for key, when in SCHEDULES.items())
+        await outbox.reply(
+            update.message, f"📰 Market digest: movers, sectors and charts.\n\n{options}"
+        )
+        return
+
+    when = datetime.fromtimestamp(next_run(current), EXCHANGE_TZ).strftime("%d/%m %H:%M ET")
+    await outbox.reply(
+        update.message,
+        f"📰 Subscribed to the {current} digest ({SCHEDULES[current]}), next one {when}.\n"
+        "/digest off to unsubscribe.",
+    )
+
+
+async def _send_profile(bot, chat_id):
+    report = await run_in_thread(profiler.wait)
+    if report is None:
+        await outbox.send_message(bot, chat_id, "❌ Profile report could not be written.")
+        return
+    await outbox.send_message(bot, chat_id, format_report(report))
+    with open(report.path, "rb") as f:
+        await outbox.call(chat_id, bot.send_document, chat_id, f, filename=report.path.name)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile [30s | 2m | 200 | stop] - admin-only sampling profile of live handlers"""
+    # Telegram user ids allowed to profile, comma separated (read late: .env loads after import)
+    admins = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+    user = update.effective_user
+    if user is None or user.id not in admins:
+        return
+
+    arg = context.args[0] if context.args else "30s"
+    if arg.lower() == "stop":
+        if profiler.active:
+            profiler.stop()
+        else:
+            await outbox.reply(update.message, "No profile running.")
+        return
+
+    budget = parse_budget(arg)
+    if budget is None:
+        await outbox.reply(
+            update.message, "Usage: /profile 30s, /profile 2m, /profile 200 (handler calls)"
+        )
+        return
+    if not profiler.start(*budget):
+        await outbox.reply(update.message, "A profile is already running (/profile stop).")
+        return
+
+    seconds, calls = budget
+    scope = f"the next {calls} handler calls" if calls else f"{seconds}s"
+    await outbox.reply(update.message, f"🔬 Profiling {scope}...")
+    # Reported from a task so the wait does not hold up other updates
+    asyncio.create_task(_send_profile(context.bot, update.message.chat_id))
+
+
+def format_sector_table(summary) -> str:
+    periods = [p for p in MENU_WINDOWS if p in summary.columns]
+
+    header = f"{'Sector':<8}" + "".join(f"{WINDOWS[p].button:>7}" for p in periods)
+    rows = [header]
+    for sector, row in summary.iterrows():
+        cells = "".join(f"{row[p]:>+7.1f}" if row[p] == row[p] else f"{'-':>7}" for p in periods)
+        rows.append(f"{SECTOR_SHORT.get(sector, sector)[:8]:<8}{cells}")
+
+    return "🏭 Sector Performance (avg %)\n\n<pre>" + "\n".join(rows) + "</pre>"
+
+
+async def reply_stock(message, query: str, extra_periods=None):
+    """Reply with performance for a symbol, or "did you mean" buttons if it is unknown"""
+    symbol = query.upper().strip()
+
+    if len(symbol_index) and symbol not in symbol_index:
+        suggestions = symbol_index.search(query)
+        if suggestions:
+            await outbox.reply(
+                message,
+                f"❓ {symbol} is not an S&P 500 symbol. Did you mean:",
+                reply_markup=suggestion_menu(suggestions),
             )
         else:
-            lines = []
-            lines.append(f"<b>{stock_data['symbol']}</b>")
-
-            if stock_data["current_price"]:
-                lines.append(f"Current Price: ${stock_data['current_price']:.2f}")
-
-            lines.append("")
-
-            performances = stock_data["performances"]
-            for period, change in performances.items():
-                if change is not None:
-                    period_text = {
-                        "24h": "24 Hours",
-                        "7d": "7 Days",
-                        "30d": "30 Days",
-                        "3mo": "3 Months",
-                        "1y": "1 Year",
-                    }[period]
-                    change_icon = "🟢" if change >= 0 else "🔴"
-                    lines.append(f"{change_icon} {period_text}: {change:+}%")
-                else:
-                    period_text = {
-                        "24h": "24 Hours",
-                        "7d": "7 Days",
-                        "30d": "30 Days",
-                        "3mo": "3 Months",
-                        "1y": "1 Year",
-                    }[period]
-                    lines.append(f"⭕ {period_text}: No data")
-
-            text = "\n".join(lines)
-
-            await update.message.reply_text(
-                text, parse_mode="HTML", reply_markup=search_stock_menu(symbol)
+            await outbox.reply(
+                message,
+                f"❌ {symbol} not found in S&P 500. Try symbols like AAPL, MSFT, TSLA.",
+                reply_markup=main_menu(),
             )
+        return
 
+    stock_data = await run_in_thread(get_stock_performance, symbol, extra_periods)
+
+    if not stock_data:
+        await outbox.reply(
+            message, f"❌ Could not find data for {symbol}.", reply_markup=main_menu()
+        )
+    else:
+        await outbox.reply(
+            message,
+            format_stock_performance(stock_data),
+            parse_mode="HTML",
+            reply_markup=search_stock_menu(symbol),
+        )
+        prefetcher.on_stock(message.chat_id, symbol)
+
+
+async def stock_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stock SYMBOL [period | START END] or /stock company name"""
+    period, rest = parse_period_args(context.args or [])
+    if not rest:
+        await outbox.reply(
+            update.message,
+            "🔍 Usage: /stock AAPL, /stock apple or /stock AAPL 2024-01-01 2024-06-30",
+            reply_markup=search_prompt_menu(),
+        )
+        return
+    extra = [period] if period and period not in MENU_WINDOWS else []
+    await reply_stock(update.message, " ".join(rest), extra)
+
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ticker autocomplete for @bot inline queries"""
+    query = update.inline_query.query
+    suggestions = symbol_index.search(query, limit=INLINE_RESULTS) if query else []
+
+    results = [
+        InlineQueryResultArticle(
+            id=s["symbol"],
+            title=s["symbol"],
+            description=s["name"] or None,
+            input_message_content=InputTextMessageContent(f"/stock {s['symbol']}"),
+        )
+        for s in suggestions
+    ]
+    await update.inline_query.answer(results, cache_time=300)
+
+
+@profiled("handle_message", handler=True)
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle regular messages for stock search"""
+    if context.user_data.get("awaiting_stock"):
+        await reply_stock(update.message, update.message.text)
         context.user_data["awaiting_stock"] = False
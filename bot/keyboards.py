@@ -1,12 +1,19 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from services.returns import MENU_WINDOWS, WINDOWS
+from services.screener import CONDITIONS
+from services.universe import DEFAULT_UNIVERSE, UNIVERSES, WATCHLIST_UNIVERSE
+
 
 def main_menu():
     return InlineKeyboardMarkup(
         [
             [InlineKeyboardButton("📈 Best Performers", callback_data="best")],
             [InlineKeyboardButton("📉 Worst Performers", callback_data="worst")],
+            [InlineKeyboardButton("🏭 Sectors and Heatmap", callback_data="sectors")],
+            [InlineKeyboardButton("🧪 Screener", callback_data="screener")],
             [InlineKeyboardButton("🔍 Search and Charts", callback_data="search")],
+            [InlineKeyboardButton("⭐ Watchlist", callback_data="watchlist")],
         ]
     )
 
@@ -30,6 +37,7 @@ def search_stock_menu(symbol):
                     "📈 RSI, MACD, ATR", callback_data=f"chartselect:indicators:{clean_symbol}"
                 ),
             ],
+            [InlineKeyboardButton("⭐ Add to Watchlist", callback_data=f"watch:{clean_symbol}")],
             [
                 InlineKeyboardButton("🔍 Search Another", callback_data="search"),
                 InlineKeyboardButton("🏠 Home", callback_data="menu"),
@@ -38,6 +46,26 @@ def search_stock_menu(symbol):
     )
 
 
+def suggestion_menu(suggestions):
+    """ "Did you mean" buttons for an unknown symbol"""
+    buttons = [
+        [
+            InlineKeyboardButton(
+                f"{s['symbol']} - {s['name']}" if s["name"] else s["symbol"],
+                callback_data=f"stock_back:{s['symbol']}",
+            )
+        ]
+        for s in suggestions
+    ]
+    buttons.append(
+        [
+            InlineKeyboardButton("🔍 Search Again", callback_data="search"),
+            InlineKeyboardButton("🏠 Home", callback_data="menu"),
+        ]
+    )
+    return InlineKeyboardMarkup(buttons)
+
+
 def stock_result_menu(symbol, has_chart=True):
     """Menu after showing stock performance - same as above"""
     buttons = []
@@ -77,6 +105,8 @@ def chart_period_menu(symbol, chart_type="price"):
             [
                 InlineKeyboardButton("3M", callback_data=f"chart:{chart_type}:{symbol}:3mo"),
                 InlineKeyboardButton("1Y", callback_data=f"chart:{chart_type}:{symbol}:1y"),
+                InlineKeyboardButton("5Y", callback_data=f"chart:{chart_type}:{symbol}:5y"),
+                InlineKeyboardButton("MAX", callback_data=f"chart:{chart_type}:{symbol}:max"),
             ],
             [
                 InlineKeyboardButton("◀️ Back", callback_data=f"stock_back:{symbol}"),
@@ -86,21 +116,37 @@ def chart_period_menu(symbol, chart_type="price"):
     )
 
 
-def timeframe_menu(prefix):
-    """Select timeframe (today/7d/30d)"""
+def _window_rows(callback, icon="", per_row=3):
+    """Buttons for every menu window, `callback` maps a window key to callback data"""
+    buttons = [
+        InlineKeyboardButton(f"{icon}{WINDOWS[key].button}", callback_data=callback(key))
+        for key in MENU_WINDOWS
+    ]
+    return [buttons[i : i + per_row] for i in range(0, len(buttons), per_row)]
+
+
+def universe_label(key):
+    return "⭐ Watchlist" if key == WATCHLIST_UNIVERSE else UNIVERSES[key].label
+
+
+def _universe_row(prefix, selected):
+    """Universe switch; the chat's watchlist doubles as a custom universe"""
+    return [
+        InlineKeyboardButton(
+            ("✅ " if key == selected else "") + universe_label(key),
+            callback_data=f"uni:{prefix}:{key}",
+        )
+        for key in list(UNIVERSES) + [WATCHLIST_UNIVERSE]
+    ]
+
+
+def timeframe_menu(prefix, universe=DEFAULT_UNIVERSE):
+    """Select universe and timeframe (every registered menu window)"""
+    universes = _universe_row(prefix, universe)
     return InlineKeyboardMarkup(
-        [
-            [
-                InlineKeyboardButton("Today", callback_data=f"{prefix}_24h"),
-                InlineKeyboardButton("7d", callback_data=f"{prefix}_7d"),
-                InlineKeyboardButton("30d", callback_data=f"{prefix}_30d"),
-            ],
-            [
-                InlineKeyboardButton("3m", callback_data=f"{prefix}_3mo"),
-                InlineKeyboardButton("1y", callback_data=f"{prefix}_1y"),
-            ],
-            [InlineKeyboardButton("🏠 Home", callback_data="menu")],
-        ]
+        [universes[i : i + 2] for i in range(0, len(universes), 2)]
+        + _window_rows(lambda key: f"{prefix}_{key}")
+        + [[InlineKeyboardButton("🏠 Home", callback_data="menu")]]
     )
 
 
@@ -133,3 +179,37 @@ def results_menu(prefix, period, limit):
             ],
         ]
     )
+
+
+def sectors_menu():
+    """Heatmap timeframes shown under the sector table"""
+    return InlineKeyboardMarkup(
+        _window_rows(lambda key: f"heatmap:{key}", icon="🗺 ")
+        + [[InlineKeyboardButton("🏠 Home", callback_data="menu")]]
+    )
+
+
+def watchlist_menu(symbols):
+    """One button per watched symbol, opening its performance view"""
+    buttons = [
+        InlineKeyboardButton(symbol, callback_data=f"stock_back:{symbol}") for symbol in symbols
+    ]
+    rows = [buttons[i : i + 4] for i in range(0, len(buttons), 4)]
+    rows.append(
+        [
+            InlineKeyboardButton("🔄 Refresh", callback_data="watchlist"),
+            InlineKeyboardButton("🏠 Home", callback_data="menu"),
+        ]
+    )
+    return InlineKeyboardMarkup(rows)
+
+
+def screener_menu():
+    """One button per registered screener condition"""
+    buttons = [
+        InlineKeyboardButton(condition.button, callback_data=f"screen:{key}")
+        for key, condition in CONDITIONS.items()
+    ]
+    rows = [buttons[i : i + 2] for i in range(0, len(buttons), 2)]
+    rows.append([InlineKeyboardButton("🏠 Home", callback_data="menu")])
+    return InlineKeyboardMarkup(rows)
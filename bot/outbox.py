@@ -0,0 +1,359 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+from datetime import timedelta
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+
+from telegram.error import BadRequest, RetryAfter
+
+# Telegram allows roughly 30 messages/s per bot and about one per second per chat
+GLOBAL_RATE = 25.0
+GLOBAL_BURST = 30
+CHAT_RATE = 1.0
+CHAT_BURST = 4
+MAX_IN_FLIGHT = 16
+MAX_TRACKED_CHATS = 5000
+# RetryAfter in this many chats within FLOOD_WINDOW seconds is a bot-wide flood wait
+FLOOD_CHATS = 2
+FLOOD_WINDOW = 5.0
+
+# Lower value goes first
+PRIORITY_FINAL = 0  # answers the user is waiting for
+PRIORITY_BULK = 1  # notifications and broadcasts
+PRIORITY_PROGRESS = 2  # spinner / elapsed-time edits, droppable
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds: float, now: float):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class _Job:
+    __slots__ = (
+        "priority",
+        "seq",
+        "chat_id",
+        "func",
+        "args",
+        "kwargs",
+        "future",
+        "merge_key",
+        "dropped",
+    )
+
+    def __init__(self, priority, seq, chat_id, func, args, kwargs, future, merge_key):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.merge_key = merge_key
+        self.dropped = False
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Outbox:
+    """
+    Outbound Telegram call scheduler.
+
+    Every send/edit goes through per-chat and global token buckets. Final
+    answers are dispatched before notifications, which go before progress
+    edits. A newer progress edit replaces a pending one for the same message,
+    and a final edit drops them. RetryAfter pauses the chat and retries.
+
+    Pending jobs sit in a heap per chat. A ready heap holds the head of every
+    chat that may send now; busy chats rejoin it when their call returns and
+    rate-limited ones when their bucket refills, so dispatch never scans the
+    whole backlog.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = GLOBAL_RATE,
+        global_burst: int = GLOBAL_BURST,
+        chat_rate: float = CHAT_RATE,
+        chat_burst: int = CHAT_BURST,
+    ):
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._queues: Dict[Any, List[_Job]] = {}
+        self._ready: List[tuple] = []  # (priority, seq, chat_id) of chat heads
+        self._sleeping: List[tuple] = []  # (ready_at, chat_id) of rate-limited chats
+        self._sleeping_chats: set = set()
+        self._merge: Dict[Hashable, _Job] = {}
+        self._busy_chats: set = set()
+        self._seq = itertools.count()
+        # Events bind to a loop on first use; _ensure_running replaces it per loop
+        self._wakeup = asyncio.Event()
+        self._flood: Deque[Tuple[float, Any]] = collections.deque()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = 0
+        self.stats = {"sent": 0, "merged": 0, "dropped": 0, "retry_after": 0}
+
+    # --- Public API ---
+
+    def submit(
+        self,
+        chat_id,
+        func,
+        /,
+        *args,
+        priority: int = PRIORITY_FINAL,
+        merge_key: Optional[Hashable] = None,
+        **kwargs,
+    ) -> "asyncio.Future":
+        """
+        Queue a Bot API call; the returned future resolves with its result.
+        chat_id and func are positional-only so they never clash with API keywords.
+        """
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+
+        if merge_key is not None and merge_key in self._merge:
+            # Superseded: keep the queue slot, swap in the newest payload
+            job = self._merge[merge_key]
+            job.args, job.kwargs, job.func = args, kwargs, func
+            if not job.future.done():
+                job.future.set_result(None)
+            job.future = future
+            self.stats["merged"] += 1
+            return future
+
+        job = _Job(priority, next(self._seq), chat_id, func, args, kwargs, future, merge_key)
+        self._push(job)
+        self._wakeup.set()
+        return future
+
+    async def call(self, chat_id, func, /, *args, priority: int = PRIORITY_FINAL, **kwargs):
+        return await self.submit(chat_id, func, *args, priority=priority, **kwargs)
+
+    async def send_message(self, bot, chat_id, text: str, priority: int = PRIORITY_FINAL, **kwargs):
+        return await self.call(
+            chat_id, bot.send_message, priority=priority, chat_id=chat_id, text=text, **kwargs
+        )
+
+    async def send_photo(self, bot, chat_id, photo, priority: int = PRIORITY_FINAL, **kwargs):
+        return await self.call(
+            chat_id, bot.send_photo, priority=priority, chat_id=chat_id, photo=photo, **kwargs
+        )
+
+    async def reply(self, message, text: str, **kwargs):
+        return await self.call(message.chat_id, message.reply_text, text, **kwargs)
+
+    async def edit(self, message, text: str, **kwargs):
+        """Final edit of a message; pending progress edits for it are dropped"""
+        self._drop(("progress", message.chat_id, message.message_id))
+        return await self.call(message.chat_id, message.edit_text, text, **kwargs)
+
+    async def edit_query(self, query, text: str, **kwargs):
+        message = query.message
+        self._drop(("progress", message.chat_id, message.message_id))
+        return await self.call(message.chat_id, query.edit_message_text, text, **kwargs)
+
+    async def delete(self, message):
+        self._drop(("progress", message.chat_id, message.message_id))
+        return await self.call(message.chat_id, message.delete)
+
+    def progress(self, message, text: str, **kwargs):
+        """Fire-and-forget status edit; only the newest pending one per message is sent"""
+        self.submit(
+            message.chat_id,
+            message.edit_text,
+            text,
+            priority=PRIORITY_PROGRESS,
+            merge_key=("progress", message.chat_id, message.message_id),
+            **kwargs,
+        )
+
+    # --- Scheduling ---
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._queues, self._ready, self._sleeping = {}, [], []
+            self._merge, self._busy_chats, self._sleeping_chats = {}, set(), set()
+            self._in_flight = 0
+            self._task = loop.create_task(self._run())
+
+    def _push(self, job: _Job):
+        queue = self._queues.setdefault(job.chat_id, [])
+        heapq.heappush(queue, job)
+        if job.merge_key is not None:
+            self._merge[job.merge_key] = job
+        if queue[0] is job:
+            self._schedule(job.chat_id)
+
+    def _head(self, chat_id) -> Optional[_Job]:
+        """Oldest highest-priority live job of a chat; dropped jobs are discarded here"""
+        queue = self._queues.get(chat_id)
+        while queue and queue[0].dropped:
+            heapq.heappop(queue)
+        if not queue:
+            self._queues.pop(chat_id, None)
+            return None
+        return queue[0]
+
+    def _schedule(self, chat_id):
+        """Put a chat's head on the ready heap, unless it is in flight or rate-limited"""
+        if chat_id in self._busy_chats or chat_id in self._sleeping_chats:
+            return
+        head = self._head(chat_id)
+        if head is not None:
+            heapq.heappush(self._ready, (head.priority, head.seq, chat_id))
+
+    def _drop(self, merge_key: Hashable):
+        # Anything still in _merge is pending; the heap entry is skipped lazily
+        job = self._merge.pop(merge_key, None)
+        if job is not None:
+            job.dropped = True
+            if not job.future.done():
+                job.future.set_result(None)
+            self.stats["dropped"] += 1
+
+    def _flooded(self, chat_id, now: float) -> bool:
+        """Record a RetryAfter; True once several chats got one within FLOOD_WINDOW"""
+        self._flood.append((now, chat_id))
+        while self._flood and self._flood[0][0] < now - FLOOD_WINDOW:
+            self._flood.popleft()
+        return len({chat for _t, chat in self._flood}) >= FLOOD_CHATS
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > MAX_TRACKED_CHATS:
+                self._prune_chats()
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    def _prune_chats(self):
+        """Forget buckets that are full again, they carry no state worth keeping"""
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chats.items()):
+            if bucket.wait_time(now) == 0 and bucket.tokens >= bucket.burst:
+                del self._chats[chat_id]
+
+    def _next_job(self, now: float):
+        """Highest-priority job that may go out now, else how long to wait"""
+        wait = self._global.wait_time(now)
+        if wait > 0 or self._in_flight >= MAX_IN_FLIGHT:
+            return None, max(wait, 0.01)
+
+        while self._sleeping and self._sleeping[0][0] <= now:
+            _, chat_id = heapq.heappop(self._sleeping)
+            self._sleeping_chats.discard(chat_id)
+            self._schedule(chat_id)
+
+        while self._ready:
+            _, seq, chat_id = heapq.heappop(self._ready)
+            if chat_id in self._busy_chats or chat_id in self._sleeping_chats:
+                continue
+            head = self._head(chat_id)
+            if head is None or head.seq != seq:
+                # Stale: the head was sent, dropped or overtaken and has its own entry
+                continue
+            chat_wait = self._chat_bucket(chat_id).wait_time(now)
+            if chat_wait == 0:
+                return head, 0.0
+            heapq.heappush(self._sleeping, (now + chat_wait, chat_id))
+            self._sleeping_chats.add(chat_id)
+
+        if self._sleeping:
+            return None, max(self._sleeping[0][0] - now, 0.01)
+        return None, float("inf")
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            job, wait = self._next_job(now)
+
+            if job is None:
+                self._wakeup.clear()
+                timeout = None if wait == float("inf") else wait
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queues[job.chat_id])
+            if job.merge_key is not None:
+                self._merge.pop(job.merge_key, None)
+            self._global.take(now)
+            self._chat_bucket(job.chat_id).take(now)
+            self._busy_chats.add(job.chat_id)
+            self._in_flight += 1
+            asyncio.get_running_loop().create_task(self._dispatch(job))
+
+    async def _dispatch(self, job: _Job):
+        try:
+            result = await job.func(*job.args, **job.kwargs)
+            self.stats["sent"] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        except RetryAfter as e:
+            delay = e.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            self.stats["retry_after"] += 1
+            now = time.monotonic()
+            self._chat_bucket(job.chat_id).block(float(delay), now)
+            if self._flooded(job.chat_id, now):
+                # Telegram is throttling the bot as a whole; pause every chat
+                self._global.block(float(delay), now)
+            if job.merge_key is not None and job.merge_key in self._merge:
+                # A newer progress edit for the same message is already waiting
+                if not job.future.done():
+                    job.future.set_result(None)
+            else:
+                # Back in the queue with its original position
+                self._push(job)
+        except BadRequest as e:
+            # Progress edits race with final edits and deletes; losing one is harmless
+            if job.priority == PRIORITY_PROGRESS:
+                if not job.future.done():
+                    job.future.set_result(None)
+            elif not job.future.done():
+                job.future.set_exception(e)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._busy_chats.discard(job.chat_id)
+            self._schedule(job.chat_id)
+            self._in_flight -= 1
+            self._wakeup.set()
+
+
+# Create a global instance
+outbox = Outbox()
@@ -0,0 +1,299 @@
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Callable, Counter, Deque, Dict, List, Optional, Tuple
+
+from charts.chartlar import ChartService, RenderYielded, chart_service
+from services.market import best_performers, worst_performers
+from services.returns import MENU_WINDOWS
+from services.universe import UNIVERSES
+
+# ("chart", type, symbol, period) or ("ranking", universe, side, period, limit)
+ArtifactKey = Tuple[str, ...]
+
+# PREFETCH_WORKERS=0 disables prefetching
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# Fraction of wall time prefetch jobs may run, over BUDGET_WINDOW. Wall time rather
+# than CPU: ranking prefetches mostly wait on upstream downloads, which are the cost
+WORK_BUDGET = 0.25
+BUDGET_WINDOW = 60.0
+MAX_PENDING = 16
+PREFETCH_TTL = 300  # a prefetched artifact counts as a hit if claimed within this many seconds
+WORKER_NICENESS = 10
+
+# Likely choices before any navigation has been observed, most likely first
+CHART_TYPES = ["price", "indicators"]
+CHART_PERIODS = ["30d", "1y", "3mo", "7d", "1d", "5y", "max"]
+RANKING_LIMITS = ["5", "10", "20"]  # limit_menu options; each limit is its own cached ranking
+STOCK_CHARTS = 1  # artifacts prefetched when a search result appears
+MENU_CHOICES = 2  # artifacts prefetched when a period menu opens
+
+
+class NavigationModel:
+    """
+    Counts which option users pick at each menu step.
+    Candidates are ranked by those counts, with the static order breaking ties.
+    """
+
+    def __init__(self):
+        self._counts: Dict[Tuple[str, str], int] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def record(self, step: str, choice: str):
+        with self._lock:
+            self._counts[(step, choice)] += 1
+
+    def likely(self, step: str, candidates: List[str], k: int) -> List[str]:
+        with self._lock:
+            ranked = sorted(
+                enumerate(candidates), key=lambda c: (-self._counts[(step, c[1])], c[0])
+            )
+        return [choice for _i, choice in ranked[:k]]
+
+
+class _Job:
+    def __init__(self, key: ArtifactKey, chat_id, work: Callable):
+        self.key = key
+        self.chat_id = chat_id
+        self.work = work
+        self.cancelled = False
+        self.future: Optional[concurrent.futures.Future] = None
+
+
+class Prefetcher:
+    """
+    Speculatively fetches and renders what a user is likely to open next.
+
+    Handlers report each menu step; the next artifacts along the keyboard flow
+    (search result -> chart type -> period, timeframe -> limit) are queued on a
+    few low-priority workers. Work waits while foreground chart requests are
+    served and only renders between them (ChartService.background), stops
+    once the work budget for the window is spent, and a chat's queued jobs are
+    cancelled when it moves on. Claims at the point of use feed the hit rate.
+    """
+
+    def __init__(
+        self,
+        service: ChartService,
+        workers: int = PREFETCH_WORKERS,
+        work_budget: float = WORK_BUDGET,
+        window: float = BUDGET_WINDOW,
+    ):
+        self.service = service
+        self.navigation = NavigationModel()
+        self.enabled = workers > 0
+        self.budget = work_budget * window
+        self.window = window
+        self.stats: Counter[str] = collections.Counter()
+
+        self._executor = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="prefetch", initializer=_lower_priority
+            )
+            if self.enabled
+            else None
+        )
+        self._jobs: Dict[ArtifactKey, _Job] = {}
+        self._by_chat: Dict[object, List[_Job]] = collections.defaultdict(list)
+        self._done: Dict[ArtifactKey, float] = {}
+        self._spent: Deque[Tuple[float, float]] = collections.deque()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- Menu steps ---
+
+    def on_stock(self, chat_id, symbol: str):
+        """A search result with chart buttons is on screen"""
+        for chart_type in self.navigation.likely("chart_type", CHART_TYPES, STOCK_CHARTS):
+            period = self.navigation.likely(f"chart_period:{chart_type}", CHART_PERIODS, 1)[0]
+            self._submit_chart(chat_id, chart_type, symbol, period, cancel_others=True)
+
+    def on_chart_menu(self, chat_id, symbol: str, chart_type: str):
+        """chartselect: the period menu for one chart type is open"""
+        self.navigation.record("chart_type", chart_type)
+        periods = self.navigation.likely(f"chart_period:{chart_type}", CHART_PERIODS, MENU_CHOICES)
+        self._cancel_chat(chat_id)
+        for period in periods:
+            self._submit_chart(chat_id, chart_type, symbol, period)
+
+    def on_chart(self, chat_id, symbol: str, chart_type: str, period: str):
+        """A chart was requested"""
+        self.navigation.record(f"chart_period:{chart_type}", period)
+        self.claim(("chart", chart_type, symbol, period))
+
+    def on_timeframe_menu(self, chat_id, universe: str, side: str):
+        """best/worst: the timeframe menu is open"""
+        periods = self.navigation.likely("ranking_period", MENU_WINDOWS, MENU_CHOICES)
+        limit = self.navigation.likely("ranking_limit", RANKING_LIMITS, 1)[0]
+        self._cancel_chat(chat_id)
+        for period in periods:
+            self._submit_ranking(chat_id, universe, side, period, limit)
+
+    def on_limit_menu(self, chat_id, universe: str, side: str, period: str):
+        """A ranking period was picked; only the limit is left"""
+        self.navigation.record("ranking_period", period)
+        limits = self.navigation.likely("ranking_limit", RANKING_LIMITS, MENU_CHOICES)
+        self._cancel_chat(chat_id)
+        for limit in limits:
+            self._submit_ranking(chat_id, universe, side, period, limit)
+
+    def on_ranking(self, chat_id, universe: str, side: str, period: str, limit: int):
+        """A ranking was requested"""
+        self.navigation.record("ranking_limit", str(limit))
+        self.claim(("ranking", universe, side, period, str(limit)))
+
+    # --- Jobs ---
+
+    def _submit_chart(self, chat_id, chart_type, symbol, period, cancel_others=False):
+        # Charts still in the render cache need no work
+        expires_in = self.service.chart_expires_in(chart_type, symbol, period)
+        if expires_in is not None and expires_in > 0:
+            return
+        key = ("chart", chart_type, symbol, period)
+        self._submit(
+            key,
+            chat_id,
+            lambda: self.service.generate_chart(chart_type, symbol, period),
+            cancel_others,
+        )
+
+    def _submit_ranking(self, chat_id, universe, side, period, limit, cancel_others=False):
+        # Watchlist rankings are per chat and cheap to compute on demand
+        if universe not in UNIVERSES:
+            return
+        key = ("ranking", universe, side, period, limit)
+        rank = best_performers if side == "best" else worst_performers
+        self._submit(key, chat_id, lambda: rank(period, int(limit), universe), cancel_others)
+
+    def _submit(self, key: ArtifactKey, chat_id, work: Callable, cancel_others: bool):
+        if not self.enabled or self._stop.is_set():
+            return
+        if cancel_others:
+            self._cancel_chat(chat_id)
+
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if key in self._jobs or key in self._done:
+                return
+            if len(self._jobs) >= MAX_PENDING:
+                self.stats["dropped"] += 1
+                return
+            if self._spent_in_window(now) >= self.budget:
+                self.stats["over_budget"] += 1
+                return
+
+            job = _Job(key, chat_id, work)
+            self._jobs[key] = job
+            self._by_chat[chat_id].append(job)
+            self.stats["submitted"] += 1
+        assert self._executor is not None  # enabled
+        job.future = self._executor.submit(self._run, job)
+
+    def _run(self, job: _Job):
+        # Yield to user traffic
+        while self.service.is_busy and not job.cancelled:
+            if self._stop.wait(0.1):
+                break
+
+        try:
+            if job.cancelled or self._stop.is_set():
+                self.stats["cancelled"] += 1
+                return
+            started = time.monotonic()
+            outcome = "completed"
+            try:
+                with self.service.background():
+                    job.work()
+            except RenderYielded:
+                # A user request arrived mid-render; the artifact is left for on-demand
+                outcome = "yielded"
+            except Exception as e:
+                outcome = "failed"
+                print(f"Prefetch {job.key} failed: {e}")
+            spent = time.monotonic() - started
+
+            # Abandoned work was spent all the same
+            with self._lock:
+                now = time.time()
+                self._spent.append((now, spent))
+                if outcome == "completed":
+                    self._done[job.key] = now
+                self.stats[outcome] += 1
+                self.stats["work_ms"] += int(spent * 1000)
+        finally:
+            with self._lock:
+                self._jobs.pop(job.key, None)
+                jobs = self._by_chat.get(job.chat_id)
+                if jobs is not None and job in jobs:
+                    jobs.remove(job)
+                    if not jobs:
+                        del self._by_chat[job.chat_id]
+
+    def _cancel_chat(self, chat_id):
+        """Drop a chat's queued predictions; the user went somewhere else"""
+        with self._lock:
+            jobs = self._by_chat.pop(chat_id, [])
+            for job in jobs:
+                job.cancelled = True
+                if job.future is not None and job.future.cancel():
+                    self._jobs.pop(job.key, None)
+                    self.stats["cancelled"] += 1
+
+    def _spent_in_window(self, now: float) -> float:
+        while self._spent and self._spent[0][0] < now - self.window:
+            self._spent.popleft()
+        return sum(spent for _t, spent in self._spent)
+
+    def _expire(self, now: float):
+        """Forget prefetched artifacts nobody claimed in time"""
+        for key, finished in list(self._done.items()):
+            if now - finished > PREFETCH_TTL:
+                del self._done[key]
+                self.stats["wasted"] += 1
+
+    # --- Metrics ---
+
+    def claim(self, key: ArtifactKey):
+        """Record a real request: hit if prefetched, late if still in flight, else miss"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if self._done.pop(key, None) is not None:
+                self.stats["hits"] += 1
+            elif key in self._jobs:
+                self.stats["late"] += 1
+            else:
+                self.stats["misses"] += 1
+
+    def report(self) -> dict:
+        counts = self.stats
+        stats: Dict[str, Optional[float]] = dict(counts)
+        claims = counts["hits"] + counts["late"] + counts["misses"]
+        stats["hit_rate"] = round(counts["hits"] / claims, 3) if claims else None
+        # Share of finished prefetch work that a user actually opened
+        completed = counts["completed"]
+        stats["precision"] = round(counts["hits"] / completed, 3) if completed else None
+        stats["pending"] = len(self._jobs)
+        return stats
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _lower_priority():
+    """Run prefetch workers at a lower OS priority where the platform allows it"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+# Create a global instance
+prefetcher = Prefetcher(chart_service)
@@ -1,4 +1,17 @@
 from .chartlar import ChartService, chart_service
+from .encode import ENCODINGS, ChartEncoder, Encoding, chart_encoder, register_encoding
+from .prerender import PopularityTracker, PrerenderScheduler, prerender_scheduler
 
 # Re-export
-__all__ = ["ChartService", "chart_service"]
+__all__ = [
+    "ChartService",
+    "chart_service",
+    "Encoding",
+    "ENCODINGS",
+    "register_encoding",
+    "ChartEncoder",
+    "chart_encoder",
+    "PopularityTracker",
+    "PrerenderScheduler",
+    "prerender_scheduler",
+]
@@ -1,48 +1,258 @@
+import collections
+import contextlib
+import os
+import threading
 import time
-from io import BytesIO
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import yfinance as yf
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LinearSegmentedColormap, TwoSlopeNorm
+
+from charts.downsample import aggregate_extreme, aggregate_ohlc, bar_positions, bucket_size, lttb
+from charts.encode import chart_encoder
+from charts.image_cache import content_key, image_cache
+from charts.treemap import squarify
+from services.correlation import compare
+from services.indicators import canonical, frame_indicators
+from services.market import get_daily_history, universe_expires_at
+from services.profiler import profiled
+from services.returns import get_window, resolve_positions, window_label
+from services.sectors import SECTOR_SHORT, universe_snapshot
+from services.store import HistoryStore, fetch_history, get_store
+
+# --- Color Scheme ---
+COLORS = {
+    "bullish": "#00d4aa",  # Green for bullish
+    "bearish": "#ff6b6b",  # Red for bearish
+    "neutral": "#a29bfe",  # Purple for neutral/indicators
+    "signal": "#fab1a0",  # Peach for signal lines
+    "volume": "#74b9ff",  # Blue for volume
+    "sma": "#f1c40f",  # Yellow for SMA
+    "atr": "#ffeaa7",  # Light yellow for ATR
+    "background": "#0f0f23",  # Dark background
+    "text": "#cccccc",  # Light text
+    "grid": "#555555",  # Grid lines
+    "overbought": "#ff6b6b",  # Red for overbought
+    "oversold": "#00d4aa",  # Green for oversold
+}
+
+# chart period -> (bar interval, download period, lookback shown on the chart)
+# 7d and 30d share one hourly download; 3mo, 1y and 5y reuse the daily bars.
+# Longer ranges are merged into wider candles before plotting (charts/downsample.py)
+CHART_SOURCES = {
+    "1d": ("5m", "1d", None),
+    "7d": ("1h", "1mo", pd.DateOffset(days=7)),
+    "30d": ("1h", "1mo", None),
+    "3mo": ("1d", None, pd.DateOffset(months=3)),
+    "1y": ("1wk", None, pd.DateOffset(years=1)),
+    "5y": ("1d", None, pd.DateOffset(years=5)),
+    "max": ("1mo", "max", None),
+}
+DEFAULT_CHART_SOURCE = ("1d", None, pd.DateOffset(months=1))
+WEEKLY_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+# Indicator columns per chart, as registry keys (services/indicators.py).
+# Price overlays are drawn over the candles, e.g. CHART_OVERLAYS=sma:20,bb_upper,bb_lower
+PRICE_OVERLAYS = [
+    canonical(key.strip()) for key in os.getenv("CHART_OVERLAYS", "sma:20").split(",") if key
+]
+OVERLAY_PALETTE = [COLORS["sma"], "#74b9ff", "#a29bfe", "#fab1a0", "#55efc4"]
+INDICATOR_COLUMNS = {
+    "RSI": "rsi",
+    "MACD": "macd",
+    "MACD_Signal": "macd_signal",
+    "MACD_Hist": "macd_hist",
+    "ATR": "atr",
+}
+
+# In-memory front of the disk image cache, least recently used first out
+CHART_MEMORY_MB = float(os.getenv("CHART_MEMORY_MB", "32"))
+BACKGROUND_POLL = 0.05  # seconds a background render waits between checks for user traffic
+
+HEATMAP_CMAP = LinearSegmentedColormap.from_list(
+    "stockfather", [COLORS["bearish"], "#2d2d4a", COLORS["bullish"]]
+)
+HEATMAP_SIZE = (12, 8)
+SECTOR_HEADER = 0.035  # fraction of the canvas height reserved for sector labels
+
+# Overlay line colors for compare mode, cycled
+COMPARE_PALETTE = ["#00d4aa", "#74b9ff", "#f1c40f", "#ff6b6b", "#a29bfe", "#fab1a0", "#55efc4"]
+COMPARE_SIZE = (12, 6)
+CORRELATION_CMAP = LinearSegmentedColormap.from_list(
+    "correlation", [COLORS["volume"], "#2d2d4a", COLORS["bearish"]]
+)
+
+
+def overlay_label(key: str) -> str:
+    """Legend label for an overlay key: sma:20 -> SMA 20, bb_upper:20:2 -> BB UPPER 20/2"""
+    name, *params = key.split(":")
+    return " ".join([name.replace("_", " ").upper()] + (["/".join(params)] if params else []))
+
+
+class RenderYielded(Exception):
+    """A background render gave up its figure because a user request is waiting"""
 
 
 class ChartService:
     def __init__(self):
-        self._data_cache = {}
-        self._chart_cache = {}
-        self.data_ttl = 300
-        self.chart_ttl = 900
-        # Pre-cache popular stocks
+        # Each entry expires together with the bars it was drawn from. Keys include
+        # arbitrary compare lists and date ranges, so the layer is bounded by bytes
+        self._chart_cache: collections.OrderedDict = collections.OrderedDict()
+        self._cache_bytes = 0
+        self._cache_limit = int(CHART_MEMORY_MB * 1024 * 1024)
+        self._cache_lock = threading.Lock()
+        # Seed symbols for the pre-render scheduler before real traffic arrives
         self.popular_symbols = ["AAPL", "TSLA", "NVDA", "MSFT", "GOOGL", "AMZN", "META", "NFLX"]
+        # pyplot keeps global state, so renders from the bot and the pre-render
+        # thread must not interleave
+        self._render_lock = threading.Lock()
+        self._foreground = 0
+        self._foreground_lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _chart_key(chart_type: str, symbol: str, period: str) -> str:
+        suffix = "price_volume" if chart_type == "price" else "indicators"
+        return f"chart:{symbol}:{period}:{suffix}"
+
+    def chart_expires_in(self, chart_type: str, symbol: str, period: str):
+        """Seconds until a cached chart expires, or None if it is not cached"""
+        entry = self._chart_cache.get(self._chart_key(chart_type, symbol, period))
+        if entry is None:
+            return None
+        return entry["expires"] - time.time()
+
+    def _cached_image(self, chart_key: str, now: float, version=None):
+        """Cached image unless its bars are due upstream or were patched since (live quotes)"""
+        with self._cache_lock:
+            entry = self._chart_cache.get(chart_key)
+            if entry is not None and now < entry["expires"] and entry.get("version") == version:
+                self._chart_cache.move_to_end(chart_key)
+                return entry["image"]
+        return None
+
+    def _remember(self, chart_key: str, image: bytes, expires: float, version) -> bytes:
+        """Keep a rendered (or disk-cached) image in memory until its bars change"""
+        with self._cache_lock:
+            old = self._chart_cache.pop(chart_key, None)
+            if old is not None:
+                self._cache_bytes -= len(old["image"])
+            self._chart_cache[chart_key] = {
+                "image": image,
+                "timestamp": time.time(),
+                "expires": expires,
+                "version": version,
+            }
+            self._cache_bytes += len(image)
+            while self._cache_bytes > self._cache_limit and len(self._chart_cache) > 1:
+                _key, evicted = self._chart_cache.popitem(last=False)
+                self._cache_bytes -= len(evicted["image"])
+        return image
+
+    @staticmethod
+    def _data_store(period: str) -> HistoryStore:
+        interval = CHART_SOURCES.get(period, DEFAULT_CHART_SOURCE)[0]
+        # Weekly charts are resampled from the daily store
+        return get_store("1d" if interval == "1wk" else interval)
+
+    def _data_expires(self, symbol: str, period: str) -> float:
+        """When the bars behind a chart period are due to change upstream"""
+        return self._data_store(period).expires_at(symbol)
+
+    def data_fresh(self, symbol: str, period: str) -> bool:
+        """True while the bars behind a chart period need no refetch"""
+        return self._data_store(period).is_fresh(symbol)
+
+    def data_version(self, symbol: str, period: str) -> int:
+        return self._data_store(period).symbol_version(symbol)
+
+    @property
+    def is_busy(self) -> bool:
+        """True while a user-facing chart request is being served"""
+        return self._foreground > 0
+
+    def generate_chart(self, chart_type: str, symbol: str, period: str, force: bool = False):
+        """Dispatch to the price or indicators chart generator"""
+        if chart_type == "price":
+            return self.generate_price_volume_chart(symbol, period, force=force)
+        return self.generate_indicators_chart(symbol, period, force=force)
+
+    def serve_chart(self, chart_type: str, symbol: str, period: str):
+        """Generate a chart for a user request (marks the service busy meanwhile)"""
+        with self._foreground_lock:
+            self._foreground += 1
+        try:
+            return self.generate_chart(chart_type, symbol, period)
+        finally:
+            with self._foreground_lock:
+                self._foreground -= 1
+
+    @contextlib.contextmanager
+    def background(self):
+        """Mark renders on this thread as speculative (prefetch, pre-render)"""
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = False
+
+    def _yield_to_users(self, fig=None):
+        """Checkpoint inside a render: background renders give up here while a user waits"""
+        if getattr(self._local, "background", False) and self.is_busy:
+            if fig is not None:
+                plt.close(fig)
+            raise RenderYielded()
+
+    @contextlib.contextmanager
+    def _rendering(self):
+        """
+        Hold the render lock. Background threads only take it while no user
+        request is being served and re-check once they have it; one that is
+        already building a figure when a user arrives abandons it at the next
+        checkpoint (RenderYielded), so the user waits for at most one render step.
+        """
+        if not getattr(self._local, "background", False):
+            with self._render_lock:
+                yield
+            return
+
+        while True:
+            while self.is_busy:
+                time.sleep(BACKGROUND_POLL)
+            self._render_lock.acquire()
+            if not self.is_busy:
+                break
+            self._render_lock.release()
+        try:
+            yield
+        finally:
+            self._render_lock.release()
 
     def _get_cached_data(self, symbol: str, period: str):
-        """Cache raw stock data (most reused component)"""
-        key = f"data:{symbol}:{period}"
-        now = time.time()
+        """Bars for a chart period, sliced from the shared per-interval stores"""
+        interval, fetch_period, lookback = CHART_SOURCES.get(period, DEFAULT_CHART_SOURCE)
 
-        if key in self._data_cache:
-            if now - self._data_cache[key]["timestamp"] < self.data_ttl:
-                return self._data_cache[key]["data"]
+        if interval in ("1d", "1wk"):
+            # Daily bars are shared with the rankings; weekly ones are derived from them
+            data = get_daily_history(symbol)
+        else:
+            # Every non-daily source names its download period; "max" only types the fallback
+            download_period = fetch_period or "max"
+            store = get_store(interval)
+            if not store.is_fresh(symbol):
+                store.refresh(symbol, lambda: fetch_history(symbol, download_period, interval))
+            data = store.frame(symbol)
 
-        # Fetch new data
-        ticker = yf.Ticker(symbol)
+        if data is None or data.empty:
+            return pd.DataFrame()
 
-        if period == "1d":
-            # Intraday - 5min intervals
-            data = ticker.history(period="1d", interval="5m")
-        elif period == "7d":
-            data = ticker.history(period="7d", interval="1h")
-        elif period == "30d":
-            data = ticker.history(period="1mo", interval="1h")
-        elif period == "3mo":
-            data = ticker.history(period="3mo", interval="1d")
-        elif period == "1y":
-            data = ticker.history(period="1y", interval="1wk")
-        else:
-            data = ticker.history(period="1mo", interval="1d")
+        if lookback is not None:
+            data = data.iloc[data.index.searchsorted(data.index[-1] - lookback) :]
 
-        # Cache it
-        self._data_cache[key] = {"data": data, "timestamp": now}
+        if interval == "1wk":
+            data = data.resample("W-FRI").agg(WEEKLY_AGG).dropna(subset=["Close"])
 
         return data
 
@@ -136,304 +346,568 @@ class ChartService:
                         labels[i] = date.strftime("%d/%m")
                     current_month = month
 
+        elif period in ("5y", "max"):
+            # For multi-year ranges: show the year at year boundaries (MM/YYYY at the ends)
+            years = data.index[-1].year - data.index[0].year + 1
+            step = max(1, round(years / 10))
+            for i, date in enumerate(data.index):
+                if i == 0 or i == len(data) - 1:
+                    labels[i] = date.strftime("%m/%Y")
+                elif date.year != data.index[i - 1].year and date.year % step == 0:
+                    labels[i] = str(date.year)
+
         return labels, rotation
 
-    def add_technical_indicators(self, data):
-        """Add technical indicators with consistent colors"""
-        # --- Color Scheme ---
-        COLORS = {
-            "bullish": "#00d4aa",  # Green for bullish
-            "bearish": "#ff6b6b",  # Red for bearish
-            "neutral": "#a29bfe",  # Purple for neutral/indicators
-            "signal": "#fab1a0",  # Peach for signal lines
-            "volume": "#74b9ff",  # Blue for volume
-            "sma": "#f1c40f",  # Yellow for SMA
-            "atr": "#ffeaa7",  # Light yellow for ATR
-            "background": "#0f0f23",  # Dark background
-            "text": "#cccccc",  # Light text
-            "grid": "#555555",  # Grid lines
-            "overbought": "#ff6b6b",  # Red for overbought
-            "oversold": "#00d4aa",  # Green for oversold
-        }
-
-        # --- RSI (Relative Strength Index) ---
-        delta = data["Close"].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        data["RSI"] = 100 - (100 / (1 + rs))
-
-        # --- MACD (Moving Average Convergence Divergence) ---
-        exp1 = data["Close"].ewm(span=12, adjust=False).mean()
-        exp2 = data["Close"].ewm(span=26, adjust=False).mean()
-        data["MACD"] = exp1 - exp2
-        data["MACD_Signal"] = data["MACD"].ewm(span=9, adjust=False).mean()
-        data["MACD_Hist"] = data["MACD"] - data["MACD_Signal"]
-
-        # --- ATR (Average True Range) ---
-        high_low = data["High"] - data["Low"]
-        high_close = abs(data["High"] - data["Close"].shift())
-        low_close = abs(data["Low"] - data["Close"].shift())
-        ranges = pd.concat([high_low, high_close, low_close], axis=1)
-        true_range = ranges.max(axis=1)
-        data["ATR"] = true_range.rolling(window=14).mean()
-
-        return data, COLORS
-
-    def generate_price_volume_chart(self, symbol: str, period: str = "30d"):
+    @profiled("add_technical_indicators")
+    def add_technical_indicators(self, data, columns=None):
+        """Add indicator columns ({column: registry key}) with consistent colors"""
+        columns = INDICATOR_COLUMNS if columns is None else columns
+        return frame_indicators(data, columns), COLORS
+
+    @profiled("chart:price")
+    def generate_price_volume_chart(self, symbol: str, period: str = "30d", force: bool = False):
         """Generate ONLY price and volume chart"""
-        chart_key = f"chart:{symbol}:{period}:price_volume"
+        chart_key = self._chart_key("price", symbol, period)
         now = time.time()
 
         # Check chart cache first
-        if chart_key in self._chart_cache:
-            if now - self._chart_cache[chart_key]["timestamp"] < self.chart_ttl:
-                return self._chart_cache[chart_key]["image"]
+        if not force:
+            cached = self._cached_image(chart_key, now, self.data_version(symbol, period))
+            if cached is not None:
+                return cached
 
         # Get data
         data = self._get_cached_data(symbol, period)
-        if data.empty or len(data) < 2:
+        if len(data) < 2:
             return None
 
-        data, COLORS = self.add_technical_indicators(data)
-
-        # Create ONLY 2 subplots: price and volume
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), gridspec_kw={"height_ratios": [3, 1]})
+        # Same bars and parameters -> same image, whichever process drew it
+        content = content_key(chart_key, PRICE_OVERLAYS, data)
+        stored = image_cache.get(content)
+        if stored is not None:
+            return self._remember(
+                chart_key,
+                stored,
+                self._data_expires(symbol, period),
+                self.data_version(symbol, period),
+            )
 
-        # Set consistent style
-        plt.style.use("default")
-        fig.patch.set_facecolor(COLORS["background"])
+        with self._rendering():
+            data, COLORS = self.add_technical_indicators(data, {key: key for key in PRICE_OVERLAYS})
+            # More bars than the canvas can separate are merged into wider candles
+            data = aggregate_ohlc(data, bucket_size(len(data)))
 
-        # Style both axes
-        for ax in [ax1, ax2]:
-            ax.set_facecolor(COLORS["background"])
-            ax.tick_params(axis="x", colors=COLORS["text"])
-            ax.tick_params(axis="y", colors=COLORS["text"])
-            ax.grid(True, alpha=0.2, linestyle="--", color=COLORS["grid"])
-
-        # --- Price Chart (ax1) ---
-        # Add SMA if enough data
-        if len(data) > 20:
-            data["SMA20"] = data["Close"].rolling(window=20).mean()
-            ax1.plot(
-                range(len(data)),
-                data["SMA20"],
-                color=COLORS["sma"],
-                linewidth=1.5,
-                label="SMA 20",
-                alpha=0.9,
+            self._yield_to_users()
+            # Create ONLY 2 subplots: price and volume
+            fig, (ax1, ax2) = plt.subplots(
+                2, 1, figsize=(10, 8), gridspec_kw={"height_ratios": [3, 1]}
             )
 
-        # Determine bar width
-        num_points = len(data)
-        bar_width, wick_width = self._get_bar_widths(num_points)
-
-        # Plot candlestick chart
-        for idx in range(len(data)):
-            row = data.iloc[idx]
-            color = COLORS["bullish"] if row["Close"] >= row["Open"] else COLORS["bearish"]
-
-            if row["Close"] >= row["Open"]:
-                body_bottom = row["Open"]
-                body_height = row["Close"] - row["Open"]
-            else:
-                body_bottom = row["Close"]
-                body_height = row["Open"] - row["Close"]
-
-            # Draw candle body
-            if body_height > 0:
-                rect = plt.Rectangle(
-                    (idx - bar_width / 2, body_bottom),
-                    bar_width,
-                    body_height,
+            # Set consistent style
+            plt.style.use("default")
+            fig.patch.set_facecolor(COLORS["background"])
+
+            # Style both axes
+            for ax in [ax1, ax2]:
+                ax.set_facecolor(COLORS["background"])
+                ax.tick_params(axis="x", colors=COLORS["text"])
+                ax.tick_params(axis="y", colors=COLORS["text"])
+                ax.grid(True, alpha=0.2, linestyle="--", color=COLORS["grid"])
+
+            # --- Price Chart (ax1) ---
+            # Overlays (SMA 20 by default) once there is enough data for them
+            for i, key in enumerate(PRICE_OVERLAYS):
+                if data[key].notna().any():
+                    ax1.plot(
+                        range(len(data)),
+                        data[key],
+                        color=OVERLAY_PALETTE[i % len(OVERLAY_PALETTE)],
+                        linewidth=1.5,
+                        label=overlay_label(key),
+                        alpha=0.9,
+                    )
+
+            # Determine bar width
+            num_points = len(data)
+            bar_width, wick_width = self._get_bar_widths(num_points)
+
+            # Plot candlestick chart
+            for idx in range(len(data)):
+                row = data.iloc[idx]
+                color = COLORS["bullish"] if row["Close"] >= row["Open"] else COLORS["bearish"]
+
+                if row["Close"] >= row["Open"]:
+                    body_bottom = row["Open"]
+                    body_height = row["Close"] - row["Open"]
+                else:
+                    body_bottom = row["Close"]
+                    body_height = row["Open"] - row["Close"]
+
+                # Draw candle body
+                if body_height > 0:
+                    rect = plt.Rectangle(
+                        (idx - bar_width / 2, body_bottom),
+                        bar_width,
+                        body_height,
+                        color=color,
+                        alpha=0.8,
+                        linewidth=0,
+                    )
+                    ax1.add_patch(rect)
+
+                # Draw wick
+                ax1.plot(
+                    [idx, idx],
+                    [row["Low"], row["High"]],
                     color=color,
+                    linewidth=wick_width,
                     alpha=0.8,
-                    linewidth=0,
                 )
-                ax1.add_patch(rect)
 
-            # Draw wick
-            ax1.plot(
-                [idx, idx], [row["Low"], row["High"]], color=color, linewidth=wick_width, alpha=0.8
+            # Add price stats
+            last_price = data["Close"].iloc[-1]
+            change = ((last_price - data["Open"].iloc[0]) / data["Open"].iloc[0]) * 100
+            stats_text = f"Price: ${last_price:.2f} | Change: {change:+.2f}%"
+
+            ax1.text(
+                0.02,
+                0.95,
+                stats_text,
+                transform=ax1.transAxes,
+                verticalalignment="top",
+                color="white",
+                fontsize=9,
+                bbox=dict(boxstyle="round", facecolor="#1e1e3f", alpha=0.5),
             )
 
-        # Add price stats
-        last_price = data["Close"].iloc[-1]
-        change = ((last_price - data["Open"].iloc[0]) / data["Open"].iloc[0]) * 100
-        stats_text = f"Price: ${last_price:.2f} | Change: {change:+.2f}%"
-
-        ax1.text(
-            0.02,
-            0.95,
-            stats_text,
-            transform=ax1.transAxes,
-            verticalalignment="top",
-            color="white",
-            fontsize=9,
-            bbox=dict(boxstyle="round", facecolor="#1e1e3f", alpha=0.5),
-        )
+            ax1.set_title(
+                f"{symbol} - Price & Volume ({period.upper()})",
+                fontsize=12,
+                fontweight="bold",
+                pad=15,
+                color="#ffffff",
+            )
+            ax1.set_ylabel("Price ($)", color=COLORS["text"], fontsize=9)
+
+            # --- Volume Chart (ax2) ---
+            volume_colors = []
+            for idx in range(len(data)):
+                row = data.iloc[idx]
+                volume_colors.append(
+                    COLORS["bullish"] if row["Close"] >= row["Open"] else COLORS["bearish"]
+                )
 
-        ax1.set_title(
-            f"{symbol} - Price & Volume ({period.upper()})",
-            fontsize=12,
-            fontweight="bold",
-            pad=15,
-            color="#ffffff",
-        )
-        ax1.set_ylabel("Price ($)", color=COLORS["text"], fontsize=9)
-
-        # --- Volume Chart (ax2) ---
-        volume_colors = []
-        for idx in range(len(data)):
-            row = data.iloc[idx]
-            volume_colors.append(
-                COLORS["bullish"] if row["Close"] >= row["Open"] else COLORS["bearish"]
+            x_positions = range(len(data))
+            ax2.bar(
+                x_positions,
+                data["Volume"],
+                color=volume_colors,
+                alpha=0.7,
+                width=bar_width * 1.2,
+                align="center",
             )
 
-        x_positions = range(len(data))
-        ax2.bar(
-            x_positions,
-            data["Volume"],
-            color=volume_colors,
-            alpha=0.7,
-            width=bar_width * 1.2,
-            align="center",
-        )
+            ax2.set_ylabel("Volume", color=COLORS["text"], fontsize=9)
 
-        ax2.set_ylabel("Volume", color=COLORS["text"], fontsize=9)
+            # --- X-axis Labels ---
+            labels, rotation = self._generate_labels(data, period)
 
-        # --- X-axis Labels ---
-        labels, rotation = self._generate_labels(data, period)
+            # Set ticks and labels for both axes
+            for ax in [ax1, ax2]:
+                # A tick per bar is slow to build; check in between axes
+                self._yield_to_users(fig)
+                ax.set_xticks(range(len(data)))
+                ax.set_xticklabels(
+                    labels, rotation=rotation, ha="right", color=COLORS["text"], fontsize=8
+                )
 
-        # Set ticks and labels for both axes
-        for ax in [ax1, ax2]:
-            ax.set_xticks(range(len(data)))
-            ax.set_xticklabels(
-                labels, rotation=rotation, ha="right", color=COLORS["text"], fontsize=8
-            )
+            # Final layout
+            self._yield_to_users(fig)
+            plt.tight_layout()
 
-        # Final layout
-        plt.tight_layout()
-
-        # Convert to bytes
-        buf = BytesIO()
-        plt.savefig(
-            buf,
-            format="png",
-            dpi=120,
-            bbox_inches="tight",
-            facecolor=fig.get_facecolor(),
-            edgecolor="none",
-        )
-        plt.close(fig)
-        buf.seek(0)
-        image_bytes = buf.getvalue()
+            image_bytes = self._save_figure(fig, "price")
 
         # Cache the chart
-        self._chart_cache[chart_key] = {"image": image_bytes, "timestamp": now}
-
-        return image_bytes
+        image_cache.put(content, image_bytes)
+        return self._remember(
+            chart_key,
+            image_bytes,
+            self._data_expires(symbol, period),
+            self.data_version(symbol, period),
+        )
 
-    def generate_indicators_chart(self, symbol: str, period: str = "30d"):
+    @profiled("chart:indicators")
+    def generate_indicators_chart(self, symbol: str, period: str = "30d", force: bool = False):
         """Generate ONLY RSI, MACD, and ATR charts"""
-        chart_key = f"chart:{symbol}:{period}:indicators"
+        chart_key = self._chart_key("indicators", symbol, period)
         now = time.time()
 
         # Check chart cache first
-        if chart_key in self._chart_cache:
-            if now - self._chart_cache[chart_key]["timestamp"] < self.chart_ttl:
-                return self._chart_cache[chart_key]["image"]
+        if not force:
+            cached = self._cached_image(chart_key, now, self.data_version(symbol, period))
+            if cached is not None:
+                return cached
 
         # Get data
         data = self._get_cached_data(symbol, period)
-        if data.empty or len(data) < 2:
+        if len(data) < 2:
             return None
 
-        data, COLORS = self.add_technical_indicators(data)
+        # Same bars and parameters -> same image, whichever process drew it
+        content = content_key(chart_key, data)
+        stored = image_cache.get(content)
+        if stored is not None:
+            return self._remember(
+                chart_key,
+                stored,
+                self._data_expires(symbol, period),
+                self.data_version(symbol, period),
+            )
+
+        with self._rendering():
+            full, COLORS = self.add_technical_indicators(data)
+            # Lines keep their shape through LTTB on the bars' x positions; the
+            # histogram and the axis follow the same buckets as the price candles
+            k = bucket_size(len(full))
+            x = bar_positions(len(full), k)
+            hist = aggregate_extreme(full["MACD_Hist"].to_numpy(dtype=float), k)
+            data = aggregate_ohlc(full, k)
+
+            def line(column):
+                return lttb(x, full[column].to_numpy(dtype=float))
+
+            self._yield_to_users()
+            # Create 3 subplots for indicators
+            fig, (ax_rsi, ax_macd, ax_atr) = plt.subplots(
+                3, 1, figsize=(10, 10), gridspec_kw={"height_ratios": [1, 1, 1]}
+            )
+
+            # Set consistent style
+            plt.style.use("default")
+            fig.patch.set_facecolor(COLORS["background"])
+
+            # Style all axes
+            axes = [ax_rsi, ax_macd, ax_atr]
+            for ax in axes:
+                ax.set_facecolor(COLORS["background"])
+                ax.tick_params(axis="x", colors=COLORS["text"])
+                ax.tick_params(axis="y", colors=COLORS["text"])
+                ax.grid(True, alpha=0.2, linestyle="--", color=COLORS["grid"])
+
+            # --- RSI Chart ---
+            ax_rsi.plot(*line("RSI"), color=COLORS["neutral"], linewidth=1.5)
+            ax_rsi.axhline(70, color=COLORS["overbought"], linestyle="--", alpha=0.3)
+            ax_rsi.axhline(30, color=COLORS["oversold"], linestyle="--", alpha=0.3)
+            ax_rsi.set_ylabel("RSI", color=COLORS["text"], fontsize=9)
+            ax_rsi.set_ylim(0, 100)
+            ax_rsi.set_title(
+                f"{symbol} - Technical Indicators ({period.upper()})",
+                fontsize=12,
+                fontweight="bold",
+                pad=15,
+                color="#ffffff",
+            )
+
+            # --- MACD Chart ---
+            ax_macd.plot(*line("MACD"), color=COLORS["neutral"], linewidth=1.2)
+            ax_macd.plot(*line("MACD_Signal"), color=COLORS["signal"], linewidth=1.2)
+
+            # Histogram
+            colors = [COLORS["bullish"] if v > 0 else COLORS["bearish"] for v in hist]
+            ax_macd.bar(range(len(data)), hist, color=colors, alpha=0.5)
+            ax_macd.set_ylabel("MACD", color=COLORS["text"], fontsize=9)
+
+            # --- ATR Chart ---
+            ax_atr.plot(*line("ATR"), color=COLORS["atr"], linewidth=1.5)
+            ax_atr.set_ylabel("ATR ($)", color=COLORS["text"], fontsize=9)
+
+            # --- X-axis Labels ---
+            labels, rotation = self._generate_labels(data, period)
+
+            # Set ticks and labels for all axes
+            for ax in axes:
+                # A tick per bar is slow to build; check in between axes
+                self._yield_to_users(fig)
+                ax.set_xticks(range(len(data)))
+                ax.set_xticklabels(
+                    labels, rotation=rotation, ha="right", color=COLORS["text"], fontsize=8
+                )
 
-        # Create 3 subplots for indicators
-        fig, (ax_rsi, ax_macd, ax_atr) = plt.subplots(
-            3, 1, figsize=(10, 10), gridspec_kw={"height_ratios": [1, 1, 1]}
+            # Final layout
+            self._yield_to_users(fig)
+            plt.tight_layout()
+
+            image_bytes = self._save_figure(fig, "indicators")
+
+        # Cache the chart
+        image_cache.put(content, image_bytes)
+        return self._remember(
+            chart_key,
+            image_bytes,
+            self._data_expires(symbol, period),
+            self.data_version(symbol, period),
         )
 
-        # Set consistent style
-        plt.style.use("default")
-        fig.patch.set_facecolor(COLORS["background"])
+    @profiled("chart:heatmap")
+    def generate_universe_heatmap(self, period: str = "24h"):
+        """Treemap of the whole universe grouped by sector, colored by change"""
+        chart_key = f"heatmap:{period}"
+        now = time.time()
 
-        # Style all axes
-        axes = [ax_rsi, ax_macd, ax_atr]
-        for ax in axes:
+        cached = self._cached_image(chart_key, now, get_store("1d").version)
+        if cached is not None:
+            return cached
+
+        snapshot = universe_snapshot(period)
+        if snapshot.empty:
+            return None
+
+        content = content_key(chart_key, snapshot)
+        stored = image_cache.get(content)
+        if stored is not None:
+            return self._remember(chart_key, stored, universe_expires_at(), get_store("1d").version)
+
+        # Sector boxes sized by member count, then equal tiles inside each box
+        counts = snapshot.groupby("sector", sort=False).size().sort_values(ascending=False)
+        width = HEATMAP_SIZE[0] / HEATMAP_SIZE[1]
+        sector_rects = squarify(counts.to_numpy(dtype=float), 0, 0, width, 1)
+
+        tiles = []
+        for (sector, count), (x, y, w, h) in zip(counts.items(), sector_rects):
+            inner_h = max(h - SECTOR_HEADER, h * 0.5)
+            members = snapshot[snapshot["sector"] == sector]
+            for symbol, rect in zip(members.index, squarify([1.0] * count, x, y, w, inner_h)):
+                tiles.append((symbol, *rect))
+
+        layout = pd.DataFrame(tiles, columns=["symbol", "x", "y", "w", "h"]).set_index("symbol")
+        changes = snapshot["change"].reindex(layout.index).to_numpy()
+
+        # Vertices for every tile at once: (n, 4 corners, xy)
+        x0, y0 = layout["x"].to_numpy(), layout["y"].to_numpy()
+        x1, y1 = x0 + layout["w"].to_numpy(), y0 + layout["h"].to_numpy()
+        verts = np.stack(
+            [np.column_stack(c) for c in ((x0, y0), (x0, y1), (x1, y1), (x1, y0))], axis=1
+        )
+
+        limit = max(float(np.nanpercentile(np.abs(changes), 95)), 0.5)
+
+        with self._rendering():
+            fig, ax = plt.subplots(figsize=HEATMAP_SIZE)
+            fig.patch.set_facecolor(COLORS["background"])
             ax.set_facecolor(COLORS["background"])
-            ax.tick_params(axis="x", colors=COLORS["text"])
-            ax.tick_params(axis="y", colors=COLORS["text"])
-            ax.grid(True, alpha=0.2, linestyle="--", color=COLORS["grid"])
-
-        # --- RSI Chart ---
-        ax_rsi.plot(range(len(data)), data["RSI"], color=COLORS["neutral"], linewidth=1.5)
-        ax_rsi.axhline(70, color=COLORS["overbought"], linestyle="--", alpha=0.3)
-        ax_rsi.axhline(30, color=COLORS["oversold"], linestyle="--", alpha=0.3)
-        ax_rsi.set_ylabel("RSI", color=COLORS["text"], fontsize=9)
-        ax_rsi.set_ylim(0, 100)
-        ax_rsi.set_title(
-            f"{symbol} - Technical Indicators ({period.upper()})",
-            fontsize=12,
-            fontweight="bold",
-            pad=15,
-            color="#ffffff",
+            ax.set_xlim(0, width)
+            ax.set_ylim(0, 1)
+            ax.axis("off")
+
+            tiles_collection = PolyCollection(
+                verts,
+                array=changes,
+                cmap=HEATMAP_CMAP,
+                norm=TwoSlopeNorm(vmin=-limit, vcenter=0, vmax=limit),
+                edgecolors=COLORS["background"],
+                linewidths=0.4,
+            )
+            ax.add_collection(tiles_collection)
+
+            sector_verts = [
+                [(x, y), (x, y + h), (x + w, y + h), (x + w, y)] for x, y, w, h in sector_rects
+            ]
+            ax.add_collection(
+                PolyCollection(
+                    sector_verts, facecolors="none", edgecolors=COLORS["text"], linewidths=1.2
+                )
+            )
+
+            for sector, (x, y, w, h) in zip(counts.index, sector_rects):
+                ax.text(
+                    x + 0.004,
+                    y + h - 0.004,
+                    SECTOR_SHORT.get(sector, sector),
+                    va="top",
+                    ha="left",
+                    color="#ffffff",
+                    fontsize=7,
+                    fontweight="bold",
+                    clip_on=True,
+                )
+
+            # Label only tiles big enough to read
+            readable = (layout["w"] > 0.025) & (layout["h"] > 0.02)
+            for symbol, row in layout[readable].iterrows():
+                ax.text(
+                    row["x"] + row["w"] / 2,
+                    row["y"] + row["h"] / 2,
+                    f"{symbol}\n{snapshot.at[symbol, 'change']:+.1f}%",
+                    ha="center",
+                    va="center",
+                    color="#ffffff",
+                    fontsize=max(4.0, min(8.0, row["w"] * 120)),
+                )
+
+            ax.set_title(
+                f"S&P 500 Heatmap ({period.upper()}) - {len(layout)} symbols",
+                fontsize=12,
+                fontweight="bold",
+                color="#ffffff",
+            )
+            fig.colorbar(tiles_collection, ax=ax, fraction=0.025, pad=0.01).ax.tick_params(
+                colors=COLORS["text"], labelsize=7
+            )
+
+            image_bytes = self._save_figure(fig, "heatmap")
+
+        image_cache.put(content, image_bytes)
+        return self._remember(
+            chart_key, image_bytes, universe_expires_at(), get_store("1d").version
         )
 
-        # --- MACD Chart ---
-        ax_macd.plot(range(len(data)), data["MACD"], color=COLORS["neutral"], linewidth=1.2)
-        ax_macd.plot(range(len(data)), data["MACD_Signal"], color=COLORS["signal"], linewidth=1.2)
+    @profiled("render:encode")
+    def _save_figure(self, fig, kind: str) -> bytes:
+        """Rasterize a finished figure and encode it within the chart kind's byte budget"""
+        try:
+            self._yield_to_users()
+            return chart_encoder.encode_figure(fig, kind)
+        finally:
+            plt.close(fig)
+
+    def _compare_version(self, symbols) -> tuple:
+        daily = get_store("1d")
+        return tuple(daily.symbol_version(s) for s in symbols)
+
+    def _compare_expires(self, symbols) -> float:
+        daily = get_store("1d")
+        return min(daily.expires_at(s) for s in symbols)
+
+    @profiled("chart:compare")
+    def generate_comparison_chart(self, symbols, period: str = "1y"):
+        """Overlay of returns rebased to 0% at the window start, one line per symbol"""
+        chart_key = f"compare:{','.join(symbols)}:{period}"
+        now = time.time()
+
+        cached = self._cached_image(chart_key, now, self._compare_version(symbols))
+        if cached is not None:
+            return cached
+
+        window = get_window(period)
+        if window is None:
+            return None
+
+        for symbol in symbols:
+            get_daily_history(symbol)
+        panel = get_store("1d").panel(symbols)
+        positions = resolve_positions(panel.index, window) if not panel.empty else None
+        if positions is None:
+            return None
+
+        base, end = positions
+        # Symbols whose download came back empty have no line to draw
+        closes = panel.iloc[base : end + 1].dropna(axis=1, how="all")
+        if closes.shape[1] < 2:
+            return None
+        content = content_key(chart_key, closes)
+        stored = image_cache.get(content)
+        if stored is not None:
+            return self._remember(
+                chart_key, stored, self._compare_expires(symbols), self._compare_version(symbols)
+            )
 
-        # Histogram
-        colors = [COLORS["bullish"] if x > 0 else COLORS["bearish"] for x in data["MACD_Hist"]]
-        ax_macd.bar(range(len(data)), data["MACD_Hist"], color=colors, alpha=0.5)
-        ax_macd.set_ylabel("MACD", color=COLORS["text"], fontsize=9)
+        rebased = (closes / closes.bfill().iloc[0] - 1) * 100
 
-        # --- ATR Chart ---
-        ax_atr.plot(range(len(data)), data["ATR"], color=COLORS["atr"], linewidth=1.5)
-        ax_atr.set_ylabel("ATR ($)", color=COLORS["text"], fontsize=9)
+        with self._rendering():
+            fig, ax = plt.subplots(figsize=COMPARE_SIZE)
+            fig.patch.set_facecolor(COLORS["background"])
+            ax.set_facecolor(COLORS["background"])
 
-        # --- X-axis Labels ---
-        labels, rotation = self._generate_labels(data, period)
+            for i, symbol in enumerate(rebased.columns):
+                series = rebased[symbol]
+                ax.plot(
+                    series.index,
+                    series.to_numpy(),
+                    color=COMPARE_PALETTE[i % len(COMPARE_PALETTE)],
+                    linewidth=1.6,
+                    label=f"{symbol} {series.dropna().iloc[-1]:+.1f}%",
+                )
 
-        # Set ticks and labels for all axes
-        for ax in axes:
-            ax.set_xticks(range(len(data)))
-            ax.set_xticklabels(
-                labels, rotation=rotation, ha="right", color=COLORS["text"], fontsize=8
+            ax.axhline(0, color=COLORS["grid"], linewidth=0.8)
+            ax.grid(True, alpha=0.2, color=COLORS["grid"])
+            ax.tick_params(colors=COLORS["text"], labelsize=8)
+            ax.set_ylabel("Return (%)", color=COLORS["text"])
+            ax.legend(
+                loc="upper left",
+                facecolor=COLORS["background"],
+                edgecolor=COLORS["grid"],
+                labelcolor=COLORS["text"],
+                fontsize=8,
+            )
+            ax.set_title(
+                f"Comparison - {window.label}", fontsize=12, fontweight="bold", color="#ffffff"
             )
+            image_bytes = self._save_figure(fig, "compare")
 
-        # Final layout
-        plt.tight_layout()
-
-        # Convert to bytes
-        buf = BytesIO()
-        plt.savefig(
-            buf,
-            format="png",
-            dpi=120,
-            bbox_inches="tight",
-            facecolor=fig.get_facecolor(),
-            edgecolor="none",
+        image_cache.put(content, image_bytes)
+        return self._remember(
+            chart_key, image_bytes, self._compare_expires(symbols), self._compare_version(symbols)
         )
-        plt.close(fig)
-        buf.seek(0)
-        image_bytes = buf.getvalue()
 
-        # Cache the chart
-        self._chart_cache[chart_key] = {"image": image_bytes, "timestamp": now}
+    @profiled("chart:correlation")
+    def generate_correlation_chart(self, symbols, period: str = "1y"):
+        """Annotated correlation matrix of daily returns; returns (image, compare result)"""
+        result = compare(symbols, period)
+        if result is None:
+            return None, None
 
-        return image_bytes
+        chart_key = f"correlation:{','.join(symbols)}:{period}"
+        now = time.time()
+        cached = self._cached_image(chart_key, now, self._compare_version(symbols))
+        if cached is not None:
+            return cached, result
+
+        matrix = result["matrix"]
+        n = len(matrix)
+        content = content_key(chart_key, matrix)
+        stored = image_cache.get(content)
+        if stored is not None:
+            expires, version = self._compare_expires(symbols), self._compare_version(symbols)
+            return self._remember(chart_key, stored, expires, version), result
+
+        with self._rendering():
+            size = min(3 + 0.8 * n, 12)
+            fig, ax = plt.subplots(figsize=(size, size * 0.85))
+            fig.patch.set_facecolor(COLORS["background"])
+            ax.set_facecolor(COLORS["background"])
+
+            image = ax.imshow(matrix.to_numpy(), cmap=CORRELATION_CMAP, vmin=-1, vmax=1)
+            ax.set_xticks(range(n), matrix.columns, rotation=45, ha="right")
+            ax.set_yticks(range(n), matrix.index)
+            ax.tick_params(colors=COLORS["text"], labelsize=9)
+
+            if n <= 15:
+                for i in range(n):
+                    for j in range(n):
+                        ax.text(
+                            j,
+                            i,
+                            f"{matrix.iat[i, j]:.2f}",
+                            ha="center",
+                            va="center",
+                            color="#ffffff",
+                            fontsize=8,
+                        )
+
+            ax.set_title(
+                f"Correlation of daily returns - {window_label(period)}",
+                fontsize=11,
+                fontweight="bold",
+                color="#ffffff",
+            )
+            fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04).ax.tick_params(
+                colors=COLORS["text"], labelsize=7
+            )
+            image_bytes = self._save_figure(fig, "correlation")
 
-    def pre_cache_popular(self):
-        """Pre-generate charts for popular stocks during idle time"""
-        periods = ["1d", "7d", "30d"]
-        for symbol in self.popular_symbols[:3]:  # Top 3 only
-            for period in periods:
-                self.generate_price_volume_chart(symbol, period)
-                print(f"Pre-cached {symbol} {period}")
+        image_cache.put(content, image_bytes)
+        expires, version = self._compare_expires(symbols), self._compare_version(symbols)
+        return self._remember(chart_key, image_bytes, expires, version), result
 
 
 # Create a global instance
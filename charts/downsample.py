@@ -0,0 +1,114 @@
+import math
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Stock charts are 10in wide at 120 dpi; roughly this share of it is plot area
+FIGURE_WIDTH_IN = 10
+DPI = 120
+PLOT_FRACTION = 0.85
+# Horizontal pixels a legible candle (body, gap, wick) needs, and a line vertex
+CANDLE_PX = 4
+LINE_PX = 1
+
+OHLC_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def point_budget(px_per_point: float, width_in: float = FIGURE_WIDTH_IN, dpi: int = DPI) -> int:
+    """Most points the plot area can show apart at px_per_point pixels each"""
+    return int(width_in * dpi * PLOT_FRACTION / px_per_point)
+
+
+CANDLE_BUDGET = point_budget(CANDLE_PX)
+LINE_BUDGET = point_budget(LINE_PX)
+
+
+def bucket_size(n: int, max_points: int = CANDLE_BUDGET) -> int:
+    """Bars per candle so that n bars fit the budget (1 = no downsampling)"""
+    return max(1, math.ceil(n / max_points))
+
+
+def _bucket_starts(n: int, k: int) -> np.ndarray:
+    # Buckets are aligned to the end: the latest candle is always complete and
+    # only the oldest one may hold fewer bars
+    pad = -n % k
+    return np.concatenate([[0], np.arange(k - pad, n, k)]) if pad else np.arange(0, n, k)
+
+
+def aggregate_ohlc(data: pd.DataFrame, k: int) -> pd.DataFrame:
+    """
+    Merge every k consecutive bars into one candle: first open, highest high,
+    lowest low, last close, summed volume. Other columns keep their last value.
+    The candle is stamped with its first bar's time.
+    """
+    if k <= 1 or len(data) <= 1:
+        return data
+
+    starts = _bucket_starts(len(data), k)
+    ends = np.append(starts[1:], len(data)) - 1
+    columns = {}
+    for column in data.columns:
+        values = data[column].to_numpy()
+        how = OHLC_AGG.get(column, "last")
+        if how == "first":
+            columns[column] = values[starts]
+        elif how == "last":
+            columns[column] = values[ends]
+        elif how == "max":
+            columns[column] = np.fmax.reduceat(values, starts)
+        elif how == "min":
+            columns[column] = np.fmin.reduceat(values, starts)
+        else:
+            columns[column] = np.add.reduceat(np.nan_to_num(values), starts)
+    return pd.DataFrame(columns, index=data.index[starts])
+
+
+def aggregate_extreme(values: np.ndarray, k: int) -> np.ndarray:
+    """Per bucket, the value furthest from zero (keeps histogram peaks and their sign)"""
+    if k <= 1:
+        return values
+    starts = _bucket_starts(len(values), k)
+    filled = np.nan_to_num(values)
+    high = np.maximum.reduceat(filled, starts)
+    low = np.minimum.reduceat(filled, starts)
+    return np.where(np.abs(high) >= np.abs(low), high, low)
+
+
+def bar_positions(n: int, k: int) -> np.ndarray:
+    """x of each original bar on an axis where candle i is centered at i"""
+    pad = -n % k
+    return (np.arange(n) + pad - (k - 1) / 2) / k
+
+
+def lttb(
+    x: np.ndarray, y: np.ndarray, threshold: int = LINE_BUDGET
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets: keep `threshold` points of a line, choosing in
+    each bucket the point that spans the largest triangle with its neighbours, so
+    peaks and troughs survive. NaNs (indicator warm-up) are dropped first.
+    """
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # Inner buckets split the points between the fixed first and last ones
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Next bucket's average stands in for the not-yet-chosen point
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return x[keep], y[keep]
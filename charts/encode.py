@@ -0,0 +1,192 @@
+import collections
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+from charts.downsample import DPI
+
+PAD_INCHES = 0.1  # margin kept around the tight bounding box, as savefig's bbox_inches="tight"
+
+
+class Encoding(NamedTuple):
+    name: str
+    format: str  # Pillow format name
+    mime: str
+    qualities: Tuple[int, ...]  # lossy quality (or palette size for png8), best first
+
+
+ENCODINGS: Dict[str, Encoding] = {}
+
+
+def register_encoding(encoding: Encoding):
+    ENCODINGS[encoding.name] = encoding
+
+
+register_encoding(Encoding("png", "PNG", "image/png", (0,)))
+# The dark theme uses few colors, so an adaptive palette is close to lossless
+register_encoding(Encoding("png8", "PNG", "image/png", (256, 128, 64)))
+register_encoding(Encoding("webp", "WEBP", "image/webp", (85, 75, 60)))
+register_encoding(Encoding("jpeg", "JPEG", "image/jpeg", (85, 75, 60)))
+
+# CHART_FORMAT=png|png8|webp|jpeg; CHART_BUDGET_KB overrides every per-chart budget
+CHART_FORMAT = os.getenv("CHART_FORMAT", "png8")
+CHART_BUDGET_KB = os.getenv("CHART_BUDGET_KB")
+# Bytes a chart may take before the encoder lowers quality, then resolution
+CHART_BUDGETS = {
+    "price": 120_000,
+    "indicators": 160_000,
+    "heatmap": 300_000,
+    "compare": 120_000,
+    "correlation": 120_000,
+}
+DEFAULT_BUDGET = 150_000
+# Fractions of the rendered resolution tried in turn when a chart is over budget
+RESOLUTION_TIERS = (1.0, 0.8, 0.65)
+
+
+def image_mime(data: bytes) -> str:
+    """Content type of an encoded image, from its magic bytes"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    return "image/png"
+
+
+def rasterize(fig, dpi: int = DPI) -> Image.Image:
+    """
+    Draw a figure once on the Agg canvas and crop its RGBA buffer to the tight
+    bounding box, without the second layout pass savefig(bbox_inches="tight") does.
+    """
+    fig.set_dpi(dpi)
+    canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+    canvas.draw()
+    pixels = np.asarray(canvas.buffer_rgba())
+    height, width = pixels.shape[:2]
+
+    bbox = fig.get_tightbbox(canvas.get_renderer()).padded(PAD_INCHES)
+    left = max(0, int(bbox.x0 * dpi))
+    right = min(width, int(np.ceil(bbox.x1 * dpi)))
+    top = max(0, height - int(np.ceil(bbox.y1 * dpi)))
+    bottom = min(height, height - int(bbox.y0 * dpi))
+
+    # Every chart paints an opaque face color, so alpha carries nothing
+    return Image.fromarray(pixels[top:bottom, left:right, :3])
+
+
+def _encode(image: Image.Image, encoding: Encoding, quality: int) -> bytes:
+    buf = BytesIO()
+    if encoding.name == "png8":
+        image.quantize(quality, method=Image.Quantize.FASTOCTREE).save(buf, "PNG")
+    elif encoding.format == "PNG":
+        image.save(buf, "PNG")
+    elif encoding.format == "JPEG":
+        # No chroma subsampling: thin red/green lines would bleed otherwise
+        image.save(buf, "JPEG", quality=quality, subsampling=0)
+    else:
+        image.save(buf, encoding.format, quality=quality, method=4)
+    return buf.getvalue()
+
+
+class ChartEncoder:
+    """
+    Encodes rendered figures within a per-chart byte budget. Quality steps down
+    first, then resolution tiers; the first result under budget wins, otherwise
+    the smallest one tried. Encode time and output size are kept per chart kind.
+    """
+
+    def __init__(self, encoding: str = CHART_FORMAT, budget_kb: Optional[str] = CHART_BUDGET_KB):
+        if encoding not in ENCODINGS:
+            print(f"Unknown CHART_FORMAT {encoding}, using png")
+            encoding = "png"
+        self.encoding = ENCODINGS[encoding]
+        self.budget_override = int(float(budget_kb) * 1024) if budget_kb else None
+        self.stats: Dict[str, Dict[str, float]] = collections.defaultdict(
+            lambda: collections.defaultdict(float)
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def signature(self) -> str:
+        """Part of every chart's content key, so a new setting does not reuse old images"""
+        return f"{self.encoding.name}:{self.budget_override}"
+
+    def budget(self, kind: str) -> int:
+        if self.budget_override is not None:
+            return self.budget_override
+        return CHART_BUDGETS.get(kind, DEFAULT_BUDGET)
+
+    def encode(self, image: Image.Image, kind: str) -> bytes:
+        started = time.perf_counter()
+        budget = self.budget(kind)
+        best: Optional[bytes] = None
+        tier = 0
+
+        for tier, scale in enumerate(RESOLUTION_TIERS):
+            scaled = image
+            if scale < 1.0:
+                size = (round(image.width * scale), round(image.height * scale))
+                scaled = image.resize(size, Image.Resampling.LANCZOS)
+            for quality in self.encoding.qualities:
+                data = _encode(scaled, self.encoding, quality)
+                if best is None or len(data) < len(best):
+                    best = data
+                if len(data) <= budget:
+                    break
+            if best is not None and len(best) <= budget:
+                break
+
+        assert best is not None  # every encoding has at least one quality
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self.stats[kind]
+            stats["charts"] += 1
+            stats["bytes"] += len(best)
+            stats["encode_ms"] += elapsed_ms
+            stats[f"tier{tier}"] += 1
+            if len(best) > budget:
+                stats["over_budget"] += 1
+        return best
+
+    def encode_figure(self, fig, kind: str) -> bytes:
+        return self.encode(rasterize(fig), kind)
+
+    def report(self) -> dict:
+        with self._lock:
+            report: Dict[str, Any] = {"format": self.encoding.name}
+            for kind, stats in self.stats.items():
+                count = stats["charts"]
+                report[kind] = {
+                    "charts": int(count),
+                    "avg_kb": round(stats["bytes"] / count / 1024, 1),
+                    "avg_encode_ms": round(stats["encode_ms"] / count, 1),
+                    "budget_kb": round(self.budget(kind) / 1024),
+                    "over_budget": int(stats["over_budget"]),
+                    "tiers": [int(stats[f"tier{i}"]) for i in range(len(RESOLUTION_TIERS))],
+                }
+            return report
+
+
+def survey(image: Image.Image, kind: str) -> Dict[str, dict]:
+    """Size and encode time of one rendered chart under every registered encoding"""
+    results = {}
+    for name in ENCODINGS:
+        encoder = ChartEncoder(name)
+        started = time.perf_counter()
+        data = encoder.encode(image, kind)
+        results[name] = {
+            "kb": round(len(data) / 1024, 1),
+            "encode_ms": round((time.perf_counter() - started) * 1000, 1),
+            "within_budget": len(data) <= encoder.budget(kind),
+        }
+    return results
+
+
+# Create a global instance
+chart_encoder = ChartEncoder()
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from charts.encode import chart_encoder
+
+CHART_CACHE_DIR = Path("cache") / "charts"
+CHART_CACHE_MB = float(os.getenv("CHART_CACHE_MB", "256"))
+EVICT_TO = 0.9  # eviction frees down to this fraction of the budget
+
+# Bump when chart styling changes so older images stop matching
+RENDER_VERSION = 1
+
+
+def content_key(*parts) -> str:
+    """
+    Digest of render parameters, the encoder setting and the exact data drawn.
+    Frames and arrays are hashed by their raw bytes, so a chart re-renders only
+    when the bars behind it change.
+    """
+    digest = hashlib.blake2b(f"{RENDER_VERSION}:{chart_encoder.signature}".encode(), digest_size=20)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            columns = part.columns if isinstance(part, pd.DataFrame) else [part.name]
+            digest.update(repr(list(columns)).encode())
+        elif isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Size-bounded, content-addressed image store on disk.
+
+    Files are named by their content key and written atomically, so several bot
+    processes can share one directory and entries survive restarts. Reads touch
+    the file's mtime; eviction removes the least recently used files first.
+    """
+
+    def __init__(self, directory: Path = CHART_CACHE_DIR, max_mb: float = CHART_CACHE_MB):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(f.stat().st_size for f in self._files())
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def _files(self):
+        return (f for f in self.directory.glob("*/*.png") if f.is_file())
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            image = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return image
+
+    def put(self, key: str, image: bytes):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(image)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Chart cache write failed: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            self.stats["writes"] += 1
+            self._size += len(image)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used files; rescans so other processes' writes count too"""
+        entries = []
+        for f in self._files():
+            try:
+                stat = f.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+        entries.sort()
+
+        size = sum(e[1] for e in entries)
+        target = self.max_bytes * EVICT_TO
+        for _mtime, nbytes, f in entries:
+            if size <= target:
+                break
+            f.unlink(missing_ok=True)
+            size -= nbytes
+            self.stats["evicted"] += 1
+        self._size = size
+
+    @property
+    def size(self) -> int:
+        return int(self._size)
+
+
+# Create a global instance
+image_cache = ImageCache()
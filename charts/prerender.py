@@ -0,0 +1,144 @@
+import heapq
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from charts.chartlar import ChartService, RenderYielded, chart_service
+
+ChartKey = Tuple[str, str, str]  # (symbol, chart_type, period)
+
+HALF_LIFE = 3600  # seconds for a request's weight to halve
+TOP_K = 12
+CPU_BUDGET = 0.15  # fraction of one core the scheduler may spend rendering
+CYCLE_SECONDS = 30
+# Charts expire when their next bar is due; re-rendering earlier would redraw the same bars
+LEAD_TIME = 0
+IDLE_GRACE = 2.0  # seconds without foreground renders before we start work
+MIN_SCORE = 0.05  # entries that decayed below this are forgotten
+
+
+class PopularityTracker:
+    """
+    Decaying LFU counts per (symbol, chart type, period).
+    Each request adds 1.0; weights halve every HALF_LIFE seconds.
+    """
+
+    def __init__(self, half_life: float = HALF_LIFE):
+        self.half_life = half_life
+        self._scores: Dict[ChartKey, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.last_request = 0.0
+
+    def _decayed(self, score: float, stamp: float, now: float) -> float:
+        return score * math.pow(0.5, (now - stamp) / self.half_life)
+
+    def record(self, symbol: str, chart_type: str, period: str, weight: float = 1.0, now=None):
+        now = time.time() if now is None else now
+        key = (symbol, chart_type, period)
+
+        with self._lock:
+            score, stamp = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, stamp, now) + weight, now)
+            if weight >= 1.0:
+                self.last_request = now
+
+    def top(self, k: int, now=None) -> List[Tuple[ChartKey, float]]:
+        now = time.time() if now is None else now
+
+        with self._lock:
+            current = {
+                key: self._decayed(score, stamp, now)
+                for key, (score, stamp) in self._scores.items()
+            }
+            # Forget keys nobody asks for anymore
+            for key, score in current.items():
+                if score < MIN_SCORE:
+                    del self._scores[key]
+
+        return heapq.nlargest(k, current.items(), key=lambda item: item[1])
+
+
+class PrerenderScheduler:
+    """
+    Re-renders the most requested charts shortly before their cache entries expire.
+    Work only happens while the bot is idle and within a CPU budget per cycle.
+    """
+
+    def __init__(
+        self,
+        service: ChartService,
+        tracker: Optional[PopularityTracker] = None,
+        top_k: int = TOP_K,
+        cpu_budget: float = CPU_BUDGET,
+        cycle: float = CYCLE_SECONDS,
+        lead_time: float = LEAD_TIME,
+    ):
+        self.service = service
+        self.tracker = tracker or PopularityTracker()
+        self.top_k = top_k
+        self.cpu_budget = cpu_budget
+        self.cycle = cycle
+        self.lead_time = lead_time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Small prior so a cold start still warms something useful
+        for symbol in service.popular_symbols[:3]:
+            self.tracker.record(symbol, "price", "30d", weight=MIN_SCORE * 4)
+
+    def record(self, symbol: str, chart_type: str, period: str):
+        self.tracker.record(symbol, chart_type, period)
+
+    def _is_idle(self) -> bool:
+        return not self.service.is_busy and time.time() - self.tracker.last_request >= IDLE_GRACE
+
+    def run_once(self) -> int:
+        """Render due charts from the top-K list; returns how many were rendered"""
+        budget = self.cycle * self.cpu_budget
+        spent = 0.0
+        rendered = 0
+
+        for (symbol, chart_type, period), _score in self.tracker.top(self.top_k):
+            if spent >= budget or self._stop.is_set():
+                break
+
+            expires_in = self.service.chart_expires_in(chart_type, symbol, period)
+            if expires_in is not None and expires_in > self.lead_time:
+                continue
+
+            # Yield to user traffic
+            while not self._is_idle():
+                if self._stop.wait(0.5):
+                    return rendered
+
+            started = time.thread_time()
+            try:
+                with self.service.background():
+                    self.service.generate_chart(chart_type, symbol, period, force=True)
+                rendered += 1
+            except RenderYielded:
+                pass  # retried next cycle if it is still due
+            except Exception as e:
+                print(f"Pre-render {symbol} {chart_type} {period} failed: {e}")
+            spent += time.thread_time() - started
+
+        return rendered
+
+    def _loop(self):
+        while not self._stop.wait(self.cycle):
+            self.run_once()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+# Create a global instance
+prerender_scheduler = PrerenderScheduler(chart_service)
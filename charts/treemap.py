@@ -0,0 +1,65 @@
+from typing import List, Sequence, Tuple
+
+Rect = Tuple[float, float, float, float]  # x, y, width, height
+
+
+def _worst_ratio(row: List[float], side: float) -> float:
+    total = sum(row)
+    return max(
+        max(side * side * r / (total * total), (total * total) / (side * side * r)) for r in row
+    )
+
+
+def _place_row(row: List[float], x: float, y: float, w: float, h: float, out: List[Rect]):
+    """Lay a finished row along the shorter side and return the remaining free space"""
+    total = sum(row)
+
+    if w >= h:
+        # Column on the left, filled top to bottom
+        width = total / h
+        top = y + h
+        for r in row:
+            height = r / width
+            top -= height
+            out.append((x, top, width, height))
+        return x + width, y, w - width, h
+
+    # Row along the top, filled left to right
+    height = total / w
+    left = x
+    for r in row:
+        width = r / height
+        out.append((left, y + h - height, width, height))
+        left += width
+    return x, y, w, h - height
+
+
+def squarify(values: Sequence[float], x: float, y: float, w: float, h: float) -> List[Rect]:
+    """
+    Squarified treemap layout (Bruls, Huizing & van Wijk).
+    Values should be sorted in descending order; rects come back in the same order.
+    """
+    positive = [v for v in values if v > 0]
+    if not positive or w <= 0 or h <= 0:
+        return []
+
+    scale = w * h / sum(positive)
+    sizes = [v * scale for v in positive]
+
+    rects: List[Rect] = []
+    row: List[float] = []
+    i = 0
+    while i < len(sizes):
+        side = min(w, h)
+        candidate = row + [sizes[i]]
+        if not row or _worst_ratio(candidate, side) <= _worst_ratio(row, side):
+            row = candidate
+            i += 1
+        else:
+            x, y, w, h = _place_row(row, x, y, w, h, rects)
+            row = []
+
+    if row:
+        _place_row(row, x, y, w, h, rects)
+
+    return rects
@@ -0,0 +1,195 @@
+"""
+Equivalence check and benchmark for the indicator kernels.
+
+Computes the screener and chart indicators over a synthetic (symbols x bars)
+panel three ways - pandas per symbol (the rolling/ewm formulas the kernels
+replaced), the NumPy kernels and, when Numba is installed, the compiled
+kernels - checks that every result matches pandas and reports the timings.
+Exits non-zero on a mismatch.
+
+    python indicatorbench.py --symbols 500 --bars 1260
+    python indicatorbench.py --symbols 1 --bars 1260 --repeat 20 --json
+"""
+
+import argparse
+import json
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(REPO_DIR))
+
+# A bare package stands in for services/__init__, which downloads the index
+# lists and starts the cache warmer; the kernels need neither
+_services = types.ModuleType("services")
+_services.__path__ = [str(REPO_DIR / "services")]
+sys.modules.setdefault("services", _services)
+
+from services import indicators, kernels  # noqa: E402
+
+KEYS = [
+    "sma:20",
+    "std:20",
+    "ema:12",
+    "macd:12:26",
+    "macd_signal:12:26:9",
+    "macd_hist:12:26:9",
+    "rsi:14",
+    "tr",
+    "atr:14",
+    "stoch_k:14",
+    "bb_upper:20:2",
+]
+RTOL, ATOL = 1e-9, 1e-8
+LATE_LISTED = 0.1  # share of symbols whose history starts partway through the panel
+
+
+def synthetic_sources(symbols: int, bars: int, seed: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (symbols, bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (symbols, bars)))
+    sources = {
+        "close": close,
+        "high": close * (1 + spread),
+        "low": close * (1 - spread),
+        "volume": rng.integers(10**5, 10**7, (symbols, bars)).astype(float),
+    }
+    # Late listings start with NaN, as rows of a store panel do
+    for row in rng.choice(symbols, int(symbols * LATE_LISTED), replace=False):
+        start = rng.integers(1, bars // 2)
+        for values in sources.values():
+            values[row, :start] = np.nan
+    return sources
+
+
+def pandas_indicators(sources: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """One DataFrame per symbol through pandas rolling/ewm"""
+    rows: Dict[str, List[np.ndarray]] = {key: [] for key in KEYS}
+    for i in range(sources["close"].shape[0]):
+        close, high, low = (pd.Series(sources[f][i]) for f in ("close", "high", "low"))
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0).rolling(14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+        ema12 = close.ewm(span=12, adjust=False).mean()
+        line = ema12 - close.ewm(span=26, adjust=False).mean()
+        signal = line.ewm(span=9, adjust=False).mean()
+        prev_close = close.shift()
+        tr = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1)
+        tr = tr.max(axis=1)
+        sma, std = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+        low14 = low.rolling(14).min()
+
+        series = {
+            "sma:20": sma,
+            "std:20": std,
+            "ema:12": ema12,
+            "macd:12:26": line,
+            "macd_signal:12:26:9": signal,
+            "macd_hist:12:26:9": line - signal,
+            "rsi:14": 100 - 100 / (1 + gain / loss),
+            "tr": tr,
+            "atr:14": tr.rolling(14).mean(),
+            "stoch_k:14": 100 * (close - low14) / (high.rolling(14).max() - low14),
+            "bb_upper:20:2": sma + 2 * std,
+        }
+        for key, values in series.items():
+            rows[key].append(values.to_numpy())
+    return {key: np.vstack(values) for key, values in rows.items()}
+
+
+def kernel_indicators(compiled: bool) -> Callable:
+    def run(sources):
+        kernels.enabled = compiled
+        return indicators.compute(KEYS, sources)
+
+    return run
+
+
+def best_time(func: Callable, sources, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(sources)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def mismatches(reference: Dict[str, np.ndarray], results: Dict[str, np.ndarray]) -> Dict:
+    """Largest absolute difference per indicator that exceeds the tolerance"""
+    bad = {}
+    for key in KEYS:
+        expected, actual = reference[key], results[key]
+        if not np.allclose(actual, expected, rtol=RTOL, atol=ATOL, equal_nan=True):
+            with np.errstate(invalid="ignore"):
+                diff = np.nanmax(np.abs(actual - expected))
+            nan_mismatch = int((np.isnan(actual) != np.isnan(expected)).sum())
+            bad[key] = {"max_abs_diff": float(diff), "nan_mismatch": nan_mismatch}
+    return bad
+
+
+def run(args) -> Dict:
+    sources = synthetic_sources(args.symbols, args.bars, args.seed)
+    tiers: Dict[str, Callable] = {"pandas": pandas_indicators, "numpy": kernel_indicators(False)}
+    report = {"symbols": args.symbols, "bars": args.bars, "tiers": {}, "mismatches": {}}
+
+    if kernels.AVAILABLE:
+        started = time.perf_counter()
+        kernel_indicators(True)(sources)  # first call compiles (or loads the on-disk cache)
+        report["numba_compile_s"] = round(time.perf_counter() - started, 2)
+        tiers["numba"] = kernel_indicators(True)
+
+    reference = None
+    for name, func in tiers.items():
+        # pandas is much slower; a single pass of it is representative
+        seconds, results = best_time(func, sources, 1 if name == "pandas" else args.repeat)
+        if reference is None:
+            reference = results
+        else:
+            report["mismatches"][name] = mismatches(reference, results)
+        report["tiers"][name] = {"ms": round(seconds * 1000, 2)}
+
+    baseline = report["tiers"]["pandas"]["ms"]
+    for stats in report["tiers"].values():
+        stats["speedup"] = round(baseline / stats["ms"], 1) if stats["ms"] else None
+    return report
+
+
+def print_report(report: Dict):
+    print(f"{report['symbols']} symbols x {report['bars']} bars, {len(KEYS)} indicators")
+    if "numba_compile_s" in report:
+        print(f"Numba first call (compile or cache load): {report['numba_compile_s']}s")
+    else:
+        print("Numba not installed: compiled tier skipped")
+    print(f"\n{'tier':<10}{'ms':>12}{'speedup':>10}")
+    for name, stats in report["tiers"].items():
+        print(f"{name:<10}{stats['ms']:>12.2f}{stats['speedup']:>9}x")
+    for name, bad in report["mismatches"].items():
+        print(f"\n{name} vs pandas: " + (f"MISMATCH {bad}" if bad else "equal"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=1260, help="daily bars, 1260 is 5 years")
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if any(report["mismatches"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Load generator for the bot handlers.
+
+Drives the real on_button / handle_message handlers with simulated users
+through fake Telegram objects and a synthetic market-data source, then reports
+throughput, latency percentiles per flow and step, event-loop lag and peak
+memory. Runs in a throwaway working directory so the real cache is untouched.
+
+    python loadtest.py --users 500 --duration 60
+    python loadtest.py --users 50 --duration 20 --json > baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# Bars returned per (interval) by the synthetic source, roughly what Yahoo returns
+SYNTHETIC_BARS = {"1m": 390, "5m": 78, "15m": 130, "1h": 147, "1d": 1258, "1wk": 260}
+SYNTHETIC_SECTORS = ["Information Technology", "Health Care", "Financials", "Energy", "Utilities"]
+SYNTHETIC_FREQ = {"1m": "min", "5m": "5min", "15m": "15min", "1h": "h", "1d": "B", "1wk": "W-FRI"}
+
+# flow name -> (weight, steps); steps are (step name, kind, payload template)
+FLOWS = {
+    "ranking": (
+        4,
+        [
+            ("menu", "button", "menu"),
+            ("best", "button", "{side}"),
+            ("period", "button", "{side}_{period}"),
+            ("limit", "button", "{side}_{period}_{limit}"),
+        ],
+    ),
+    "search_chart": (
+        5,
+        [
+            ("search", "button", "search"),
+            ("symbol", "text", "{symbol}"),
+            ("chartselect", "button", "chartselect:{chart}:{symbol}"),
+            ("chart", "button", "chart:{chart}:{symbol}:{chart_period}"),
+        ],
+    ),
+    "sectors": (1, [("menu", "button", "menu"), ("sectors", "button", "sectors")]),
+}
+
+
+# --- Synthetic market data ---
+
+
+class SyntheticSource:
+    """Deterministic random walks standing in for yfinance, with optional latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def ticker(self, symbol: str):
+        source = self
+
+        class Ticker:
+            def history(self, period="1mo", interval="1d", **kwargs):
+                return source.history(symbol, interval)
+
+        return Ticker()
+
+    def history(self, symbol: str, interval: str) -> pd.DataFrame:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        n = SYNTHETIC_BARS.get(interval, 250)
+        rng = np.random.default_rng(zlib.crc32(f"{symbol}:{interval}".encode()))
+        end = pd.Timestamp.now(tz="America/New_York").floor("min")
+        index = pd.date_range(end=end, periods=n, freq=SYNTHETIC_FREQ.get(interval, "B"))
+
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+        open_ = close * (1 + rng.normal(0, 0.003, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+        volume = rng.integers(100_000, 10_000_000, n)
+        return pd.DataFrame(
+            {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+            index=index,
+        )
+
+
+def synthetic_symbols(count: int) -> List[str]:
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    pairs = ("".join(p) for p in itertools.product(letters, repeat=3))
+    return [f"X{p}" for p in itertools.islice(pairs, count)]
+
+
+def synthetic_table(symbols: List[str]) -> List[Dict[str, str]]:
+    """Constituents metadata in the cached Wikipedia table format"""
+    return [
+        {
+            "symbol": symbol,
+            "name": f"{symbol} Corp",
+            "sector": SYNTHETIC_SECTORS[i % len(SYNTHETIC_SECTORS)],
+            "sub_industry": "",
+        }
+        for i, symbol in enumerate(symbols)
+    ]
+
+
+# --- Fake Telegram objects ---
+
+
+class FakeBot:
+    """Bot API stand-in; every call costs `latency` seconds of network time"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    async def _call(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def message(self, chat_id: int, text: str = "", photo=None) -> "FakeMessage":
+        return FakeMessage(self, chat_id, next(self._ids), text, photo)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call()
+        return self.message(chat_id, text)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        await self._call()
+        return self.message(chat_id, kwargs.get("caption", ""), photo=[photo])
+
+
+class FakeMessage:
+    def __init__(self, bot: FakeBot, chat_id: int, message_id: int, text: str, photo=None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+        self.photo = photo
+
+    async def reply_text(self, text, **kwargs):
+        await self.bot._call()
+        return self.bot.message(self.chat_id, text)
+
+    async def edit_text(self, text, **kwargs):
+        await self.bot._call()
+        self.text = text
+        return self
+
+    async def delete(self):
+        await self.bot._call()
+        return True
+
+
+class FakeQuery:
+    def __init__(self, data: str, message: FakeMessage):
+        self.data = data
+        self.message = message
+
+    async def answer(self, *args, **kwargs):
+        await self.message.bot._call()
+
+    async def edit_message_text(self, text, **kwargs):
+        return await self.message.edit_text(text, **kwargs)
+
+
+class FakeUpdate:
+    def __init__(self, callback_query=None, message=None):
+        self.callback_query = callback_query
+        self.message = message
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot, user_data: Dict):
+        self.bot = bot
+        self.user_data = user_data
+        self.args: List[str] = []
+
+
+# --- Simulation ---
+
+
+class Recorder:
+    def __init__(self):
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.flows: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.lag: List[float] = []
+
+
+async def simulate_user(user_id, handlers, bot, params, recorder, deadline, think, rng):
+    chat_id = 10_000 + user_id
+    context = FakeContext(bot, {})
+    screen = bot.message(chat_id, "📊 Stock Advisor Bot")
+    flows, weights = zip(*((name, flow[0]) for name, flow in FLOWS.items()))
+
+    while time.monotonic() < deadline:
+        name = rng.choices(flows, weights)[0]
+        values = params(rng)
+        flow_time = 0.0
+        for step, kind, template in FLOWS[name][1]:
+            payload = template.format(**values)
+            started = time.perf_counter()
+            try:
+                if kind == "button":
+                    await handlers.on_button(FakeUpdate(FakeQuery(payload, screen)), context)
+                else:
+                    await handlers.handle_message(
+                        FakeUpdate(message=bot.message(chat_id, payload)), context
+                    )
+            except Exception as e:
+                recorder.errors[f"{step}: {type(e).__name__}"] += 1
+            elapsed = time.perf_counter() - started
+            recorder.steps[step].append(elapsed)
+            flow_time += elapsed
+            await asyncio.sleep(rng.expovariate(1 / think) if think else 0)
+        recorder.flows[name].append(flow_time)
+
+
+async def monitor_loop_lag(recorder, deadline, interval=0.05):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        recorder.lag.append(time.perf_counter() - started - interval)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "p50_ms": round(p50 * 1000, 1),
+        "p95_ms": round(p95 * 1000, 1),
+        "p99_ms": round(p99 * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run(args) -> Dict:
+    source = SyntheticSource(args.source_latency)
+    yf.Ticker = source.ticker
+
+    # Imported late: the services read the universe and start warming on import
+    from bot import handlers
+    from bot.outbox import Outbox
+    from charts.chartlar import CHART_SOURCES
+    from charts.encode import chart_encoder
+    from services.market import universe_members
+    from services.returns import MENU_WINDOWS
+
+    if args.no_rate_limit:
+        handlers.outbox = Outbox(1e6, 10**6, 1e6, 10**6)
+
+    universe = universe_members()
+    # Zipf-like popularity: a few symbols get most of the searches
+    ranks = np.arange(1, len(universe) + 1)
+    popularity = (1 / ranks**args.zipf).tolist()
+
+    def params(rng):
+        return {
+            "side": rng.choice(["best", "worst"]),
+            "period": rng.choice(MENU_WINDOWS),
+            "limit": rng.choice([5, 10, 20]),
+            "symbol": rng.choices(universe, popularity)[0],
+            "chart": rng.choice(["price", "indicators"]),
+            "chart_period": rng.choice(list(CHART_SOURCES)),
+        }
+
+    bot = FakeBot(args.api_latency)
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + args.duration
+
+    users = [asyncio.create_task(monitor_loop_lag(recorder, deadline))]
+    for user_id in range(args.users):
+        rng = random.Random(args.seed + user_id)
+        users.append(
+            asyncio.create_task(
+                simulate_user(user_id, handlers, bot, params, recorder, deadline, args.think, rng)
+            )
+        )
+        # Ramp up instead of a thundering herd at t=0
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.users)
+    await asyncio.gather(*users)
+    wall = time.monotonic() - started
+
+    steps = sum(len(v) for v in recorder.steps.values())
+    return {
+        "users": args.users,
+        "wall_s": round(wall, 1),
+        "flows_per_s": round(sum(len(v) for v in recorder.flows.values()) / wall, 2),
+        "steps_per_s": round(steps / wall, 2),
+        "flows": {name: percentiles(v) for name, v in sorted(recorder.flows.items())},
+        "steps": {name: percentiles(v) for name, v in sorted(recorder.steps.items())},
+        "loop_lag": percentiles(recorder.lag),
+        "errors": dict(recorder.errors),
+        "upstream_fetches": source.calls,
+        "bot_api_calls": bot.calls,
+        "outbox": dict(handlers.outbox.stats),
+        "prefetch": handlers.prefetcher.report(),
+        "encoder": chart_encoder.report(),
+        "peak_rss_mb": peak_memory_mb(),
+    }
+
+
+def print_report(report: Dict):
+    print(
+        f"{report['users']} users, {report['wall_s']}s: "
+        f"{report['flows_per_s']} flows/s, {report['steps_per_s']} steps/s"
+    )
+    for section in ("flows", "steps"):
+        print(f"\n{section.title():<14}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for name, stats in report[section].items():
+            if not stats["count"]:
+                continue
+            print(
+                f"{name:<14}{stats['count']:>8}{stats['p50_ms']:>8.0f}ms{stats['p95_ms']:>8.0f}ms"
+                f"{stats['p99_ms']:>8.0f}ms{stats['max_ms']:>8.0f}ms"
+            )
+    lag = report["loop_lag"]
+    if lag["count"]:
+        print(
+            f"\nEvent-loop lag: p50 {lag['p50_ms']}ms, p99 {lag['p99_ms']}ms, max {lag['max_ms']}ms"
+        )
+    print(
+        f"Upstream fetches: {report['upstream_fetches']}, Bot API calls: {report['bot_api_calls']}"
+    )
+    print(f"Outbox: {report['outbox']}")
+    print(f"Prefetch: {report['prefetch']}")
+    print(f"Encoder: {report['encoder']}")
+    print(f"Peak RSS: {report['peak_rss_mb']} MB")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds to start every user")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between clicks")
+    parser.add_argument("--symbols", type=int, default=100, help="synthetic universe size")
+    parser.add_argument("--zipf", type=float, default=1.1, help="symbol popularity skew")
+    parser.add_argument("--source-latency", type=float, default=0.2, help="seconds per fetch")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per Bot call")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable outbox buckets")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stockfather-load-")
+    os.makedirs(os.path.join(workdir, "cache"))
+    symbols = synthetic_symbols(args.symbols)
+    with open(os.path.join(workdir, "cache", "sp500.json"), "w") as f:
+        json.dump(symbols, f)
+    with open(os.path.join(workdir, "cache", "sp500_meta.json"), "w") as f:
+        json.dump(synthetic_table(symbols), f)
+    os.environ["UNIVERSE_SIZE"] = str(args.symbols)
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_DIR))
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,21 +5,68 @@ from telegram.ext import (
     ApplicationBuilder,
     CallbackQueryHandler,
     CommandHandler,
+    InlineQueryHandler,
     MessageHandler,
     filters,
 )
 
-from bot import handle_message, on_button, start
+from api import start_api
+from bot import (
+    alert_command,
+    backtest_command,
+    compare_command,
+    correlated_command,
+    digest_command,
+    handle_message,
+    inline_query,
+    on_button,
+    profile_command,
+    ranking_command,
+    screen_command,
+    start,
+    start_alert_loop,
+    start_digest_loop,
+    stock_command,
+    unalert_command,
+    unwatch_command,
+    watch_command,
+)
+from charts import prerender_scheduler
+from services import quote_feed, start_from_env
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 
+async def on_startup(application):
+    """Background work that shares the bot's event loop"""
+    await start_alert_loop(application)
+    await start_digest_loop(application)
+    await start_api(application)
+
+
 def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = ApplicationBuilder().token(BOT_TOKEN).post_init(on_startup).build()
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("stock", stock_command))
+    app.add_handler(CommandHandler(["best", "worst"], ranking_command))
+    app.add_handler(CommandHandler("screen", screen_command))
+    app.add_handler(CommandHandler("backtest", backtest_command))
+    app.add_handler(CommandHandler("compare", compare_command))
+    app.add_handler(CommandHandler("correlated", correlated_command))
+    app.add_handler(CommandHandler("watch", watch_command))
+    app.add_handler(CommandHandler("unwatch", unwatch_command))
+    app.add_handler(CommandHandler("alert", alert_command))
+    app.add_handler(CommandHandler("unalert", unalert_command))
+    app.add_handler(CommandHandler("digest", digest_command))
+    app.add_handler(CommandHandler("profile", profile_command))
+    app.add_handler(InlineQueryHandler(inline_query))
     app.add_handler(CallbackQueryHandler(on_button))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    prerender_scheduler.start()
+    if quote_feed is not None:
+        quote_feed.start()
+    start_from_env()
     app.run_polling()
 
 
@@ -1,10 +1,84 @@
 # services/__init__.py
-from .market import best_performers, get_stock_performance, worst_performers
-from .universe import load_sp500
+from .alerts import Alert, AlertBook, Watchlists, alert_book, watchlists
+from .backtest import STRATEGIES, Backtester, Strategy, backtester, register_strategy
+from .correlation import CorrelationTable, aligned_returns, compare, correlation_table
+from .market import (
+    RankingUpdate,
+    best_performers,
+    get_stock_performance,
+    latest_quotes,
+    performance_table,
+    stream_performers,
+    worst_performers,
+)
+from .profiler import Profiler, profiled, profiler, start_from_env
+from .quotes import QuoteFeed, QuoteSimulator, poll_quotes, quote_feed
+from .returns import MENU_WINDOWS, WINDOWS, Window, get_window, register_window, window_returns
+from .screener import CONDITIONS, Condition, Screener, register_condition, screener
+from .sectors import sector_performance, universe_snapshot
+from .symbols import SymbolIndex, symbol_index
+from .universe import (
+    DEFAULT_UNIVERSE,
+    UNIVERSES,
+    Universe,
+    load_dow30,
+    load_nasdaq100,
+    load_sp500,
+    load_sp500_table,
+    register_universe,
+)
 
 __all__ = [
     "best_performers",
     "worst_performers",
+    "stream_performers",
+    "RankingUpdate",
     "get_stock_performance",
+    "performance_table",
+    "latest_quotes",
+    "Window",
+    "WINDOWS",
+    "MENU_WINDOWS",
+    "get_window",
+    "register_window",
+    "window_returns",
+    "Condition",
+    "CONDITIONS",
+    "register_condition",
+    "Screener",
+    "screener",
+    "sector_performance",
+    "universe_snapshot",
     "load_sp500",
+    "load_sp500_table",
+    "load_nasdaq100",
+    "load_dow30",
+    "Universe",
+    "UNIVERSES",
+    "DEFAULT_UNIVERSE",
+    "register_universe",
+    "SymbolIndex",
+    "symbol_index",
+    "Strategy",
+    "STRATEGIES",
+    "register_strategy",
+    "Backtester",
+    "backtester",
+    "aligned_returns",
+    "compare",
+    "CorrelationTable",
+    "correlation_table",
+    "Alert",
+    "AlertBook",
+    "Watchlists",
+    "alert_book",
+    "watchlists",
+    "Profiler",
+    "profiler",
+    "profiled",
+    "start_from_env",
+    "QuoteFeed",
+    "QuoteSimulator",
+    "poll_quotes",
+    "quote_feed",
 ]
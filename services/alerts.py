@@ -0,0 +1,223 @@
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+CACHE_DIR = Path("cache")
+CACHE_DIR.mkdir(exist_ok=True)
+ALERTS_FILE = CACHE_DIR / "alerts.json"
+WATCHLISTS_FILE = CACHE_DIR / "watchlists.json"
+
+MAX_ALERTS_PER_CHAT = 50
+MAX_WATCHLIST = 50
+
+# What an alert compares against its threshold
+METRICS = {"price": "price", "change": "today's change"}
+DIRECTIONS = ("above", "below")
+
+
+class Alert(NamedTuple):
+    id: int
+    chat_id: int
+    symbol: str
+    metric: str  # key of METRICS
+    direction: str  # "above" or "below"
+    threshold: float
+    created: float
+
+
+IndexKey = Tuple[str, str, str]  # (symbol, metric, direction)
+Quotes = Dict[str, Dict[str, float]]  # symbol -> metric -> value
+
+
+def _write_json(path: Path, payload):
+    """Write through a temp file so a crash never leaves half a file behind"""
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path, default):
+    if not path.exists() or path.stat().st_size == 0:
+        return default
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {path}: {e}")
+        return default
+
+
+class AlertBook:
+    """
+    One-shot price alerts indexed for batch evaluation.
+
+    Alerts are grouped by (symbol, metric, direction), each group keeping its
+    thresholds sorted. With a fresh value per symbol, the triggered alerts of a
+    group are a prefix ("above") or suffix ("below") found by one binary search.
+    """
+
+    def __init__(self, path: Optional[Path] = ALERTS_FILE):
+        self.path = path
+        self._index: Dict[IndexKey, Tuple[List[float], List[Alert]]] = {}
+        self._by_id: Dict[int, Alert] = {}
+        self._by_chat: Dict[int, Dict[int, Alert]] = defaultdict(dict)
+        self._next_id = 1
+        if path is not None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # --- Persistence ---
+
+    def load(self):
+        if self.path is None:
+            return  # in-memory book
+        payload = _read_json(self.path, {"next_id": 1, "alerts": []})
+        self._index, self._by_id, self._by_chat = {}, {}, defaultdict(dict)
+        for fields in payload["alerts"]:
+            self._insert(Alert(*fields))
+        self._next_id = max(payload["next_id"], max(self._by_id, default=0) + 1)
+
+    def save(self):
+        if self.path is not None:
+            alerts = [list(a) for a in self._by_id.values()]
+            _write_json(self.path, {"next_id": self._next_id, "alerts": alerts})
+
+    # --- Index maintenance ---
+
+    def _insert(self, alert: Alert):
+        thresholds, alerts = self._index.setdefault(
+            (alert.symbol, alert.metric, alert.direction), ([], [])
+        )
+        pos = bisect_right(thresholds, alert.threshold)
+        thresholds.insert(pos, alert.threshold)
+        alerts.insert(pos, alert)
+        self._by_id[alert.id] = alert
+        self._by_chat[alert.chat_id][alert.id] = alert
+
+    def _forget(self, alert: Alert):
+        del self._by_id[alert.id]
+        chat = self._by_chat[alert.chat_id]
+        del chat[alert.id]
+        if not chat:
+            del self._by_chat[alert.chat_id]
+
+    def add(self, chat_id: int, symbol: str, metric: str, direction: str, threshold: float):
+        if metric not in METRICS or direction not in DIRECTIONS:
+            raise ValueError(f"Unknown alert {metric} {direction}")
+        if len(self._by_chat.get(chat_id, ())) >= MAX_ALERTS_PER_CHAT:
+            raise ValueError(f"At most {MAX_ALERTS_PER_CHAT} alerts per chat")
+
+        alert = Alert(self._next_id, chat_id, symbol, metric, direction, threshold, time.time())
+        self._next_id += 1
+        self._insert(alert)
+        self.save()
+        return alert
+
+    def remove(self, chat_id: int, alert_id: int) -> bool:
+        alert = self._by_id.get(alert_id)
+        if alert is None or alert.chat_id != chat_id:
+            return False
+
+        key = (alert.symbol, alert.metric, alert.direction)
+        thresholds, alerts = self._index[key]
+        # Equal thresholds sit next to each other; scan only that run
+        pos = bisect_left(thresholds, alert.threshold)
+        while alerts[pos].id != alert_id:
+            pos += 1
+        del thresholds[pos], alerts[pos]
+        if not alerts:
+            del self._index[key]
+
+        self._forget(alert)
+        self.save()
+        return True
+
+    def for_chat(self, chat_id: int) -> List[Alert]:
+        return sorted(self._by_chat.get(chat_id, {}).values(), key=lambda a: a.id)
+
+    def symbols(self) -> List[str]:
+        """Every symbol with at least one pending alert"""
+        return sorted({key[0] for key in self._index})
+
+    # --- Evaluation ---
+
+    def evaluate(self, quotes: Quotes) -> List[Tuple[Alert, float]]:
+        """Pop and return every alert crossed by the given values, with the value that fired it"""
+        fired: List[Tuple[Alert, float]] = []
+
+        for key in list(self._index):
+            symbol, metric, direction = key
+            value = quotes.get(symbol, {}).get(metric)
+            if value is None or value != value:
+                continue
+
+            thresholds, alerts = self._index[key]
+            if direction == "above":
+                cut = bisect_right(thresholds, value)
+                hit = alerts[:cut]
+                del thresholds[:cut], alerts[:cut]
+            else:
+                cut = bisect_left(thresholds, value)
+                hit = alerts[cut:]
+                del thresholds[cut:], alerts[cut:]
+
+            fired.extend((alert, value) for alert in hit)
+            if not alerts:
+                del self._index[key]
+
+        for alert, _value in fired:
+            self._forget(alert)
+        if fired:
+            self.save()
+
+        return fired
+
+
+class Watchlists:
+    """Symbols each chat follows, persisted as JSON"""
+
+    def __init__(self, path: Optional[Path] = WATCHLISTS_FILE):
+        self.path = path
+        self._lists: Dict[int, List[str]] = defaultdict(list)
+        if path is not None:
+            for chat_id, symbols in _read_json(path, {}).items():
+                self._lists[int(chat_id)] = symbols
+
+    def get(self, chat_id: int) -> List[str]:
+        return list(self._lists.get(chat_id, []))
+
+    def add(self, chat_id: int, symbols: List[str]) -> List[str]:
+        """Append new symbols (up to MAX_WATCHLIST); returns the ones actually added"""
+        current = self._lists[chat_id]
+        added = []
+        for symbol in symbols:
+            if symbol not in current and len(current) < MAX_WATCHLIST:
+                current.append(symbol)
+                added.append(symbol)
+        if added:
+            self.save()
+        return added
+
+    def remove(self, chat_id: int, symbols: List[str]) -> List[str]:
+        current = self._lists.get(chat_id, [])
+        removed = [s for s in symbols if s in current]
+        if removed:
+            self._lists[chat_id] = [s for s in current if s not in removed]
+            self.save()
+        return removed
+
+    def save(self):
+        if self.path is not None:
+            _write_json(self.path, {str(k): v for k, v in self._lists.items() if v})
+
+
+# Create global instances
+alert_book = AlertBook()
+watchlists = Watchlists()
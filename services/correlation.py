@@ -0,0 +1,183 @@
+import threading
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+import numpy as np
+import pandas as pd
+
+from services.market import get_daily_history, universe_expires_at, universe_symbols
+from services.returns import get_window, resolve_positions
+from services.store import get_store
+
+BENCHMARK = "SPY"
+MIN_RETURNS = 20  # fewer aligned daily returns than this are not worth correlating
+
+
+class Relation(TypedDict):
+    symbol: str
+    correlation: float
+    beta: Optional[float]
+
+
+_daily = get_store("1d")
+
+
+def aligned_returns(symbols: List[str], period: str = "1y") -> Tuple[List[str], np.ndarray]:
+    """
+    Daily simple returns over a window, (time x symbols), on the shared daily axis.
+    Symbols without a full history in the window are dropped so every row is complete.
+    """
+    panel = _daily.panel(symbols)
+    window = get_window(period)
+    positions = resolve_positions(panel.index, window) if window and not panel.empty else None
+    if positions is None:
+        return [], np.empty((0, 0))
+
+    base, end = positions
+    closes = panel.to_numpy(dtype=np.float64)[base : end + 1]
+    complete = ~np.isnan(closes).any(axis=0)
+    closes = closes[:, complete]
+    return list(panel.columns[complete]), closes[1:] / closes[:-1] - 1
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """Pearson correlation of every column pair in one call"""
+    if returns.shape[1] == 1:
+        return np.ones((1, 1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.corrcoef(returns, rowvar=False)
+
+
+def correlate_with(returns: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Correlation of every column with one series (a single row of the full matrix)"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (returns - returns.mean(axis=0)) / returns.std(axis=0)
+        t = (target - target.mean()) / target.std()
+        return z.T @ t / len(t)
+
+
+def betas(returns: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
+    """Beta of every column against one benchmark return series"""
+    centered = returns - returns.mean(axis=0)
+    bench = benchmark - benchmark.mean()
+    variance = bench @ bench
+    if variance == 0:
+        return np.full(returns.shape[1], np.nan)
+    return centered.T @ bench / variance
+
+
+def compare(symbols: List[str], period: str = "1y") -> Optional[Dict]:
+    """Correlation matrix and betas for a handful of symbols (fetched if needed)"""
+    for symbol in symbols + [BENCHMARK]:
+        get_daily_history(symbol)
+
+    columns, returns = aligned_returns(symbols + [BENCHMARK], period)
+    if len(returns) < MIN_RETURNS or BENCHMARK not in columns:
+        return None
+
+    bench = returns[:, columns.index(BENCHMARK)]
+    keep = [i for i, s in enumerate(columns) if s != BENCHMARK or BENCHMARK in symbols]
+    names = [columns[i] for i in keep]
+    return {
+        "symbols": names,
+        "matrix": pd.DataFrame(correlation_matrix(returns[:, keep]), index=names, columns=names),
+        "beta": pd.Series(betas(returns[:, keep], bench), index=names),
+    }
+
+
+class CorrelationTable:
+    """
+    Universe-wide correlation matrix and betas vs the benchmark, rebuilt once per
+    data refresh. Neighbour queries are then a row lookup plus a partial sort.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Dict[
+            str, Tuple[tuple, List[str], Dict[str, int], np.ndarray, np.ndarray]
+        ] = {}
+
+    def _table(self, period: str):
+        symbols = universe_symbols()
+        get_daily_history(BENCHMARK)
+
+        # One build per universe refresh (a new expiry, or more members once another
+        # universe is loaded). The store's global version is bumped by every quote
+        # patch and single-symbol fetch, so it is not part of the key.
+        refresh = (universe_expires_at(), len(symbols))
+        with self._lock:
+            cached = self._tables.get(period)
+            if cached and cached[0] == refresh:
+                return cached
+
+            columns, returns = aligned_returns(symbols + [BENCHMARK], period)
+            if len(returns) < MIN_RETURNS or BENCHMARK not in columns:
+                return None
+
+            bench = returns[:, columns.index(BENCHMARK)]
+            keep = [i for i, s in enumerate(columns) if s != BENCHMARK]
+            names = [columns[i] for i in keep]
+            table = (
+                refresh,
+                names,
+                {s: i for i, s in enumerate(names)},
+                correlation_matrix(returns[:, keep]),
+                betas(returns[:, keep], bench),
+            )
+            self._tables[period] = table
+            return table
+
+    def beta(self, symbol: str, period: str = "1y") -> Optional[float]:
+        table = self._table(period)
+        if table is None or symbol not in table[2]:
+            return None
+        return float(table[4][table[2][symbol]])
+
+    @staticmethod
+    def _outside_row(symbol: str, names: List[str], rows: Dict[str, int], period: str):
+        """Correlations of a symbol outside the universe with every member"""
+        hist = get_daily_history(symbol)
+        if hist is None or hist.empty:
+            return None
+        columns, returns = aligned_returns(names + [symbol], period)
+        if symbol not in columns or len(returns) < MIN_RETURNS:
+            return None
+
+        target = columns.index(symbol)
+        values = correlate_with(returns, returns[:, target])
+        row = np.full(len(names), np.nan)
+        for i, name in enumerate(columns):
+            if i != target:
+                row[rows[name]] = values[i]
+        return row
+
+    def neighbours(
+        self, symbol: str, period: str = "1y", limit: int = 10, most: bool = True
+    ) -> List[Relation]:
+        """Most (or least) correlated universe members with a symbol"""
+        table = self._table(period)
+        if table is None:
+            return []
+
+        _version, names, rows, matrix, beta = table
+        if symbol in rows:
+            row = matrix[rows[symbol]].copy()
+            row[rows[symbol]] = np.nan
+        else:
+            row = self._outside_row(symbol, names, rows, period)
+            if row is None:
+                return []
+
+        order = np.argsort(-row if most else row)
+        order = [i for i in order if not np.isnan(row[i])][:limit]
+        return [
+            Relation(
+                symbol=names[i],
+                correlation=round(float(row[i]), 3),
+                beta=None if np.isnan(beta[i]) else round(float(beta[i]), 2),
+            )
+            for i in order
+        ]
+
+
+# Create a global instance
+correlation_table = CorrelationTable()
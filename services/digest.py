@@ -0,0 +1,155 @@
+import datetime as dt
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.market_hours import EXCHANGE_TZ, SETTLE, session
+
+CACHE_DIR = Path("cache")
+CACHE_DIR.mkdir(exist_ok=True)
+SUBSCRIPTIONS_FILE = CACHE_DIR / "digest_subscriptions.json"
+DELIVERY_FILE = CACHE_DIR / "digest_delivery.json"
+
+# schedule -> description; "daily" goes out once the closing prints settle
+SCHEDULES = {"daily": "after the close", "premarket": "before the open"}
+PREMARKET_LEAD = dt.timedelta(hours=1)
+# An interrupted edition is resumed after a restart unless it is older than this
+RESUME_WINDOW = 6 * 3600
+
+
+def _exchange_time(ts: Optional[float]) -> dt.datetime:
+    return dt.datetime.fromtimestamp(time.time() if ts is None else ts, EXCHANGE_TZ)
+
+
+def next_run(schedule: str, now: Optional[float] = None) -> float:
+    """Epoch time of the schedule's next tick on a trading day"""
+    t = _exchange_time(now)
+    day = t.date()
+    for _ in range(14):
+        hours = session(day)
+        if hours is not None:
+            at = hours[1] + SETTLE if schedule == "daily" else hours[0] - PREMARKET_LEAD
+            if at > t:
+                return at.timestamp()
+        day += dt.timedelta(days=1)
+    raise ValueError(f"No session found after {t}")
+
+
+def edition_key(schedule: str, run_at: float) -> str:
+    return f"{_exchange_time(run_at).date().isoformat()}:{schedule}"
+
+
+def _write_json(path: Path, payload):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        print(f"Could not read {path}: {e}")
+        return default
+
+
+class Subscriptions:
+    """Digest schedule each chat subscribed to, persisted as JSON"""
+
+    def __init__(self, path: Optional[Path] = SUBSCRIPTIONS_FILE):
+        self.path = path
+        self._chats: Dict[int, str] = {}
+        if path is not None:
+            self._chats = {int(k): v for k, v in _read_json(path, {}).items()}
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def get(self, chat_id: int) -> Optional[str]:
+        return self._chats.get(chat_id)
+
+    def subscribe(self, chat_id: int, schedule: str):
+        if schedule not in SCHEDULES:
+            raise ValueError(f"unknown schedule {schedule}")
+        self._chats[chat_id] = schedule
+        self.save()
+
+    def unsubscribe(self, chat_id: int) -> bool:
+        if self._chats.pop(chat_id, None) is None:
+            return False
+        self.save()
+        return True
+
+    def chats(self, schedule: str) -> List[int]:
+        return sorted(chat_id for chat_id, s in self._chats.items() if s == schedule)
+
+    def save(self):
+        if self.path is not None:
+            _write_json(self.path, {str(k): v for k, v in self._chats.items()})
+
+
+class Delivery:
+    """
+    Progress of one digest edition: its text, the Telegram file IDs of its
+    uploaded charts and the chats already served. Saved as it goes, so a
+    restart resumes the fan-out without rebuilding or re-uploading anything.
+    """
+
+    def __init__(self, edition: str, text: str, path: Optional[Path] = DELIVERY_FILE):
+        self.edition = edition
+        self.text = text
+        self.path = path
+        self.file_ids: List[str] = []
+        self.sent: set = set()
+        self.failed: Dict[int, str] = {}
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    @classmethod
+    def load(cls, path: Path = DELIVERY_FILE) -> Optional["Delivery"]:
+        payload = _read_json(path, None)
+        if not payload:
+            return None
+        delivery = cls(payload["edition"], payload["text"], path)
+        delivery.file_ids = payload["file_ids"]
+        delivery.sent = set(payload["sent"])
+        delivery.failed = {int(k): v for k, v in payload["failed"].items()}
+        delivery.created = payload["created"]
+        delivery.finished = payload["finished"]
+        return delivery
+
+    @property
+    def schedule(self) -> str:
+        return self.edition.split(":")[1]
+
+    @property
+    def resumable(self) -> bool:
+        return self.finished is None and time.time() - self.created < RESUME_WINDOW
+
+    def done(self, chat_id: int) -> bool:
+        return chat_id in self.sent or chat_id in self.failed
+
+    def save(self):
+        if self.path is not None:
+            _write_json(
+                self.path,
+                {
+                    "edition": self.edition,
+                    "text": self.text,
+                    "file_ids": self.file_ids,
+                    "sent": sorted(self.sent),
+                    "failed": {str(k): v for k, v in self.failed.items()},
+                    "created": self.created,
+                    "finished": self.finished,
+                },
+            )
+
+
+# Create a global instance
+subscriptions = Subscriptions()
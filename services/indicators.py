@@ -0,0 +1,341 @@
+import functools
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services import kernels
+
+# Same parameters as the chart indicators
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+ATR_PERIOD = 14
+BB_PERIOD, BB_WIDTH = 20, 2
+STOCH_PERIOD, STOCH_SMOOTH = 14, 3
+# Below this many rows pandas' per-column ewm beats stepping every row through time in NumPy
+EMA_PANDAS_MAX_ROWS = 256
+
+# Vectorized kernels over (symbols x time) float arrays, time along axis 1.
+# Rows may start with NaN (symbol listed later); gaps are forward-filled first.
+# The recursive and windowed ones hand off to compiled kernels when Numba is
+# installed (services/kernels.py).
+
+
+def ffill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaN along time; leading NaN stays"""
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = np.take_along_axis(values, idx, axis=1)
+    filled[~np.maximum.accumulate(valid, axis=1)] = np.nan
+    return filled
+
+
+def diff(values: np.ndarray) -> np.ndarray:
+    out = np.full_like(values, np.nan)
+    out[:, 1:] = values[:, 1:] - values[:, :-1]
+    return out
+
+
+def shift(values: np.ndarray, n: int = 1) -> np.ndarray:
+    out = np.full_like(values, np.nan)
+    out[:, n:] = values[:, :-n]
+    return out
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` bars via cumulative sums; NaN until the window is full"""
+    if kernels.enabled:
+        return kernels.rolling_mean(kernels.as_rows(values), window)
+
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] < window:
+        return out
+
+    window_sum = sums[:, window - 1 :].copy()
+    window_sum[:, 1:] -= sums[:, :-window]
+    window_count = counts[:, window - 1 :].copy()
+    window_count[:, 1:] -= counts[:, :-window]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[:, window - 1 :] = np.where(window_count == window, window_sum / window, np.nan)
+    return out
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing population standard deviation over `window` bars"""
+    mean = rolling_mean(values, window)
+    with np.errstate(invalid="ignore"):
+        variance = rolling_mean(values * values, window) - mean * mean
+    return np.sqrt(np.clip(variance, 0, None))
+
+
+def _rolling_extreme(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)
+        out[:, window - 1 :] = reduce(windows, axis=-1)
+    return out
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    if kernels.enabled:
+        return kernels.rolling_max(kernels.as_rows(values), window)
+    return _rolling_extreme(values, window, np.max)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    if kernels.enabled:
+        return kernels.rolling_min(kernels.as_rows(values), window)
+    return _rolling_extreme(values, window, np.min)
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponential mean like pandas ewm(span, adjust=False), seeded at each row's first value"""
+    alpha = 2.0 / (span + 1)
+    if kernels.enabled:
+        return kernels.ema(kernels.as_rows(values), alpha)
+    if values.shape[0] < EMA_PANDAS_MAX_ROWS:
+        # ignore_na: a gap carries the last value and does not decay the weights
+        frame = pd.DataFrame(values.T).ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+        return frame.to_numpy().T.copy()
+
+    out = np.empty(values.shape)
+    prev = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        prev = np.where(np.isnan(prev), x, np.where(np.isnan(x), prev, prev + alpha * (x - prev)))
+        out[:, t] = prev
+    return out
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    key = f"rsi:{period}"
+    return compute([key], {"close": close})[key]
+
+
+def macd(
+    close: np.ndarray, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL
+):
+    """(MACD line, signal line, histogram)"""
+    keys = [f"macd:{fast}:{slow}", f"macd_signal:{fast}:{slow}:{signal}"]
+    keys.append(f"macd_hist:{fast}:{slow}:{signal}")
+    results = compute(keys, {"close": close})
+    return tuple(results[key] for key in keys)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    if kernels.enabled:
+        return kernels.true_range(*(kernels.as_rows(v) for v in (high, low, close)))
+
+    prev_close = shift(close)
+    ranges = np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    return np.fmax(high - low, ranges)
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ATR_PERIOD):
+    key = f"atr:{period}"
+    return compute([key], {"high": high, "low": low, "close": close})[key]
+
+
+def bars_since_cross(fast: np.ndarray, slow: np.ndarray, upward: bool = True) -> np.ndarray:
+    """Bars since `fast` last crossed `slow` (0 = on the last bar), NaN if it never did"""
+    above = fast > slow if upward else fast < slow
+    crossed = np.zeros(fast.shape, dtype=bool)
+    crossed[:, 1:] = above[:, 1:] & ~above[:, :-1] & ~np.isnan(slow[:, :-1])
+
+    last = np.where(crossed, np.arange(fast.shape[1]), -1).max(axis=1)
+    return np.where(last >= 0, fast.shape[1] - 1 - last, np.nan)
+
+
+# --- Registry ---
+# Indicators are nodes keyed "name:param:param" ("rsi:14", "ema:12"); params may be
+# omitted to take the defaults. Each declares the keys it is computed from, so a
+# requested set is planned as a DAG and shared inputs (the close diff, true range,
+# EMAs of one span) are computed once per call.
+
+SOURCES = ("open", "high", "low", "close", "volume")
+
+
+class Indicator(NamedTuple):
+    name: str
+    inputs: Callable[..., Tuple[str, ...]]  # params -> keys of the arrays it needs
+    compute: Callable[..., np.ndarray]  # (*input arrays, *params) -> array
+    defaults: Tuple = ()
+
+
+INDICATORS: Dict[str, Indicator] = {}
+
+
+def register_indicator(indicator: Indicator) -> Indicator:
+    INDICATORS[indicator.name] = indicator
+    resolve.cache_clear()
+    return indicator
+
+
+@functools.lru_cache(maxsize=None)
+def resolve(key: str) -> Tuple[str, Indicator, Tuple]:
+    """(canonical key, indicator, params) for "name[:param...]" keys"""
+    name, *args = key.lower().split(":")
+    indicator = INDICATORS.get(name)
+    if indicator is None:
+        raise KeyError(f"unknown indicator {key}")
+    if len(args) > len(indicator.defaults):
+        raise KeyError(f"too many parameters in {key}")
+
+    params = (
+        tuple(type(default)(arg) for arg, default in zip(args, indicator.defaults))
+        + indicator.defaults[len(args) :]
+    )
+    canonical = ":".join([name] + [f"{p:g}" if isinstance(p, float) else str(p) for p in params])
+    return canonical, indicator, params
+
+
+def canonical(key: str) -> str:
+    return key if key in SOURCES else resolve(key)[0]
+
+
+def plan(keys: Iterable[str]) -> List[str]:
+    """Canonical keys of every node the requested set needs, inputs first, each once"""
+    order: List[str] = []
+    done = set(SOURCES)
+
+    def visit(key: str, path: Tuple[str, ...]):
+        key = canonical(key)
+        if key in done:
+            return
+        if key in path:
+            raise ValueError(f"indicator cycle: {' -> '.join(path + (key,))}")
+        _key, indicator, params = resolve(key)
+        for dependency in indicator.inputs(*params):
+            visit(dependency, path + (key,))
+        done.add(key)
+        order.append(key)
+
+    for key in keys:
+        visit(key, ())
+    return order
+
+
+def compute(keys: Iterable[str], sources: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Evaluate a set of indicators over (symbols x time) source arrays keyed by
+    SOURCES. Returns the requested keys as given.
+    """
+    keys = list(keys)
+    values = dict(sources)
+    for key in plan(keys):
+        _key, indicator, params = resolve(key)
+        inputs = [values[canonical(d)] for d in indicator.inputs(*params)]
+        values[key] = indicator.compute(*inputs, *params)
+    return {key: values[canonical(key)] for key in keys}
+
+
+def frame_indicators(data: pd.DataFrame, columns: Dict[str, str]) -> pd.DataFrame:
+    """Add indicator columns ({column: key}) to one symbol's OHLCV frame"""
+    sources = {
+        field.lower(): data[field].to_numpy(dtype=np.float64)[None, :]
+        for field in ("Open", "High", "Low", "Close", "Volume")
+        if field in data
+    }
+    results = compute(columns.values(), sources)
+    for column, key in columns.items():
+        data[column] = results[key][0]
+    return data
+
+
+def _gain(delta, period):
+    return rolling_mean(np.where(delta > 0, delta, 0.0), period)
+
+
+def _loss(delta, period):
+    return rolling_mean(np.where(delta < 0, -delta, 0.0), period)
+
+
+def _rsi(gain, loss, period):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 - 100 / (1 + gain / loss)
+
+
+def _bollinger(sign):
+    def band(mean, std, period, width):
+        return mean + sign * width * std
+
+    return band
+
+
+def _stochastic(high, low, close, period):
+    low = rolling_min(low, period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 * (close - low) / (rolling_max(high, period) - low)
+
+
+def _vwap(typical, volume):
+    volume = np.nan_to_num(volume)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.cumsum(np.nan_to_num(typical) * volume, axis=1) / np.cumsum(volume, axis=1)
+
+
+def _series(*keys):
+    return lambda *params: keys
+
+
+for _indicator in (
+    Indicator("delta", _series("close"), diff),
+    Indicator("gain", lambda n: ("delta",), _gain, (RSI_PERIOD,)),
+    Indicator("loss", lambda n: ("delta",), _loss, (RSI_PERIOD,)),
+    Indicator("rsi", lambda n: (f"gain:{n}", f"loss:{n}"), _rsi, (RSI_PERIOD,)),
+    Indicator("sma", _series("close"), rolling_mean, (BB_PERIOD,)),
+    Indicator("std", _series("close"), rolling_std, (BB_PERIOD,)),
+    Indicator("ema", _series("close"), ema, (MACD_FAST,)),
+    Indicator(
+        "macd",
+        lambda fast, slow: (f"ema:{fast}", f"ema:{slow}"),
+        lambda fast_ema, slow_ema, fast, slow: fast_ema - slow_ema,
+        (MACD_FAST, MACD_SLOW),
+    ),
+    Indicator(
+        "macd_signal",
+        lambda fast, slow, signal: (f"macd:{fast}:{slow}",),
+        lambda line, fast, slow, signal: ema(line, signal),
+        (MACD_FAST, MACD_SLOW, MACD_SIGNAL),
+    ),
+    Indicator(
+        "macd_hist",
+        lambda fast, slow, signal: (f"macd:{fast}:{slow}", f"macd_signal:{fast}:{slow}:{signal}"),
+        lambda line, signal_line, *params: line - signal_line,
+        (MACD_FAST, MACD_SLOW, MACD_SIGNAL),
+    ),
+    Indicator("tr", _series("high", "low", "close"), true_range),
+    Indicator("atr", lambda n: ("tr",), rolling_mean, (ATR_PERIOD,)),
+    Indicator(
+        "bb_upper",
+        lambda n, width: (f"sma:{n}", f"std:{n}"),
+        _bollinger(1),
+        (BB_PERIOD, float(BB_WIDTH)),
+    ),
+    Indicator(
+        "bb_lower",
+        lambda n, width: (f"sma:{n}", f"std:{n}"),
+        _bollinger(-1),
+        (BB_PERIOD, float(BB_WIDTH)),
+    ),
+    Indicator("stoch_k", _series("high", "low", "close"), _stochastic, (STOCH_PERIOD,)),
+    Indicator(
+        "stoch_d",
+        lambda n, smooth: (f"stoch_k:{n}",),
+        lambda k, n, smooth: rolling_mean(k, smooth),
+        (STOCH_PERIOD, STOCH_SMOOTH),
+    ),
+    Indicator(
+        "typical",
+        _series("high", "low", "close"),
+        lambda high, low, close: (high + low + close) / 3,
+    ),
+    Indicator("vwap", _series("typical", "volume"), _vwap),
+):
+    register_indicator(_indicator)
@@ -0,0 +1,110 @@
+"""
+Compiled versions of the indicator hot loops (services/indicators.py).
+
+Kernels take contiguous float64 (symbols x time) arrays, time along axis 1,
+and match the NumPy kernels' NaN handling. Rows run in parallel. They are only
+built when Numba is installed; otherwise the NumPy kernels are used.
+"""
+
+import os
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+AVAILABLE = numba is not None
+# INDICATOR_KERNELS=numpy keeps the NumPy kernels even where Numba is installed
+enabled = AVAILABLE and os.getenv("INDICATOR_KERNELS", "auto") != "numpy"
+
+
+def as_rows(values: np.ndarray) -> np.ndarray:
+    """The layout the kernels expect: C-contiguous float64, one row per symbol"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+if AVAILABLE:
+    _jit = numba.njit(cache=True, parallel=True, nogil=True)
+
+    @_jit
+    def ema(values, alpha):
+        out = np.empty_like(values)
+        for row in numba.prange(values.shape[0]):
+            prev = np.nan
+            for t in range(values.shape[1]):
+                x = values[row, t]
+                if np.isnan(prev):
+                    prev = x
+                elif not np.isnan(x):
+                    prev += alpha * (x - prev)
+                out[row, t] = prev
+        return out
+
+    @_jit
+    def rolling_mean(values, window):
+        out = np.full(values.shape, np.nan)
+        for row in numba.prange(values.shape[0]):
+            total, valid = 0.0, 0
+            for t in range(values.shape[1]):
+                x = values[row, t]
+                if not np.isnan(x):
+                    total += x
+                    valid += 1
+                if t >= window:
+                    old = values[row, t - window]
+                    if not np.isnan(old):
+                        total -= old
+                        valid -= 1
+                if valid == window:
+                    out[row, t] = total / window
+        return out
+
+    @_jit
+    def _rolling_extreme(values, window, sign):
+        # Monotonic deque of candidate positions; sign=1 keeps maxima, -1 minima
+        out = np.full(values.shape, np.nan)
+        for row in numba.prange(values.shape[0]):
+            queue = np.empty(values.shape[1], dtype=np.int64)
+            head, tail = 0, 0
+            last_nan = -1
+            for t in range(values.shape[1]):
+                x = values[row, t]
+                if np.isnan(x):
+                    last_nan = t
+                else:
+                    while tail > head and sign * values[row, queue[tail - 1]] <= sign * x:
+                        tail -= 1
+                    queue[tail] = t
+                    tail += 1
+                while tail > head and queue[head] <= t - window:
+                    head += 1
+                # Like the NumPy kernel, a NaN anywhere in the window gives NaN
+                if t >= window - 1 and last_nan <= t - window and tail > head:
+                    out[row, t] = values[row, queue[head]]
+        return out
+
+    def rolling_max(values, window):
+        return _rolling_extreme(values, window, 1.0)
+
+    def rolling_min(values, window):
+        return _rolling_extreme(values, window, -1.0)
+
+    @_jit
+    def true_range(high, low, close):
+        out = np.empty_like(close)
+        for row in numba.prange(close.shape[0]):
+            prev_close = np.nan
+            for t in range(close.shape[1]):
+                h, lo = high[row, t], low[row, t]
+                # fmax semantics: a NaN side is ignored
+                spread = h - lo
+                if not np.isnan(prev_close):
+                    up, down = abs(h - prev_close), abs(lo - prev_close)
+                    gap = down if np.isnan(up) or down > up else up
+                    if np.isnan(spread) or gap > spread:
+                        spread = gap
+                out[row, t] = spread
+                prev_close = close[row, t]
+        return out
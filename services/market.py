@@ -1,16 +1,23 @@
 import concurrent.futures
+import heapq
+import os
 import threading
 import time
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, TypedDict, TypeVar
 
-import yfinance as yf
+import pandas as pd
 
-from services.universe import load_sp500
+from services.profiler import profiled
+from services.returns import MENU_WINDOWS, close_panel, returns_table, window_returns
+from services.store import fetch_history, get_store
+from services.universe import DEFAULT_UNIVERSE, UNIVERSES
 
-UNIVERSE = load_sp500()[:50]
+# Set UNIVERSE_SIZE=503 to track the whole index (applies to every named universe)
+UNIVERSE_SIZE = int(os.getenv("UNIVERSE_SIZE", "50"))
 
 MAX_WORKERS = 8
-CACHE_TTL = 300  # seconds
+MEMBERS_RETRY = 300  # seconds before a universe whose constituents failed to load is retried
+HISTORY_PERIOD = "5y"  # long enough for every registered return window
 
 
 class PerformanceResult(TypedDict):
@@ -18,63 +25,80 @@ class PerformanceResult(TypedDict):
     change: Optional[float]
 
 
-_history_cache: Dict[str, Any] = {}
-_history_cache_time: Dict[str, float] = {}
+class RankingUpdate(NamedTuple):
+    """A provisional (or, once final, the cached) top/bottom N while histories arrive"""
 
+    results: List[PerformanceResult]
+    done: int  # symbols fetched so far
+    total: int
+    final: bool
+
+
+# Daily bars are shared with the 3mo/1y charts
+_daily = get_store("1d")
+
+# Derived results expire together with the earliest-expiring history they were built from
 _result_cache: Dict[str, List[PerformanceResult]] = {}
-_result_cache_time: Dict[str, float] = {}
+_result_cache_expires: Dict[str, float] = {}
+
+_panel_cache: Dict[str, pd.DataFrame] = {}
+_panel_cache_expires: Dict[str, float] = {}
+# ...and are rebuilt when downloads or live quotes rewrite one of their symbols in between
+_cache_versions: Dict[str, int] = {}
+
+# Constituents per loaded universe; one shared panel covers their union
+_members: Dict[str, List[str]] = {}
+_members_lock = threading.Lock()
+_members_retry: Dict[str, float] = {}  # universe -> earliest next load attempt
+_shared_size = 0  # union size the shared panel was built for
+_returns_cache: Dict[str, pd.Series] = {}
 
-_cache_lock = threading.Lock()
+
+T = TypeVar("T")
+
+
+def _cached(
+    cache: Dict[str, T], expires: Dict[str, float], key: str, now: float, version: int
+) -> Optional[T]:
+    if key in cache and now < expires[key] and _cache_versions.get(key) == version:
+        return cache[key]
+    return None
 
 
 def _fetch_history(symbol: str) -> Any:
     """
-    Fetch 1Y historical data for a symbol.
+    Fetch daily historical data for a symbol (HISTORY_PERIOD back).
     One network request per symbol.
     """
-    ticker = yf.Ticker(symbol)
-    return ticker.history(period="1y", auto_adjust=True)
+    return fetch_history(symbol, HISTORY_PERIOD, "1d")
 
 
 def _get_history_cached(symbol: str) -> Any:
-    now = time.time()
-
-    with _cache_lock:
-        if symbol in _history_cache:
-            if now - _history_cache_time[symbol] < CACHE_TTL:
-                return _history_cache[symbol]
+    if not _daily.is_fresh(symbol):
+        _daily.refresh(symbol, lambda: _fetch_history(symbol))
 
-    hist = _fetch_history(symbol)
+    return _daily.frame(symbol)
 
-    with _cache_lock:
-        _history_cache[symbol] = hist
-        _history_cache_time[symbol] = now
 
-    return hist
+def get_daily_history(symbol: str) -> Any:
+    """Shared daily bars for a symbol, refreshed when stale"""
+    return _get_history_cached(symbol)
 
 
-def _pct_change(first: float, last: float) -> Optional[float]:
-    if first <= 0:
-        return None
-    return round(((last - first) / first) * 100, 2)
-
-
-def compute_performance(hist) -> Dict[str, Optional[float]]:
+def compute_performance(hist, periods: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
     if hist.empty or len(hist) < 2:
         return {}
 
-    close = hist["Close"]
-
+    table = returns_table(close_panel({"symbol": hist}), periods)
     return {
-        "24h": _pct_change(close.iloc[-2], close.iloc[-1]),
-        "7d": _pct_change(close.iloc[-5], close.iloc[-1]) if len(close) >= 5 else None,
-        "30d": _pct_change(close.iloc[-22], close.iloc[-1]) if len(close) >= 22 else None,
-        "3mo": _pct_change(close.iloc[-66], close.iloc[-1]) if len(close) >= 66 else None,
-        "1y": _pct_change(close.iloc[0], close.iloc[-1]),
+        period: (None if pd.isna(change) else float(change))
+        for period, change in table.iloc[0].items()
     }
 
 
-def _fetch_all_symbols(symbols: List[str]) -> List[Dict[str, Any]]:
+@profiled("_fetch_all_symbols")
+def _fetch_all_symbols(symbols: List[str]) -> List[str]:
+    """Refresh stale histories in parallel; returns the symbols that have data"""
     results = []
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
@@ -84,10 +108,9 @@ def _fetch_all_symbols(symbols: List[str]) -> List[Dict[str, Any]]:
             symbol = futures[future]
             try:
                 hist = future.result()
-                perf = compute_performance(hist)
 
-                if perf:
-                    results.append({"symbol": symbol, "performance": perf})
+                if hist is not None and len(hist) >= 2:
+                    results.append(symbol)
 
             except Exception as e:
                 print(f"{symbol} failed: {e}")
@@ -95,64 +118,277 @@ def _fetch_all_symbols(symbols: List[str]) -> List[Dict[str, Any]]:
     return results
 
 
-def best_performers(period: str, limit: int = 5) -> List[PerformanceResult]:
-    key = f"best:{period}:{limit}"
+def universe_members(universe: str = DEFAULT_UNIVERSE) -> List[str]:
+    """
+    Constituents of a named universe (first UNIVERSE_SIZE), loaded on first use.
+    A failed load (empty list) is not kept; it is retried after MEMBERS_RETRY.
+    """
+    with _members_lock:
+        if universe in _members:
+            return _members[universe]
+        if time.time() < _members_retry.get(universe, 0.0):
+            return []
+
+        members = UNIVERSES[universe].load()[:UNIVERSE_SIZE]
+        if not members:
+            _members_retry[universe] = time.time() + MEMBERS_RETRY
+            return []
+        _members[universe] = members
+        _members_retry.pop(universe, None)
+        return members
+
+
+def _shared_symbols() -> List[str]:
+    """Union of every loaded universe's members"""
+    with _members_lock:
+        return list(dict.fromkeys(s for members in _members.values() for s in members))
+
+
+def _shared_version() -> int:
+    """
+    Version of the shared symbols' bars. Fetches and quotes for symbols outside
+    every universe (a /stock lookup, a compare) leave it, and the caches, alone.
+    """
+    return _daily.members_version(_shared_symbols())
+
+
+def _shared_panel() -> pd.DataFrame:
+    """
+    Closes of every member of every loaded universe on one index (rows: bars,
+    columns: symbols). Overlapping constituents are stored and fetched once.
+    """
+    global _shared_size
+    key = "universe"
     now = time.time()
+    symbols = _shared_symbols()
+
+    cached = _cached(_panel_cache, _panel_cache_expires, key, now, _daily.members_version(symbols))
+    if cached is not None and _shared_size == len(symbols):
+        return cached
+
+    symbols_with_data = _fetch_all_symbols(symbols)
+    version = _daily.members_version(symbols)
+    panel = _daily.panel(symbols_with_data)
+
+    _panel_cache[key] = panel
+    _panel_cache_expires[key] = min((_daily.expires_at(s) for s in symbols_with_data), default=now)
+    _cache_versions[key] = version
+    _shared_size = len(symbols)
+
+    return panel
+
+
+def _universe_panel(universe: str = DEFAULT_UNIVERSE) -> pd.DataFrame:
+    """One universe's closes, a column gather from the shared panel"""
+    members = universe_members(universe)
+    panel = _shared_panel()
+    columns = set(panel.columns)
+    return panel[[s for s in members if s in columns]]
+
+
+def universe_symbols(universe: str = DEFAULT_UNIVERSE) -> List[str]:
+    """Universe symbols that have data, refreshing stale histories first"""
+    members = universe_members(universe)
+    columns = set(_shared_panel().columns)
+    return [s for s in members if s in columns]
+
+
+def universe_expires_at() -> float:
+    """When the cached universe panel (and everything ranked from it) goes stale"""
+    return _panel_cache_expires.get("universe", 0.0)
+
+
+def _shared_returns(period: str) -> pd.Series:
+    """Window returns of every shared symbol, computed once per data version"""
+    panel = _shared_panel()
+    key = f"returns:{period}"
+    version = _cache_versions["universe"]
 
-    if key in _result_cache and now - _result_cache_time[key] < CACHE_TTL:
-        return _result_cache[key]
+    if key in _returns_cache and _cache_versions.get(key) == version:
+        cached = _returns_cache[key]
+        if len(cached) == len(panel.columns):
+            return cached
 
-    data = _fetch_all_symbols(UNIVERSE)
+    _returns_cache[key] = window_returns(panel, period)
+    _cache_versions[key] = version
+    return _returns_cache[key]
 
-    filtered: List[PerformanceResult] = [
-        PerformanceResult(symbol=d["symbol"], change=d["performance"].get(period))
-        for d in data
-        if d["performance"].get(period) is not None
+
+def performance_table(symbols: Optional[List[str]] = None) -> pd.DataFrame:
+    """Per-symbol returns for every menu period (one row per symbol, one column per period)"""
+    panel = _universe_panel() if symbols is None else _daily.panel(_fetch_all_symbols(symbols))
+    return returns_table(panel).dropna(how="all")
+
+
+def latest_quotes(symbols: List[str]) -> pd.DataFrame:
+    """
+    Last price and today's change (%) per symbol.
+    Each stale history is fetched once however often the symbol is listed.
+    """
+    panel = _daily.panel(_fetch_all_symbols(sorted(set(symbols))))
+    if panel.empty:
+        return pd.DataFrame(columns=["price", "change"])
+    return pd.DataFrame({"price": panel.iloc[-1], "change": window_returns(panel, "24h")})
+
+
+def _rank(
+    period: str, limit: int, best: bool, universe: str, symbols: Optional[List[str]] = None
+) -> List[PerformanceResult]:
+    """
+    Take the top or bottom N of one window. Named universes gather their members
+    from the shared returns; custom symbol lists get a panel of their own.
+    """
+    if symbols is None:
+        members = universe_members(universe)
+        changes = _shared_returns(period).reindex(members).dropna()
+    else:
+        changes = window_returns(_daily.panel(_fetch_all_symbols(symbols)), period).dropna()
+    ranked = changes.nlargest(limit) if best else changes.nsmallest(limit)
+
+    return [
+        PerformanceResult(symbol=symbol, change=float(change)) for symbol, change in ranked.items()
     ]
 
-    # FIX: Use a key that always returns a float
-    result = sorted(
-        filtered,
-        key=lambda x: x["change"] if x["change"] is not None else float("-inf"),
-        reverse=True,
-    )[:limit]
+
+def best_performers(
+    period: str,
+    limit: int = 5,
+    universe: str = DEFAULT_UNIVERSE,
+    symbols: Optional[List[str]] = None,
+) -> List[PerformanceResult]:
+    """Top gainers of a named universe, or of a custom symbol list if given"""
+    if symbols is not None:
+        return _rank(period, limit, True, universe, symbols)
+
+    key = f"best:{universe}:{period}:{limit}"
+    now = time.time()
+
+    cached = _cached(_result_cache, _result_cache_expires, key, now, _shared_version())
+    if cached is not None:
+        return cached
+
+    result = _rank(period, limit, True, universe)
 
     _result_cache[key] = result
-    _result_cache_time[key] = now
+    _result_cache_expires[key] = _panel_cache_expires["universe"]
+    _cache_versions[key] = _cache_versions["universe"]
 
     return result
 
 
-def worst_performers(period: str, limit: int = 5) -> List[PerformanceResult]:
-    key = f"worst:{period}:{limit}"
-    now = time.time()
+def worst_performers(
+    period: str,
+    limit: int = 5,
+    universe: str = DEFAULT_UNIVERSE,
+    symbols: Optional[List[str]] = None,
+) -> List[PerformanceResult]:
+    """Top losers of a named universe, or of a custom symbol list if given"""
+    if symbols is not None:
+        return _rank(period, limit, False, universe, symbols)
 
-    if key in _result_cache and now - _result_cache_time[key] < CACHE_TTL:
-        return _result_cache[key]
-
-    data = _fetch_all_symbols(UNIVERSE)
+    key = f"worst:{universe}:{period}:{limit}"
+    now = time.time()
 
-    filtered: List[PerformanceResult] = [
-        PerformanceResult(symbol=d["symbol"], change=d["performance"].get(period))
-        for d in data
-        if d["performance"].get(period) is not None
-    ]
+    cached = _cached(_result_cache, _result_cache_expires, key, now, _shared_version())
+    if cached is not None:
+        return cached
 
-    # FIX: Use a key that always returns a float
-    result = sorted(
-        filtered, key=lambda x: x["change"] if x["change"] is not None else float("inf")
-    )[:limit]
+    result = _rank(period, limit, False, universe)
 
     _result_cache[key] = result
-    _result_cache_time[key] = now
+    _result_cache_expires[key] = _panel_cache_expires["universe"]
+    _cache_versions[key] = _cache_versions["universe"]
 
     return result
 
 
-def get_stock_performance(symbol: str) -> Optional[Dict[str, Any]]:
+class _TopN:
+    """Bounded heap of the N largest (or smallest) changes seen so far"""
+
+    def __init__(self, limit: int, best: bool):
+        self.limit = limit
+        self.sign = 1 if best else -1
+        self._heap: List[tuple] = []  # (signed change, symbol), weakest on top
+
+    def push(self, symbol: str, change: float):
+        item = (self.sign * change, symbol)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def results(self) -> List[PerformanceResult]:
+        return [
+            PerformanceResult(symbol=symbol, change=self.sign * key)
+            for key, symbol in sorted(self._heap, reverse=True)
+        ]
+
+
+def stream_performers(
+    period: str,
+    limit: int = 5,
+    best: bool = True,
+    universe: str = DEFAULT_UNIVERSE,
+    symbols: Optional[List[str]] = None,
+) -> Iterator[RankingUpdate]:
+    """
+    Rank while stale histories are still being fetched: yields a provisional
+    top/bottom N after every symbol that arrives, then the final ranking (the
+    same result best_performers/worst_performers return). Fresh data yields
+    only the final update.
+    """
+    members = universe_members(universe) if symbols is None else list(dict.fromkeys(symbols))
+    stale = [s for s in members if not _daily.is_fresh(s)]
+    total = len(members)
+
+    def final() -> RankingUpdate:
+        rank = best_performers if best else worst_performers
+        if symbols is None:
+            results = rank(period, limit, universe)
+        else:
+            results = rank(period, limit, symbols=symbols)
+        return RankingUpdate(results, total, total, True)
+
+    if not stale:
+        yield final()
+        return
+
+    top = _TopN(limit, best)
+
+    def add(symbol: str):
+        change = window_returns(_daily.panel([symbol]), period).get(symbol)
+        if change is not None and not pd.isna(change):
+            top.push(symbol, float(change))
+
+    stale_set = set(stale)
+    for symbol in members:
+        if symbol not in stale_set:
+            add(symbol)
+    done = total - len(stale)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(_get_history_cached, symbol): symbol for symbol in stale}
+
+        for future in concurrent.futures.as_completed(futures):
+            symbol = futures[future]
+            done += 1
+            try:
+                future.result()
+                add(symbol)
+            except Exception as e:
+                print(f"{symbol} failed: {e}")
+            yield RankingUpdate(top.results(), done, total, False)
+
+    # Everything is fresh now: the final ranking is computed from the shared panel
+    yield final()
+
+
+def get_stock_performance(
+    symbol: str, extra_periods: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
     try:
         hist = _get_history_cached(symbol)
-        if hist.empty:
+        if hist is None or hist.empty:
             return None
 
         close = hist["Close"].iloc[-1]
@@ -160,7 +396,7 @@ def get_stock_performance(symbol: str) -> Optional[Dict[str, Any]]:
         return {
             "symbol": symbol.upper(),
             "current_price": round(float(close), 2),
-            "performances": compute_performance(hist),
+            "performances": compute_performance(hist, MENU_WINDOWS + (extra_periods or [])),
         }
 
     except Exception as e:
@@ -172,7 +408,10 @@ def start_cache_warming():
     def warm():
         popular = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]
         for s in popular:
-            _get_history_cached(s)
+            try:
+                _get_history_cached(s)
+            except Exception as e:
+                print(f"Warming {s} failed: {e}")
 
     t = threading.Thread(target=warm, daemon=True)
     t.start()
@@ -0,0 +1,163 @@
+import datetime as dt
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+OPEN_TIME = dt.time(9, 30)
+CLOSE_TIME = dt.time(16, 0)
+EARLY_CLOSE_TIME = dt.time(13, 0)
+
+# Closing prints and the last bar keep settling for a while after the bell
+SETTLE = dt.timedelta(minutes=15)
+# Upstream publishes a bar a little after it closes
+PUBLISH_DELAY = dt.timedelta(seconds=30)
+# Longest a live session's data is trusted, the current bar keeps moving
+LIVE_REFRESH = 300
+
+BAR_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600}
+
+# Unscheduled closures (national days of mourning and the like)
+EXTRA_CLOSURES = {dt.date(2025, 1, 9)}
+
+Session = Tuple[dt.datetime, dt.datetime]
+
+
+def _observed(day: dt.date) -> dt.date:
+    """Saturday holidays are observed on Friday, Sunday ones on Monday"""
+    if day.weekday() == 5:
+        return day - dt.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + dt.timedelta(days=1)
+    return day
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> dt.date:
+    """n-th given weekday of a month, n=-1 for the last one"""
+    if n > 0:
+        first = dt.date(year, month, 1)
+        return first + dt.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = dt.date(year + month // 12, month % 12 + 1, 1) - dt.timedelta(days=1)
+    return last - dt.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> dt.date:
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    m = (32 + 2 * e + 2 * i - h - k) % 7
+    n = (a + 11 * h + 22 * m) // 451
+    month, day = divmod(h + m - 7 * n + 114, 31)
+    return dt.date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def holidays(year: int) -> FrozenSet[dt.date]:
+    """NYSE full-day holidays for a year"""
+    days = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - dt.timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(dt.date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(dt.date(year, 12, 25)),
+    }
+    # A Saturday New Year's Day is not moved back into the previous year
+    new_year = dt.date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(dt.date(year, 6, 19)))  # Juneteenth
+    days.update(d for d in EXTRA_CLOSURES if d.year == year)
+    return frozenset(days)
+
+
+@lru_cache(maxsize=None)
+def early_closes(year: int) -> FrozenSet[dt.date]:
+    """Sessions that end at 13:00"""
+    candidates = {
+        dt.date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + dt.timedelta(days=1),  # day after Thanksgiving
+        dt.date(year, 12, 24),
+    }
+    return frozenset(d for d in candidates if d.weekday() < 5 and d not in holidays(year))
+
+
+def is_trading_day(day: dt.date) -> bool:
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+
+def session(day: dt.date) -> Optional[Session]:
+    """(open, close) of a day in exchange time, None if the market is closed"""
+    if not is_trading_day(day):
+        return None
+    close = EARLY_CLOSE_TIME if day in early_closes(day.year) else CLOSE_TIME
+    return (
+        dt.datetime.combine(day, OPEN_TIME, EXCHANGE_TZ),
+        dt.datetime.combine(day, close, EXCHANGE_TZ),
+    )
+
+
+def _exchange_time(ts: Optional[float]) -> dt.datetime:
+    if ts is None:
+        return dt.datetime.now(EXCHANGE_TZ)
+    return dt.datetime.fromtimestamp(ts, EXCHANGE_TZ)
+
+
+def is_open(now: Optional[float] = None) -> bool:
+    t = _exchange_time(now)
+    hours = session(t.date())
+    return hours is not None and hours[0] <= t < hours[1]
+
+
+def next_open(now: Optional[float] = None) -> dt.datetime:
+    """Start of the first session opening after now"""
+    t = _exchange_time(now)
+    day = t.date()
+    # Longest closure on record is well under two weeks
+    for _ in range(14):
+        hours = session(day)
+        if hours is not None and hours[0] > t:
+            return hours[0]
+        day += dt.timedelta(days=1)
+    raise ValueError(f"No session found after {t}")
+
+
+def settles_at(now: Optional[float] = None) -> Optional[float]:
+    """Epoch time the live session's closing prints settle, None outside a session"""
+    t = _exchange_time(now)
+    hours = session(t.date())
+    if hours is None or not hours[0] <= t < hours[1]:
+        return None
+    return (hours[1] + SETTLE).timestamp()
+
+
+def next_refresh(fetched_at: float, interval: str = "1d") -> float:
+    """
+    Epoch time at which data fetched at fetched_at may have changed upstream.
+
+    While a session is live this is the next bar boundary (capped at
+    LIVE_REFRESH for coarse bars, whose last bar is still moving). Once the
+    closing prints have settled nothing changes until the next open.
+    """
+    t = _exchange_time(fetched_at)
+    hours = session(t.date())
+
+    if hours is not None:
+        open_, close = hours
+        if open_ <= t < close:
+            step = min(BAR_SECONDS.get(interval, LIVE_REFRESH), LIVE_REFRESH)
+            elapsed = (t - open_).total_seconds()
+            boundary = open_ + dt.timedelta(seconds=(elapsed // step + 1) * step)
+            return (min(boundary, close) + PUBLISH_DELAY).timestamp()
+        if close <= t < close + SETTLE:
+            return (close + SETTLE).timestamp()
+
+    return (next_open(fetched_at) + PUBLISH_DELAY).timestamp()
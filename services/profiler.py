@@ -0,0 +1,238 @@
+import asyncio
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+PROFILE_DIR = Path("cache") / "profiles"
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "10")) / 1000
+MAX_WINDOW = 600  # seconds; a forgotten session stops by itself
+MAX_DEPTH = 64
+
+# Leaf frames of threads that are just waiting (event loop select, idle pool workers, joins);
+# the work they wait on is sampled in the thread doing it
+IDLE_FRAMES = ("select (selectors.py", "wait (threading.py", "_worker (thread.py")
+
+
+class ProfileReport(NamedTuple):
+    path: Path  # folded stacks, feed to flamegraph.pl / speedscope
+    duration: float
+    samples: int
+    handlers: int
+    top: List[tuple]  # (function, self %, total %)
+    sections: Dict[str, tuple]  # name -> (calls, mean ms, max ms)
+
+
+def parse_budget(text: str):
+    """'30s' / '2m' -> (seconds, None), '200' -> (None, invocations)"""
+    match = re.fullmatch(r"(\d+)\s*([sm]?)", text.strip().lower())
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2)
+    if unit:
+        return min(value * (60 if unit == "m" else 1), MAX_WINDOW), None
+    return MAX_WINDOW, value
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Statistical profiler: a daemon thread samples every thread's stack at a fixed
+    interval while a session is active, so cost is per sample, not per call.
+    Decorated sections (handler branches, fetches, renders) add wall-time stats.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+        self._stacks: Counter = Counter()
+        self._sections: Dict[str, List[float]] = defaultdict(list)
+        self._started = 0.0
+        self._deadline = 0.0
+        self._remaining: Optional[int] = None
+        self._handlers = 0
+        self._samples = 0
+        self._report: Optional[ProfileReport] = None
+
+    @property
+    def active(self) -> bool:
+        return not self._done.is_set()
+
+    def start(self, seconds: float = MAX_WINDOW, invocations: Optional[int] = None) -> bool:
+        """Begin a session ending after `seconds` or `invocations` handler calls"""
+        with self._lock:
+            if self.active:
+                return False
+            self._stacks.clear()
+            self._sections.clear()
+            self._handlers = self._samples = 0
+            self._started = time.time()
+            self._deadline = self._started + min(seconds, MAX_WINDOW)
+            self._remaining = invocations
+            self._report = None
+            self._done.clear()
+
+        threading.Thread(target=self._run, daemon=True, name="profiler").start()
+        return True
+
+    def stop(self):
+        self._deadline = 0.0
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[ProfileReport]:
+        """Block until the session ends; returns its report (None if writing it failed)"""
+        self._done.wait(timeout)
+        return self._report
+
+    def _run(self):
+        own = threading.get_ident()
+        while time.time() < self._deadline and self._remaining != 0:
+            time.sleep(self.interval)
+            for ident, top in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack: List[str] = []
+                frame: Optional[FrameType] = top
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                if not stack[0].startswith(IDLE_FRAMES):
+                    self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+        try:
+            self._report = self._write_report()
+        except OSError as e:
+            print(f"Profile report failed: {e}")
+        finally:
+            self._done.set()
+
+    def _write_report(self) -> ProfileReport:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / time.strftime("profile-%Y%m%d-%H%M%S.folded")
+        with open(path, "w") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Self time = leaf frame, total time = anywhere on the stack (counted once per stack)
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        samples = sum(self._stacks.values()) or 1
+        top = [
+            (name, round(count / samples * 100, 1), round(total[name] / samples * 100, 1))
+            for name, count in own.most_common(15)
+        ]
+        with self._lock:
+            sections = {
+                name: (len(times), sum(times) / len(times) * 1000, max(times) * 1000)
+                for name, times in sorted(self._sections.items())
+            }
+        return ProfileReport(
+            path, time.time() - self._started, self._samples, self._handlers, top, sections
+        )
+
+    @contextmanager
+    def section(self, name: str, handler: bool = False):
+        """Time a block while a session is active; handler blocks count towards its budget"""
+        if not self.active:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._sections[name].append(elapsed)
+                if handler:
+                    self._handlers += 1
+                    if self._remaining:
+                        self._remaining -= 1
+
+
+def profiled(name: Union[str, Callable[..., str]], handler: bool = False):
+    """
+    Decorator recording a function (sync or async) as a profiler section.
+    `name` may be a callable receiving the call's arguments, e.g. to name handler branches.
+    """
+
+    def decorator(func):
+        def section_name(args, kwargs):
+            return name(*args, **kwargs) if callable(name) else name
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not profiler.active:
+                    return await func(*args, **kwargs)
+                with profiler.section(section_name(args, kwargs), handler):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.active:
+                return func(*args, **kwargs)
+            with profiler.section(section_name(args, kwargs), handler):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def format_report(report: ProfileReport) -> str:
+    lines = [
+        f"🔬 Profile: {report.duration:.0f}s, {report.samples} samples, "
+        f"{report.handlers} handler calls",
+        "",
+        "Top functions (self% / total%):",
+    ]
+    for name, own, total in report.top[:10]:
+        lines.append(f"{own:5.1f} {total:5.1f}  {name}")
+    if report.sections:
+        lines += ["", "Sections (calls, mean, max):"]
+        for name, (calls, mean, peak) in report.sections.items():
+            lines.append(f"{name}: {calls}x {mean:.0f}ms avg, {peak:.0f}ms max")
+    lines += ["", f"Folded stacks: {report.path}"]
+    return "\n".join(lines)
+
+
+def start_from_env():
+    """
+    PROFILE=30s profiles the first 30 seconds after startup, PROFILE=200 the first
+    200 handler calls; the report is printed when the session ends.
+    """
+    setting = os.getenv("PROFILE", "")
+    budget = parse_budget(setting) if setting else None
+    if budget is None or not profiler.start(*budget):
+        return
+
+    def report():
+        result = profiler.wait()
+        if result is not None:
+            print(format_report(result))
+
+    threading.Thread(target=report, daemon=True).start()
+
+
+# Create a global instance
+profiler = Profiler()
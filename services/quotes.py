@@ -0,0 +1,170 @@
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from services.market_hours import is_open, settles_at
+from services.store import HistoryStore, Quote, fetch_quotes, get_store
+
+# QUOTE_SOURCE=yahoo polls the quote endpoint in session, simulator ticks around the
+# stored closes at any hour (local testing), off disables live updates
+QUOTE_SOURCE = os.getenv("QUOTE_SOURCE", "yahoo")
+QUOTE_INTERVAL = float(os.getenv("QUOTE_INTERVAL", "60"))
+QUOTE_WORKERS = 8  # download threads per batch
+QUOTE_BATCH = 100  # symbols per multi-ticker download
+# Symbols quoted per minute; with more stored symbols each poll takes the next slice,
+# so Yahoo sees a bounded request rate however many universes are loaded
+QUOTE_PER_MINUTE = int(os.getenv("QUOTE_PER_MINUTE", "120"))
+# Without a quote for this many intervals a symbol falls back to full history refreshes
+STALE_INTERVALS = 3
+SIMULATED_VOLATILITY = 0.02  # daily; scaled down to the tick interval
+
+QuoteSource = Callable[[List[str]], Dict[str, Quote]]
+
+
+def poll_quotes(symbols: List[str]) -> Dict[str, Quote]:
+    """Quotes in multi-ticker downloads of QUOTE_BATCH symbols each"""
+    quotes: Dict[str, Quote] = {}
+    for start in range(0, len(symbols), QUOTE_BATCH):
+        batch = symbols[start : start + QUOTE_BATCH]
+        try:
+            quotes.update(fetch_quotes(batch, QUOTE_WORKERS))
+        except Exception as e:
+            print(f"Quote batch {batch[0]}..{batch[-1]} failed: {e}")
+    return quotes
+
+
+class QuoteSimulator:
+    """
+    Local feed standing in for the quote endpoint: a random walk per symbol
+    starting from its last stored bar, with running high/low and volume.
+    """
+
+    def __init__(self, store: HistoryStore, interval: float = QUOTE_INTERVAL, seed=None):
+        self.store = store
+        self.sigma = SIMULATED_VOLATILITY * math.sqrt(interval / (6.5 * 3600))
+        self._rng = np.random.default_rng(seed)
+        self._bars: Dict[str, Quote] = {}
+
+    def __call__(self, symbols: List[str]) -> Dict[str, Quote]:
+        quotes = {}
+        for symbol in symbols:
+            bar = self._bars.get(symbol) or self._seed(symbol)
+            if bar is None:
+                continue
+            price = bar.price * math.exp(self._rng.normal(0, self.sigma))
+            volume = bar.volume + int(self._rng.integers(1_000, 50_000))
+            bar = bar._replace(
+                high=max(bar.high, price), low=min(bar.low, price), price=price, volume=volume
+            )
+            self._bars[symbol] = quotes[symbol] = bar
+        return quotes
+
+    def _seed(self, symbol: str) -> Optional[Quote]:
+        frame = self.store.frame(symbol)
+        if frame is None or frame.empty:
+            return None
+        last = frame.iloc[-1]
+        return Quote(
+            ts=int(frame.index[-1:].tz_convert("UTC").as_unit("ns").asi8[0]),
+            open=float(last["Open"]),
+            high=float(last["High"]),
+            low=float(last["Low"]),
+            price=float(last["Close"]),
+            volume=int(last["Volume"]),
+        )
+
+
+class QuoteFeed:
+    """
+    Keeps the daily store's last bar current from a quote source.
+    Each interval polls the next slice of stored symbols (all of them when
+    per_minute is None); accepted quotes patch the bar in place and bump the
+    store version, so rankings, charts and the screener see them, and the next
+    full history download waits until the session settles.
+    """
+
+    def __init__(
+        self,
+        source: Optional[QuoteSource] = None,
+        store: Optional[HistoryStore] = None,
+        interval: float = QUOTE_INTERVAL,
+        market_hours_only: bool = True,
+        per_minute: Optional[int] = QUOTE_PER_MINUTE,
+    ):
+        self.store = store or get_store("1d")
+        self.source = source or poll_quotes
+        self.interval = interval
+        self.market_hours_only = market_hours_only
+        self.per_poll = max(1, math.ceil(per_minute * interval / 60)) if per_minute else None
+        self.stats = {"polls": 0, "quotes": 0, "applied": 0}
+        self._cursor = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll_once(self) -> int:
+        """Fetch and apply one round of quotes; returns how many bars changed"""
+        now = time.time()
+        if self.market_hours_only and not is_open(now):
+            return 0
+
+        symbols = self.store.symbols
+        batch = self._next_batch(symbols)
+        # A symbol comes round again after this many polls
+        rounds = math.ceil(len(symbols) / len(batch)) if batch else 1
+
+        # Quotes only stand in for downloads until the closing prints settle
+        settle = settles_at(now)
+        hold = now + STALE_INTERVALS * self.interval * rounds
+        hold_until = min(hold, settle) if settle is not None else None
+
+        quotes = self.source(batch)
+        applied = sum(
+            self.store.apply_quote(symbol, quote, hold_until) for symbol, quote in quotes.items()
+        )
+
+        self.stats["polls"] += 1
+        self.stats["quotes"] += len(quotes)
+        self.stats["applied"] += applied
+        return applied
+
+    def _next_batch(self, symbols: List[str]) -> List[str]:
+        if self.per_poll is None or len(symbols) <= self.per_poll:
+            return symbols
+        start = self._cursor % len(symbols)
+        batch = (symbols[start:] + symbols[:start])[: self.per_poll]
+        self._cursor = start + len(batch)
+        return batch
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Quote poll failed: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _default_feed() -> Optional[QuoteFeed]:
+    if QUOTE_SOURCE == "simulator":
+        store = get_store("1d")
+        return QuoteFeed(QuoteSimulator(store), store, market_hours_only=False, per_minute=None)
+    if QUOTE_SOURCE == "yahoo":
+        return QuoteFeed()
+    return None
+
+
+# Create a global instance (None when QUOTE_SOURCE=off)
+quote_feed = _default_feed()
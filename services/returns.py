@@ -0,0 +1,145 @@
+import re
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class Window(NamedTuple):
+    key: str  # used in callback data, must not contain "_" or ":"
+    label: str  # long form for result texts
+    button: str  # short form for keyboards
+    bars: int = 0  # fixed number of bars back (only used for 24h)
+    offset: Optional[pd.DateOffset] = None  # calendar lookback from the last bar
+    year_to_date: bool = False
+    start: Optional[pd.Timestamp] = None  # custom ranges
+    end: Optional[pd.Timestamp] = None
+
+
+WINDOWS: Dict[str, Window] = {}
+
+# Windows offered in the best/worst menus and in search results, in display order
+MENU_WINDOWS: List[str] = []
+
+RANGE_PATTERN = re.compile(r"^(\d{8})-(\d{8})$")
+
+# A history that starts this close after the window start still counts as covering it
+# (a "5y" download begins exactly five years back, often on a non-trading day)
+START_SLACK = pd.Timedelta(days=7)
+
+
+def register_window(window: Window, menu: bool = True) -> Window:
+    WINDOWS[window.key] = window
+    if menu and window.key not in MENU_WINDOWS:
+        MENU_WINDOWS.append(window.key)
+    return window
+
+
+register_window(Window("24h", "Today", "Today", bars=1))
+register_window(Window("5d", "5 Days", "5d", bars=5), menu=False)
+register_window(Window("7d", "7 Days", "7d", offset=pd.DateOffset(days=7)))
+register_window(Window("30d", "30 Days", "30d", offset=pd.DateOffset(days=30)))
+register_window(Window("3mo", "3 Months", "3m", offset=pd.DateOffset(months=3)))
+register_window(Window("6mo", "6 Months", "6m", offset=pd.DateOffset(months=6)))
+register_window(Window("ytd", "Year to Date", "YTD", year_to_date=True))
+register_window(Window("1y", "1 Year", "1y", offset=pd.DateOffset(years=1)))
+register_window(Window("5y", "5 Years", "5y", offset=pd.DateOffset(years=5)))
+
+
+def range_key(start: date, end: date) -> str:
+    return f"{start:%Y%m%d}-{end:%Y%m%d}"
+
+
+def get_window(key: str) -> Optional[Window]:
+    """Registered window, or a custom range encoded as YYYYMMDD-YYYYMMDD"""
+    if key in WINDOWS:
+        return WINDOWS[key]
+
+    match = RANGE_PATTERN.match(key)
+    if not match:
+        return None
+
+    try:
+        start, end = (pd.Timestamp(part) for part in match.groups())
+    except ValueError:
+        return None
+    if start >= end:
+        return None
+
+    label = f"{start:%d/%m/%Y} - {end:%d/%m/%Y}"
+    return Window(key, label, label, start=start, end=end)
+
+
+def window_label(key: str) -> str:
+    window = get_window(key)
+    return window.label if window else key
+
+
+def _as_index_time(ts: pd.Timestamp, index: pd.DatetimeIndex) -> pd.Timestamp:
+    """Localize a naive timestamp to the index timezone so searchsorted can compare them"""
+    if index.tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(index.tz)
+    return ts
+
+
+def resolve_positions(index: pd.DatetimeIndex, window: Window) -> Optional[tuple]:
+    """
+    (base, end) row positions for a window on a sorted DatetimeIndex.
+    The base is the last bar at or before the window start.
+    """
+    if len(index) < 2:
+        return None
+
+    end = len(index) - 1
+    if window.end is not None:
+        end = int(index.searchsorted(_as_index_time(window.end, index), side="right")) - 1
+
+    if window.bars:
+        base = end - window.bars
+    elif window.year_to_date:
+        year_start = pd.Timestamp(year=index[end].year, month=1, day=1)
+        base = int(index.searchsorted(_as_index_time(year_start, index), side="left")) - 1
+    else:
+        if window.start is not None:
+            target = _as_index_time(window.start, index)
+        else:
+            target = index[end] - window.offset
+        base = int(index.searchsorted(target, side="right")) - 1
+        if base < 0 and index[0] - target <= START_SLACK:
+            base = 0
+
+    if base < 0 or end <= base:
+        return None
+    return base, end
+
+
+def close_panel(histories: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Align closes of many symbols on one DatetimeIndex (rows: bars, columns: symbols)"""
+    closes = {s: h["Close"] for s, h in histories.items() if h is not None and not h.empty}
+    if not closes:
+        return pd.DataFrame()
+    return pd.concat(closes, axis=1).sort_index().ffill()
+
+
+def window_returns(panel: pd.DataFrame, key: str) -> pd.Series:
+    """Percent change over one window for every column of a close panel at once"""
+    window = get_window(key)
+    positions = resolve_positions(panel.index, window) if window else None
+    if positions is None:
+        return pd.Series(np.nan, index=panel.columns, dtype=float)
+
+    base, end = positions
+    values = panel.to_numpy(dtype=float)
+    first, last = values[base], values[end]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(first > 0, (last - first) / first * 100, np.nan)
+
+    return pd.Series(np.round(change, 2), index=panel.columns)
+
+
+def returns_table(panel: pd.DataFrame, keys: Optional[List[str]] = None) -> pd.DataFrame:
+    """Rows: symbols, columns: windows"""
+    keys = MENU_WINDOWS if keys is None else keys
+    return pd.DataFrame({key: window_returns(panel, key) for key in keys}, index=panel.columns)
@@ -0,0 +1,195 @@
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, TypedDict
+
+import numpy as np
+
+from services import indicators
+from services.market import universe_symbols
+from services.store import get_store
+
+# Enough history for the slowest indicator (MACD's 26+9 EMA) to settle
+SCREEN_BARS = 250
+CROSS_LOOKBACK = 5  # "crossed in the last N bars"
+SMA_PERIOD = 20
+ATR_PCT_THRESHOLD = 3.0
+
+# Indicators behind the conditions, planned together so shared inputs are computed once
+SNAPSHOT_INDICATORS = {
+    "rsi": "rsi",
+    "macd": "macd",
+    "signal": "macd_signal",
+    "macd_hist": "macd_hist",
+    "atr": "atr",
+    "sma": f"sma:{SMA_PERIOD}",
+}
+
+# Latest-bar indicator values, one array entry per symbol
+Snapshot = Dict[str, np.ndarray]
+
+
+class Condition(NamedTuple):
+    key: str  # used in callback data, must not contain ":"
+    label: str
+    button: str
+    # snapshot -> (matching mask, value shown next to each match)
+    test: Callable[[Snapshot], Tuple[np.ndarray, np.ndarray]]
+    ascending: bool = False  # sort order of the shown value
+    unit: str = ""
+
+
+class ScreenResult(TypedDict):
+    symbol: str
+    value: float
+
+
+CONDITIONS: Dict[str, Condition] = {}
+
+
+def register_condition(condition: Condition) -> Condition:
+    CONDITIONS[condition.key] = condition
+    return condition
+
+
+register_condition(
+    Condition(
+        "rsi30",
+        "RSI below 30 (oversold)",
+        "RSI < 30",
+        lambda s: (s["rsi"] < 30, s["rsi"]),
+        ascending=True,
+    )
+)
+register_condition(
+    Condition(
+        "rsi70",
+        "RSI above 70 (overbought)",
+        "RSI > 70",
+        lambda s: (s["rsi"] > 70, s["rsi"]),
+    )
+)
+register_condition(
+    Condition(
+        "macdup",
+        f"MACD crossed above signal (last {CROSS_LOOKBACK} bars)",
+        "MACD ↑ cross",
+        lambda s: ((s["macd_up"] < CROSS_LOOKBACK) & (s["macd_hist"] > 0), s["macd_hist"]),
+    )
+)
+register_condition(
+    Condition(
+        "macddn",
+        f"MACD crossed below signal (last {CROSS_LOOKBACK} bars)",
+        "MACD ↓ cross",
+        lambda s: ((s["macd_down"] < CROSS_LOOKBACK) & (s["macd_hist"] < 0), s["macd_hist"]),
+        ascending=True,
+    )
+)
+register_condition(
+    Condition(
+        "atr",
+        f"ATR above {ATR_PCT_THRESHOLD:g}% of price",
+        f"ATR% > {ATR_PCT_THRESHOLD:g}",
+        lambda s: (s["atr_pct"] > ATR_PCT_THRESHOLD, s["atr_pct"]),
+        unit="%",
+    )
+)
+register_condition(
+    Condition(
+        "sma20",
+        f"Price above SMA{SMA_PERIOD}",
+        f"Above SMA{SMA_PERIOD}",
+        lambda s: (s["sma_gap"] > 0, s["sma_gap"]),
+        unit="%",
+    )
+)
+register_condition(
+    Condition(
+        "sma20dn",
+        f"Price below SMA{SMA_PERIOD}",
+        f"Below SMA{SMA_PERIOD}",
+        lambda s: (s["sma_gap"] < 0, s["sma_gap"]),
+        ascending=True,
+        unit="%",
+    )
+)
+
+
+def compute_snapshot(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Snapshot:
+    """Every screened indicator for all symbols in one pass over (symbols x time) arrays"""
+    high, low, close = (indicators.ffill(a.astype(np.float64)) for a in (high, low, close))
+    last = close[:, -1]
+
+    values = indicators.compute(
+        SNAPSHOT_INDICATORS.values(), {"high": high, "low": low, "close": close}
+    )
+    latest = {name: values[key][:, -1] for name, key in SNAPSHOT_INDICATORS.items()}
+    line, signal = values[SNAPSHOT_INDICATORS["macd"]], values[SNAPSHOT_INDICATORS["signal"]]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "close": last,
+            "rsi": latest["rsi"],
+            "macd_hist": latest["macd_hist"],
+            "macd_up": indicators.bars_since_cross(line, signal, upward=True),
+            "macd_down": indicators.bars_since_cross(line, signal, upward=False),
+            "atr_pct": latest["atr"] / last * 100,
+            "sma_gap": (last / latest["sma"] - 1) * 100,
+        }
+
+
+class Screener:
+    """Screens the universe; snapshots and results are cached per data version"""
+
+    def __init__(self, interval: str = "1d", bars: int = SCREEN_BARS):
+        self.store = get_store(interval)
+        self.bars = bars
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Tuple[int, List[str], Snapshot]] = None
+        self._results: Dict[Tuple[str, int, Tuple[str, ...]], List[ScreenResult]] = {}
+
+    def snapshot(self, symbols: List[str]) -> Tuple[List[str], Snapshot]:
+        with self._lock:
+            _version, snap = self._current(symbols)
+            return symbols, snap
+
+    def _current(self, symbols: List[str]) -> Tuple[int, Snapshot]:
+        # Callers hold self._lock
+        version = self.store.version
+        if self._snapshot and self._snapshot[:2] == (version, symbols):
+            return version, self._snapshot[2]
+
+        arrays = [
+            self.store.matrix(symbols, field)[1][:, -self.bars :]
+            for field in ("High", "Low", "Close")
+        ]
+        snap = compute_snapshot(*arrays)
+        self._snapshot = (version, symbols, snap)
+        self._results = {}
+        return version, snap
+
+    def screen(self, key: str, symbols: Optional[List[str]] = None) -> List[ScreenResult]:
+        """Matching symbols for a condition, best first"""
+        condition = CONDITIONS[key]
+        symbols = list(universe_symbols() if symbols is None else symbols)
+
+        with self._lock:
+            version, snap = self._current(symbols)
+            # Keyed on the exact snapshot: lists of equal length must not share results
+            cache_key = (key, version, tuple(symbols))
+            if cache_key in self._results:
+                return self._results[cache_key]
+
+            mask, values = condition.test(snap)
+            idx = np.flatnonzero(mask)
+            order = np.argsort(values[idx] if condition.ascending else -values[idx], kind="stable")
+            results = [
+                ScreenResult(symbol=symbols[i], value=round(float(values[i]), 2))
+                for i in idx[order]
+            ]
+
+            self._results[cache_key] = results
+            return results
+
+
+# Create a global instance
+screener = Screener()
@@ -0,0 +1,70 @@
+from typing import Optional
+
+import pandas as pd
+
+from services.market import performance_table
+from services.universe import load_sp500_table
+
+UNKNOWN_SECTOR = "Other"
+
+# Short names that fit a phone-width table
+SECTOR_SHORT = {
+    "Communication Services": "Comm",
+    "Consumer Discretionary": "Discr",
+    "Consumer Staples": "Staples",
+    "Energy": "Energy",
+    "Financials": "Financ",
+    "Health Care": "Health",
+    "Industrials": "Indust",
+    "Information Technology": "Tech",
+    "Materials": "Mater",
+    "Real Estate": "RealEst",
+    "Utilities": "Util",
+    UNKNOWN_SECTOR: UNKNOWN_SECTOR,
+}
+
+_classification: Optional[pd.DataFrame] = None
+
+
+def classification() -> pd.DataFrame:
+    """GICS sector and sub-industry per symbol (loaded once)"""
+    global _classification
+    if _classification is None:
+        records = load_sp500_table()
+        _classification = pd.DataFrame(
+            {
+                "sector": [r.get("sector") or UNKNOWN_SECTOR for r in records],
+                "sub_industry": [r.get("sub_industry") or UNKNOWN_SECTOR for r in records],
+            },
+            index=[r["symbol"] for r in records],
+        )
+    return _classification
+
+
+def sector_performance(table: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Equal-weighted mean return per sector for every period, plus the
+    share of advancing symbols and the number of symbols per sector.
+    """
+    if table is None:
+        table = performance_table()
+
+    sectors = classification()["sector"].reindex(table.index).fillna(UNKNOWN_SECTOR)
+    grouped = table.groupby(sectors)
+
+    summary = grouped.mean().round(2)
+    breadth = (table > 0).where(table.notna()).groupby(sectors).mean()
+    summary = summary.join(breadth.add_suffix("_breadth"))
+    summary["count"] = grouped.size()
+
+    return summary.sort_values(table.columns[0], ascending=False)
+
+
+def universe_snapshot(period: str, table: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Symbol, sector and change for one period, grouped by sector for the heatmap"""
+    if table is None:
+        table = performance_table()
+
+    info = classification().reindex(table.index).fillna(UNKNOWN_SECTOR)
+    snapshot = pd.DataFrame({"sector": info["sector"], "change": table[period]}).dropna()
+    return snapshot.rename_axis("symbol").sort_values(["sector", "change"], ascending=[True, False])
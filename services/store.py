@@ -0,0 +1,351 @@
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from services.market_hours import next_refresh
+
+PRICE_FIELDS = ("Open", "High", "Low", "Close")
+FIELDS = PRICE_FIELDS + ("Volume",)
+
+# Longest axis kept per bar interval (older bars are dropped first)
+MAX_BARS = {"5m": 240, "1h": 400, "1d": 1300, "1wk": 300}
+INITIAL_CAPACITY = 64
+# Failed or empty downloads are retried sooner than the market calendar would allow
+RETRY_TTL = 300
+
+
+def fetch_history(symbol: str, period: str, interval: str = "1d") -> pd.DataFrame:
+    """
+    Download bars from Yahoo Finance.
+    With fetch_quotes, the only place that talks to the upstream price source.
+    """
+    ticker = yf.Ticker(symbol)
+    return ticker.history(period=period, interval=interval, auto_adjust=True)
+
+
+class Quote(NamedTuple):
+    """Live state of a symbol's current daily bar"""
+
+    ts: int  # the bar's timestamp, epoch ns UTC
+    open: float
+    high: float
+    low: float
+    price: float
+    volume: int
+
+
+def fetch_quote(symbol: str) -> Optional[Quote]:
+    """The current session's daily bar: a one-row download instead of the full history"""
+    return _last_bar(fetch_history(symbol, "1d", "1d"))
+
+
+def fetch_quotes(symbols: List[str], threads: int = 8) -> Dict[str, Quote]:
+    """Current session's daily bar of many symbols from one multi-ticker download"""
+    if not symbols:
+        return {}
+    frame = yf.download(
+        symbols,
+        period="1d",
+        interval="1d",
+        auto_adjust=True,
+        group_by="ticker",
+        threads=threads,
+        progress=False,
+    )
+    if frame is None or frame.empty:
+        return {}
+    if not isinstance(frame.columns, pd.MultiIndex):
+        quote = _last_bar(frame)
+        return {symbols[0]: quote} if quote is not None and len(symbols) == 1 else {}
+
+    quotes = {}
+    present = set(frame.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol in present:
+            quote = _last_bar(frame[symbol].dropna(subset=["Close"]))
+            if quote is not None:
+                quotes[symbol] = quote
+    return quotes
+
+
+def _last_bar(bar: Optional[pd.DataFrame]) -> Optional[Quote]:
+    if bar is None or bar.empty or pd.isna(bar["Close"].iloc[-1]):
+        return None
+
+    last = bar.iloc[-1]
+    return Quote(
+        ts=int(_to_epoch_ns(bar.index[-1:])[0]),
+        open=float(last["Open"]),
+        high=float(last["High"]),
+        low=float(last["Low"]),
+        price=float(last["Close"]),
+        volume=0 if pd.isna(last["Volume"]) else int(last["Volume"]),
+    )
+
+
+def _to_epoch_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    if index.tz is not None:
+        index = index.tz_convert("UTC")
+    return index.as_unit("ns").asi8
+
+
+class HistoryStore:
+    """
+    Bars of many symbols at one granularity in preallocated contiguous arrays.
+
+    Rows are symbols, columns are bars on a time axis shared by every symbol
+    (int64 epoch nanoseconds, UTC). OHLC is float32, volume int64; missing bars
+    are NaN. Dividends and splits are not kept. DataFrames are only built on
+    the way out, as copies, so readers never see a row being rewritten.
+    """
+
+    def __init__(self, interval: str, max_bars: Optional[int] = None):
+        self.interval = interval
+        self.max_bars = max_bars or MAX_BARS.get(interval, 1000)
+        self.tz: Optional[str] = None
+
+        self._ts = np.empty(0, dtype=np.int64)
+        self._prices = np.full((len(PRICE_FIELDS), INITIAL_CAPACITY, 0), np.nan, dtype=np.float32)
+        self._volume = np.zeros((INITIAL_CAPACITY, 0), dtype=np.int64)
+
+        self._rows: Dict[str, int] = {}
+        self._fetched: Dict[str, float] = {}
+        self._expires: Dict[str, float] = {}
+        self._versions: Dict[str, int] = {}
+        self.version = 0
+
+        self._lock = threading.RLock()
+
+    # --- Bookkeeping ---
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._rows
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._ts.nbytes + self._prices.nbytes + self._volume.nbytes)
+
+    def fetched_at(self, symbol: str) -> Optional[float]:
+        return self._fetched.get(symbol)
+
+    def expires_at(self, symbol: str) -> float:
+        """Epoch time the symbol's next bar is due upstream (0 if never fetched)"""
+        return self._expires.get(symbol, 0.0)
+
+    def is_fresh(self, symbol: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now < self._expires.get(symbol, 0.0)
+
+    def symbol_version(self, symbol: str) -> int:
+        """Changes whenever the symbol's bars are rewritten"""
+        return self._versions.get(symbol, 0)
+
+    def members_version(self, symbols: List[str]) -> int:
+        """Changes whenever any of the symbols' bars are rewritten, and only then"""
+        return max((self._versions.get(s, 0) for s in symbols), default=0)
+
+    def _bump(self, symbol: str):
+        self.version += 1
+        self._versions[symbol] = self.version
+
+    def _row(self, symbol: str) -> int:
+        row = self._rows.get(symbol)
+        if row is not None:
+            return row
+
+        row = len(self._rows)
+        capacity = self._volume.shape[0]
+        if row >= capacity:
+            grow = capacity
+            self._prices = np.concatenate(
+                [
+                    self._prices,
+                    np.full((len(PRICE_FIELDS), grow, len(self._ts)), np.nan, np.float32),
+                ],
+                axis=1,
+            )
+            self._volume = np.concatenate(
+                [self._volume, np.zeros((grow, len(self._ts)), np.int64)], axis=0
+            )
+
+        self._rows[symbol] = row
+        return row
+
+    def _extend_axis(self, new_ts: np.ndarray):
+        """Merge new timestamps into the shared axis, dropping unused and overflow columns"""
+        used = ~np.isnan(self._prices[3, : len(self._rows)]).all(axis=0)
+        axis = np.union1d(self._ts[used], new_ts)[-self.max_bars :]
+
+        prices = np.full((len(PRICE_FIELDS), self._volume.shape[0], len(axis)), np.nan, np.float32)
+        volume = np.zeros((self._volume.shape[0], len(axis)), np.int64)
+
+        keep = np.isin(self._ts, axis)
+        target = np.searchsorted(axis, self._ts[keep])
+        prices[:, :, target] = self._prices[:, :, keep]
+        volume[:, target] = self._volume[:, keep]
+
+        self._ts, self._prices, self._volume = axis, prices, volume
+
+    # --- Writes ---
+
+    def put(self, symbol: str, hist: Optional[pd.DataFrame]):
+        """
+        Replace a symbol's bars with a freshly downloaded history. yfinance answers
+        rate limits and hiccups with an empty frame, so an empty download only backs
+        off for RETRY_TTL and keeps whatever bars are already stored.
+        """
+        with self._lock:
+            now = time.time()
+            self._fetched[symbol] = now
+
+            if hist is None or hist.empty:
+                self._expires[symbol] = now + RETRY_TTL
+                return
+
+            row = self._row(symbol)
+            self._expires[symbol] = next_refresh(now, self.interval)
+            if self.tz is None and hist.index.tz is not None:
+                self.tz = str(hist.index.tz)
+
+            ts = _to_epoch_ns(hist.index)
+            if not np.isin(ts, self._ts).all():
+                self._extend_axis(ts)
+
+            # Bars older than the retained axis are dropped
+            keep = np.isin(ts, self._ts)
+            cols = np.searchsorted(self._ts, ts[keep])
+
+            self._prices[:, row, :] = np.nan
+            self._volume[row, :] = 0
+            for i, field in enumerate(PRICE_FIELDS):
+                self._prices[i, row, cols] = hist[field].to_numpy(np.float32)[keep]
+            self._volume[row, cols] = hist["Volume"].fillna(0).to_numpy(np.int64)[keep]
+
+            self._bump(symbol)
+
+    def refresh(self, symbol: str, download: Callable[[], Optional[pd.DataFrame]]):
+        """
+        Store a new download. A download that raises (DNS error, timeout) backs off
+        for RETRY_TTL like an empty one; either way the stored bars are kept.
+        """
+        try:
+            hist = download()
+        except Exception:
+            with self._lock:
+                self._expires[symbol] = time.time() + RETRY_TTL
+            raise
+        self.put(symbol, hist)
+
+    def apply_quote(self, symbol: str, quote: Quote, hold_until: Optional[float] = None) -> bool:
+        """
+        Patch the symbol's last bar with a live quote (or open the next session's bar)
+        without touching the rest of its history. `hold_until` postpones the next full
+        download while quotes keep the bar current. Returns False for stale quotes.
+        """
+        with self._lock:
+            row = self._rows.get(symbol)
+            if row is None:
+                return False
+            valid = ~np.isnan(self._prices[3, row])
+            if not valid.any():
+                return False
+
+            last_ts = self._ts[len(valid) - 1 - int(np.argmax(valid[::-1]))]
+            if quote.ts < last_ts:
+                return False
+
+            if quote.ts > last_ts:
+                # First quote of a new session: the bar starts from the quote alone
+                if quote.ts not in self._ts:
+                    self._extend_axis(np.array([quote.ts], dtype=np.int64))
+                col = int(np.searchsorted(self._ts, quote.ts))
+                self._prices[:, row, col] = (quote.open, quote.high, quote.low, quote.price)
+            else:
+                col = int(np.searchsorted(self._ts, quote.ts))
+                high, low = self._prices[1, row, col], self._prices[2, row, col]
+                self._prices[1, row, col] = np.fmax(high, quote.high)
+                self._prices[2, row, col] = np.fmin(low, quote.low)
+                self._prices[3, row, col] = quote.price
+            # Quotes carry the session's cumulative volume
+            self._volume[row, col] = quote.volume
+
+            if hold_until is not None:
+                self._expires[symbol] = max(self._expires.get(symbol, 0.0), hold_until)
+            self._bump(symbol)
+            return True
+
+    # --- Reads (pandas only at the edges) ---
+
+    def _index(self, ts: np.ndarray) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(ts.view("M8[ns]"), tz="UTC")
+        return index.tz_convert(self.tz) if self.tz else index
+
+    def frame(self, symbol: str) -> Optional[pd.DataFrame]:
+        """OHLCV DataFrame for one symbol, None if it was never stored"""
+        with self._lock:
+            row = self._rows.get(symbol)
+            if row is None:
+                return None
+
+            valid = ~np.isnan(self._prices[3, row])
+            if not valid.any():
+                return pd.DataFrame(columns=list(FIELDS))
+
+            first = int(np.argmax(valid))
+            last = len(valid) - int(np.argmax(valid[::-1]))
+            span = slice(first, last)
+
+            data = {field: self._prices[i, row, span] for i, field in enumerate(PRICE_FIELDS)}
+            data["Volume"] = self._volume[row, span]
+            # Copied out under the lock: put() and apply_quote() rewrite rows in place
+            frame = pd.DataFrame(data, index=self._index(self._ts[span]), copy=True)
+
+            # Gaps where other symbols have bars but this one does not
+            if not valid[span].all():
+                frame = frame[valid[span]]
+            return frame
+
+    def matrix(self, symbols: List[str], field: str = "Close") -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, symbols x time array) for vectorized consumers; unknown symbols are NaN"""
+        with self._lock:
+            rows = np.array([self._rows.get(s, -1) for s in symbols], dtype=np.int64)
+            if field == "Volume":
+                values = self._volume[rows].astype(np.float64)
+            else:
+                values = self._prices[PRICE_FIELDS.index(field), rows]
+            values[rows < 0] = np.nan
+            return self._ts.copy(), values
+
+    def panel(self, symbols: List[str], field: str = "Close") -> pd.DataFrame:
+        """Time x symbols DataFrame of one field, forward-filled over gaps"""
+        columns = [s for s in symbols if s in self._rows]
+        if not columns:
+            return pd.DataFrame()
+
+        ts, values = self.matrix(columns, field)
+        panel = pd.DataFrame(values.T, index=self._index(ts), columns=columns)
+        return panel.dropna(how="all").ffill()
+
+
+_stores: Dict[str, HistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(interval: str) -> HistoryStore:
+    """Process-wide store for one bar interval"""
+    with _stores_lock:
+        if interval not in _stores:
+            _stores[interval] = HistoryStore(interval)
+        return _stores[interval]
+
+
+def stores() -> Dict[str, HistoryStore]:
+    return dict(_stores)
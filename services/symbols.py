@@ -0,0 +1,167 @@
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Set, Tuple, TypedDict
+
+from services.universe import load_sp500_table
+
+MAX_PREFIX_SCAN = 64
+MIN_FUZZY_LENGTH = 3
+STOP_WORDS = {"INC", "CORP", "CORPORATION", "CO", "COMPANY", "THE", "PLC", "LTD", "LLC", "NV"}
+
+# Lower rank sorts first
+RANK_EXACT_SYMBOL = 0.0
+RANK_EXACT_NAME = 1.0
+RANK_SYMBOL_PREFIX = 2.0
+RANK_NAME_PREFIX = 3.0
+RANK_FUZZY = 4.0
+
+
+class Suggestion(TypedDict):
+    symbol: str
+    name: str
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", text.upper())
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in re.split(r"[^A-Z0-9]+", text.upper()) if t and t not in STOP_WORDS]
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """All variants of word with up to `depth` characters removed"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def _distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, giving up once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SymbolIndex:
+    """
+    Search index over tickers and company names.
+    Prefix lookups use a sorted key list; typos are matched with a
+    precomputed deletion neighbourhood (bounded edit distance).
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, str]], max_distance: int = 2):
+        self.max_distance = max_distance
+        self._symbols: List[str] = []
+        self._names: List[str] = []
+        self._by_symbol: Dict[str, int] = {}
+
+        keys: Dict[str, Set[Tuple[int, bool]]] = {}  # key -> {(entry id, is_symbol)}
+
+        for entry in entries:
+            symbol = entry["symbol"].upper()
+            if symbol in self._by_symbol:
+                continue
+
+            idx = len(self._symbols)
+            self._symbols.append(symbol)
+            self._names.append(entry.get("name", ""))
+            self._by_symbol[symbol] = idx
+
+            keys.setdefault(_normalize(symbol), set()).add((idx, True))
+            name = entry.get("name", "")
+            if name:
+                keys.setdefault(_normalize(name), set()).add((idx, False))
+                for token in _tokens(name):
+                    keys.setdefault(token, set()).add((idx, False))
+
+        self._keys = keys
+        self._sorted_keys = sorted(keys)
+
+        self._deletes: Dict[str, Set[str]] = {}
+        for key in keys:
+            if len(key) < MIN_FUZZY_LENGTH:
+                continue
+            for variant in _deletes(key, self._depth(key)):
+                self._deletes.setdefault(variant, set()).add(key)
+
+    def _depth(self, word: str) -> int:
+        return min(self.max_distance, 1 if len(word) <= 4 else 2)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.upper() in self._by_symbol
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def name(self, symbol: str) -> str:
+        idx = self._by_symbol.get(symbol.upper())
+        return self._names[idx] if idx is not None else ""
+
+    def _prefix_matches(self, query: str) -> Iterable[str]:
+        start = bisect_left(self._sorted_keys, query)
+        for key in self._sorted_keys[start : start + MAX_PREFIX_SCAN]:
+            if not key.startswith(query):
+                break
+            yield key
+
+    def _fuzzy_matches(self, query: str) -> Iterable[Tuple[str, int]]:
+        if len(query) < MIN_FUZZY_LENGTH:
+            return
+        depth = self._depth(query)
+        candidates: Set[str] = set()
+        for variant in _deletes(query, depth):
+            candidates |= self._deletes.get(variant, set())
+        for key in candidates:
+            dist = _distance(query, key, depth)
+            if dist <= depth:
+                yield key, dist
+
+    def search(self, query: str, limit: int = 5) -> List[Suggestion]:
+        """Ranked suggestions for a ticker or company name fragment"""
+        query_key = _normalize(query)
+        if not query_key:
+            return []
+
+        ranks: Dict[int, float] = {}
+
+        def offer(key: str, symbol_rank: float, name_rank: float, extra: int = 0):
+            for idx, is_symbol in self._keys[key]:
+                # Prefer keys that need the fewest extra characters
+                rank = (symbol_rank if is_symbol else name_rank) + extra * 0.01
+                if rank < ranks.get(idx, float("inf")):
+                    ranks[idx] = rank
+
+        if query_key in self._keys:
+            offer(query_key, RANK_EXACT_SYMBOL, RANK_EXACT_NAME)
+
+        for key in self._prefix_matches(query_key):
+            offer(key, RANK_SYMBOL_PREFIX, RANK_NAME_PREFIX, len(key) - len(query_key))
+
+        for token in {query_key, *_tokens(query)}:
+            for key, dist in self._fuzzy_matches(token):
+                offer(key, RANK_FUZZY + dist, RANK_FUZZY + dist + 0.5)
+
+        best = sorted(ranks.items(), key=lambda item: (item[1], self._symbols[item[0]]))
+        return [
+            Suggestion(symbol=self._symbols[idx], name=self._names[idx]) for idx, _ in best[:limit]
+        ]
+
+
+symbol_index = SymbolIndex(load_sp500_table())
@@ -1,6 +1,7 @@
 import json
 from io import StringIO
 from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
 
 import pandas as pd
 import requests
@@ -8,6 +9,95 @@ import requests
 CACHE_DIR = Path("cache")
 CACHE_DIR.mkdir(exist_ok=True)
 SP500_FILE = CACHE_DIR / "sp500.json"
+SP500_META_FILE = CACHE_DIR / "sp500_meta.json"
+
+SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+NASDAQ100_URL = "https://en.wikipedia.org/wiki/Nasdaq-100"
+DOW30_URL = "https://en.wikipedia.org/wiki/Dow_Jones_Industrial_Average"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+
+
+class Universe(NamedTuple):
+    key: str  # used in callback data, must not contain "_" or ":"
+    label: str
+    load: Callable[[], List[str]]
+
+
+UNIVERSES: Dict[str, Universe] = {}
+DEFAULT_UNIVERSE = "sp500"
+# Per-chat custom universe: the bot resolves it to the chat's watchlist
+WATCHLIST_UNIVERSE = "watch"
+
+
+def register_universe(universe: Universe) -> Universe:
+    UNIVERSES[universe.key] = universe
+    return universe
+
+
+def _clean_symbols(symbols) -> List[str]:
+    """Same ticker normalization for every index so overlapping members share one entry"""
+    return [str(s).strip() for s in pd.Series(symbols).str.replace(r"[\$\^\.]", "", regex=True)]
+
+
+def _fetch_symbols(url: str, column: str) -> List[str]:
+    """Symbols from the first table on a Wikipedia page that has the given column"""
+    response = requests.get(url, headers=HEADERS, timeout=10)
+    response.raise_for_status()
+
+    for table in pd.read_html(StringIO(response.text)):
+        if column in table.columns:
+            return _clean_symbols(table[column].dropna())
+    raise ValueError(f"No {column} column at {url}")
+
+
+def _load_cached_list(path: Path, url: str, column: str) -> List[str]:
+    """Constituents from their cache file, downloaded once; empty if unavailable"""
+    if path.exists() and path.stat().st_size > 0:
+        with open(path, "r") as f:
+            return list(json.load(f))
+
+    try:
+        symbols = _fetch_symbols(url, column)
+    except Exception as e:
+        print(f"{path.stem} constituents unavailable: {e}")
+        return []
+
+    with open(path, "w") as f:
+        json.dump(symbols, f, indent=2)
+    print(f"Successfully loaded {len(symbols)} {path.stem} symbols")
+    return symbols
+
+
+def load_nasdaq100() -> List[str]:
+    return _load_cached_list(CACHE_DIR / "nasdaq100.json", NASDAQ100_URL, "Ticker")
+
+
+def load_dow30() -> List[str]:
+    return _load_cached_list(CACHE_DIR / "dow30.json", DOW30_URL, "Symbol")
+
+
+def _fetch_sp500_table() -> List[Dict[str, str]]:
+    """Download the Wikipedia constituents table and cache symbols plus metadata"""
+    response = requests.get(SP500_URL, headers=HEADERS, timeout=10)
+    response.raise_for_status()
+
+    df = pd.read_html(StringIO(response.text))[0]
+
+    symbols = _clean_symbols(df["Symbol"])
+    records = [
+        {"symbol": symbol, "name": str(name), "sector": str(sector), "sub_industry": str(sub)}
+        for symbol, name, sector, sub in zip(
+            symbols, df["Security"], df["GICS Sector"], df["GICS Sub-Industry"]
+        )
+    ]
+
+    with open(SP500_FILE, "w") as f:
+        json.dump(symbols, f, indent=2)
+    with open(SP500_META_FILE, "w") as f:
+        json.dump(records, f, indent=2)
+
+    print(f"Successfully loaded {len(symbols)} symbols")
+    return records
 
 
 def load_sp500():
@@ -17,18 +107,31 @@ def load_sp500():
             cleaned_symbols = [s.replace("$", "") for s in symbols]
             return cleaned_symbols
 
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+    return [r["symbol"] for r in _fetch_sp500_table()]
 
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    response = requests.get(url, headers=headers, timeout=10)
-    response.raise_for_status()
 
-    df = pd.read_html(StringIO(response.text))[0]
+def load_sp500_table() -> List[Dict[str, str]]:
+    """
+    S&P 500 constituents with company name, GICS sector and sub-industry.
+    Falls back to bare symbols if the table cannot be downloaded.
+    """
+    cached = None
+    if SP500_META_FILE.exists() and SP500_META_FILE.stat().st_size > 0:
+        with open(SP500_META_FILE, "r") as f:
+            cached = json.load(f)
+        # Files written before sub-industries were kept are refreshed once
+        if all("sub_industry" in r for r in cached):
+            return list(cached)
 
-    symbols = df["Symbol"].str.replace(r"[\$\^\.]", "", regex=True).tolist()
+    try:
+        return _fetch_sp500_table()
+    except Exception as e:
+        print(f"S&P 500 metadata unavailable: {e}")
+        if cached:
+            return [{"name": "", "sector": "", "sub_industry": "", **r} for r in cached]
+        return [{"symbol": s, "name": "", "sector": "", "sub_industry": ""} for s in load_sp500()]
 
-    with open(SP500_FILE, "w") as f:
-        json.dump(symbols, f, indent=2)
 
-    print(f"Successfully loaded {len(symbols)} symbols")
-    return symbols
+register_universe(Universe("sp500", "S&P 500", load_sp500))
+register_universe(Universe("ndx", "Nasdaq-100", load_nasdaq100))
+register_universe(Universe("dow", "Dow 30", load_dow30))